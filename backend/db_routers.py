@@ -0,0 +1,136 @@
+"""
+Read-replica routing for the API tier.
+
+Reads of the ``shipments`` app go to a healthy alias from
+``settings.DATABASE_REPLICAS`` only while a view has opted in for the current
+request (``ReplicaReadsMixin``). Everything else – writes, Celery tasks,
+management commands – stays on ``default``.
+
+Read-your-writes: once a request writes, the rest of it reads from the
+primary, and ``ReplicaPinningMiddleware`` sets a short-lived cookie so the
+client's next requests do too while the replicas catch up.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = "db_pin"
+
+_routing = ContextVar("replica_routing", default=None)
+_health  = {}   # alias → (healthy, checked_at)
+
+
+class _RequestRouting:
+    def __init__(self, pinned):
+        self.pinned   = pinned     # reads must hit the primary
+        self.replicas = False      # view opted in to replica reads
+        self.wrote    = False
+
+
+def replicas():
+    return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+def allow_replica_reads():
+    """Called by read-only views; a no-op outside a request or once pinned."""
+    state = _routing.get()
+    if state is not None and not state.pinned:
+        state.replicas = True
+
+
+def _healthy(alias):
+    interval = getattr(settings, "REPLICA_HEALTH_CHECK_INTERVAL", 30)
+    healthy, checked_at = _health.get(alias, (None, 0.0))
+    if healthy is None or time.monotonic() - checked_at > interval:
+        try:
+            with connections[alias].cursor() as cur:
+                cur.execute("SELECT 1")
+            healthy = True
+        except Exception:
+            connections[alias].close()
+            healthy = False
+        _health[alias] = (healthy, time.monotonic())
+    return healthy
+
+
+def pick_replica():
+    candidates = replicas()
+    random.shuffle(candidates)
+    for alias in candidates:
+        if _healthy(alias):
+            return alias
+    return None
+
+
+class ReplicaRouter:
+    app_labels = {"shipments"}
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if (state is None or state.pinned or not state.replicas
+                or model._meta.app_label not in self.app_labels):
+            return None
+        return pick_replica()
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas receive schema changes through replication
+        return False if db in replicas() else None
+
+
+class ReplicaPinningMiddleware:
+    # Runs natively under ASGI too, so async views don't hop to a thread here.
+    sync_capable  = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _unsafe(request):
+        return request.method not in ("GET", "HEAD", "OPTIONS")
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = _RequestRouting(pinned=self._unsafe(request) or PIN_COOKIE in request.COOKIES)
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self._pin(request, state, response)
+
+    async def __acall__(self, request):
+        state = _RequestRouting(pinned=self._unsafe(request) or PIN_COOKIE in request.COOKIES)
+        token = _routing.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self._pin(request, state, response)
+
+    def _pin(self, request, state, response):
+        if (self._unsafe(request) or state.wrote) and replicas():
+            response.set_cookie(
+                PIN_COOKIE, "1", max_age=getattr(settings, "REPLICA_STICKY_SECONDS", 5),
+                httponly=True, samesite="Lax",
+            )
+        return response
@@ -0,0 +1,176 @@
+"""
+OpenAPI schema served from a cache instead of regenerated per request.
+
+``CachedSpectacularAPIView`` renders each format (YAML / JSON, per API
+version and ``lang``) once per *code version*, keeps it in memory and – under
+``SCHEMA_CACHE_DIR`` – on disk, so restarts and sibling processes reuse it.
+``manage.py build_schema`` fills the disk cache at build time; otherwise the
+first request does. Responses are sent gzipped to clients that accept it and
+carry a strong ETag per encoding (the gzipped one ends in ``-gzip``); either
+matches ``If-None-Match``, since both name the same document.
+
+The code version is ``SCHEMA_VERSION`` when set (e.g. the deployed commit),
+else a digest of the project's Python sources and the schema-related
+settings, so a deploy that changes a serializer never serves a stale schema.
+"""
+import functools
+import gzip
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+import django
+import drf_spectacular
+import rest_framework
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils import translation
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from drf_spectacular.views import SpectacularAPIView
+
+ACCEPTS_GZIP = re.compile(r"\bgzip\b")
+
+logger = logging.getLogger(__name__)
+
+
+@functools.cache
+def code_version():
+    explicit = getattr(settings, "SCHEMA_VERSION", None)
+    if explicit:
+        return re.sub(r"[^\w.-]", "_", str(explicit))
+    digest = hashlib.sha256()
+    for part in (django.__version__, rest_framework.VERSION, drf_spectacular.__version__,
+                 repr(getattr(settings, "REST_FRAMEWORK", {})), repr(getattr(settings, "SPECTACULAR_SETTINGS", {}))):
+        digest.update(part.encode())
+    base = Path(settings.BASE_DIR)
+    for root in sorted({settings.ROOT_URLCONF.partition(".")[0], *settings.INSTALLED_APPS}):
+        package = base / root.replace(".", os.sep)
+        if not package.is_dir():
+            continue   # third-party / contrib apps are covered by the versions above
+        for path in sorted(package.rglob("*.py")):
+            digest.update(str(path.relative_to(base)).encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+class SchemaDocument:
+    def __init__(self, body):
+        digest         = hashlib.sha256(body).hexdigest()[:32]
+        self.body      = body
+        self.gzipped   = gzip.compress(body, compresslevel=9, mtime=0)
+        self.etag      = '"%s"' % digest
+        self.gzip_etag = '"%s-gzip"' % digest   # a different representation of the same document
+
+
+class SchemaCache:
+    def __init__(self, directory=None):
+        self._directory = directory
+        self._documents = {}
+        self._lock      = threading.Lock()
+
+    @property
+    def directory(self):
+        root = self._directory or getattr(settings, "SCHEMA_CACHE_DIR", None)
+        return Path(root) / code_version() if root else None
+
+    def _path(self, key):
+        return self.directory / ("%s.gz" % re.sub(r"[^\w.-]", "_", "-".join(str(k or "default") for k in key)))
+
+    def get(self, key, build):
+        """The document for ``key`` – from memory, disk, or ``build()`` → bytes, in that order."""
+        versioned = (code_version(), *key)
+        document  = self._documents.get(versioned)
+        if document is not None:
+            return document
+        with self._lock:   # concurrent first requests wait for one build
+            document = self._documents.get(versioned)
+            if document is None:
+                document = self._load(key) or self._store(key, SchemaDocument(build()))
+                self._documents[versioned] = document
+        return document
+
+    def _load(self, key):
+        if self.directory is None:
+            return None
+        try:
+            return SchemaDocument(gzip.decompress(self._path(key).read_bytes()))
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError):
+            logger.warning("Can't read the schema cache under %s", self.directory, exc_info=True)
+            return None
+
+    def _store(self, key, document):
+        if self.directory is None:
+            return document
+        tmp = None
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory)
+            with os.fdopen(fd, "wb") as f:
+                f.write(document.gzipped)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            # e.g. a read-only app directory: serve from memory, rebuild per process
+            logger.warning("Can't write the schema cache under %s", self.directory, exc_info=True)
+            if tmp is not None and os.path.exists(tmp):
+                os.unlink(tmp)
+        return document
+
+    def prune(self):
+        """Delete the files of other code versions; returns how many directories went."""
+        if self.directory is None or not self.directory.parent.is_dir():
+            return 0
+        stale = [d for d in self.directory.parent.iterdir() if d.is_dir() and d != self.directory]
+        for d in stale:
+            shutil.rmtree(d, ignore_errors=True)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+
+
+schemas = SchemaCache()
+
+
+class CachedSpectacularAPIView(SpectacularAPIView):
+    """SpectacularAPIView answering from ``schemas``; regenerates only for a new code version."""
+
+    def render_schema(self, renderer, version):
+        # request=None: the cached document is shared by every client
+        generator = self.generator_class(urlconf=self.urlconf, api_version=version, patterns=self.patterns)
+        return renderer.render(generator.get_schema(request=None, public=True), renderer.media_type, {})
+
+    def _get_schema_response(self, request):
+        if not self.serve_public:   # the schema depends on who asks
+            return super()._get_schema_response(request)
+        version  = self.api_version or request.version or self._get_version_parameter(request)
+        renderer = request.accepted_renderer
+        media    = f"{request.accepted_media_type}; charset={renderer.charset}" if renderer.charset \
+                   else request.accepted_media_type
+        lang     = translation.get_language() if request.GET.get("lang") else None
+        document = schemas.get((renderer.format, version, lang), lambda: self.render_schema(renderer, version))
+
+        zipped = ACCEPTS_GZIP.search(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if {document.etag, document.gzip_etag} & set(parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))):
+            response = HttpResponseNotModified()
+        elif zipped:
+            response = HttpResponse(document.gzipped, content_type=media)
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(document.body, content_type=media)
+        response["ETag"] = document.gzip_etag if zipped else document.etag
+        response["Content-Disposition"] = f'inline; filename="{self._get_filename(request, version)}"'
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        patch_vary_headers(response, ["Accept-Encoding"])
+        return response
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -53,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'backend.db_routers.ReplicaPinningMiddleware',
 ]
 
 REST_FRAMEWORK = {
@@ -68,6 +70,10 @@ SPECTACULAR_SETTINGS = {
     "VERSION": "1.0.0",
     "SERVE_INCLUDE_SCHEMA": False,
 }
+# /api/schema/ is rendered once per code version (backend/schema.py). SCHEMA_VERSION
+# (e.g. the deployed commit) names that version; unset, it's a digest of the sources.
+SCHEMA_VERSION   = os.environ.get("SCHEMA_VERSION")
+SCHEMA_CACHE_DIR = BASE_DIR / ".schema_cache"   # None: memory only
 
 ROOT_URLCONF = 'backend.urls'
 
@@ -87,6 +93,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backend.wsgi.application'
+ASGI_APPLICATION = 'backend.asgi.application'
 
 
 # Database
@@ -96,11 +103,90 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # persistent connections, re-validated before each reuse. Under ASGI each
+        # request runs its queries on a fresh thread, so connections can't be
+        # reused there; backend/asgi.py sets DJANGO_ASGI and they close per request.
+        'CONN_MAX_AGE': 0 if os.environ.get('DJANGO_ASGI') else 60,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Read replicas for the API's read-only endpoints (see backend/db_routers.py).
+# Add each replica to DATABASES and list its alias here, e.g.
+#   DATABASES['replica'] = {**DATABASES['default'], 'HOST': 'replica-1', 'TEST': {'MIRROR': 'default'}}
+#   DATABASE_REPLICAS = ['replica']
+DATABASE_REPLICAS             = []
+DATABASE_ROUTERS              = ['backend.db_routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS        = 5    # reads stay on the primary this long after a write
+REPLICA_HEALTH_CHECK_INTERVAL = 30   # seconds between replica liveness probes
+
+# Covering indexes (INCLUDE) are PostgreSQL-only; on SQLite they degrade to plain indexes.
+SILENCED_SYSTEM_CHECKS = ["models.W040"]
+
+# Optional monthly RANGE partitioning of shipments_shipment (PostgreSQL only):
+# None, "departure_date" or "created_at". See shipments/partitioning.py.
+SHIPMENT_PARTITION_KEY          = None
+SHIPMENT_PARTITION_MONTHS_AHEAD = 3
+
+# Delivered shipments older than this move to ArchivedShipment (shipments/archive.py)
+SHIPMENT_ARCHIVE_AFTER_DAYS  = 90
+SHIPMENT_ARCHIVE_BATCH_SIZE  = 5000
+
+# Change feed (shipments/changefeed.py): rows are served once they are this old, so
+# transactions still in flight can't commit behind a consumer's cursor; a running
+# import holds the feed at its start for at most CHANGE_FEED_MAX_HOLD_SECONDS.
+# Deletions are kept CHANGE_FEED_RETENTION_DAYS; older cursors must resync.
+CHANGE_FEED_SAFETY_LAG_SECONDS = 5
+CHANGE_FEED_MAX_HOLD_SECONDS   = 3600
+CHANGE_FEED_RETENTION_DAYS     = 30
+
+# Per-process LRU of rendered /api/shipments/ pages (shipments/listcache.py); 0 disables.
+# ROWS bounds the rows held across all pages; a larger page isn't cached.
+SHIPMENT_LIST_CACHE_SIZE = 256
+SHIPMENT_LIST_CACHE_ROWS = 50_000
+
+# Customer id cache used by imports and the shipment serializer (shipments/customers.py).
+# Set CUSTOMER_CACHE_ALIAS to a CACHES entry (e.g. django.core.cache.backends.redis.RedisCache)
+# to share it between web and worker processes.
+CUSTOMER_CACHE_SIZE  = 50_000
+CUSTOMER_CACHE_TTL   = 300
+CUSTOMER_CACHE_ALIAS = None
+
+# Warehouse occupancy (shipments/occupancy.py): /api/metrics/ utilisation_pct and
+# /api/metrics/occupancy/. Forecast arrivals continue at the last OCCUPANCY_TREND_DAYS' average.
+WAREHOUSE_CAPACITY_CM3  = 60_000_000_000
+OCCUPANCY_HISTORY_DAYS  = 30
+OCCUPANCY_FORECAST_DAYS = 14
+OCCUPANCY_TREND_DAYS    = 28
+
 # Celery (broker & result backend)
 CELERY_BROKER_URL = CELERY_RESULT_BACKEND = "redis://localhost:6379/0"
+# Queues imports.bulk / imports.small / consolidation (shipments/scheduling.py)
+CELERY_TASK_ROUTES = ("shipments.scheduling.route_task",)
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1   # a worker busy on a big import doesn't hoard queued ones
+
+# `manage.py test` runs tasks inline, without Redis
+TEST_RUNNER = "backend.test_runner.CeleryEagerTestRunner"
+
+IMPORT_BULK_THRESHOLD_BYTES    = 20 * 1024 * 1024   # ≈ 200k rows
+IMPORT_TENANT_CONCURRENCY      = 2
+IMPORT_RETRY_SECONDS           = 30
+IMPORT_MAX_RUNTIME_SECONDS     = 6 * 60 * 60        # longer-running imports count as dead
+CONSOLIDATION_DEBOUNCE_SECONDS = 60                 # None: imports don't trigger a rebuild
+CELERY_BEAT_SCHEDULE = {
+    "ensure-shipment-partitions": {
+        "task":     "shipments.tasks.ensure_shipment_partitions",
+        "schedule": 24 * 60 * 60,   # daily
+    },
+    "archive-delivered-shipments": {
+        "task":     "shipments.tasks.archive_delivered_shipments",
+        "schedule": 24 * 60 * 60,
+    },
+    "prune-shipment-tombstones": {
+        "task":     "shipments.tasks.prune_shipment_tombstones",
+        "schedule": 24 * 60 * 60,
+    },
+}
 
 
 # Password validation
@@ -0,0 +1,21 @@
+"""
+PostgreSQL profile, e.g. for benchmarks, partitioning and the PostgreSQL-only tests::
+
+    PGHOST=localhost PGDATABASE=freight python manage.py test shipments --settings=backend.settings_pg
+
+The connection comes from the usual libpq ``PG*`` environment variables.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+
+DATABASES["default"] = {  # noqa: F405
+    **DATABASES["default"],  # noqa: F405
+    "ENGINE":   "django.db.backends.postgresql",
+    "NAME":     os.environ.get("PGDATABASE", "freight"),
+    "USER":     os.environ.get("PGUSER", ""),
+    "PASSWORD": os.environ.get("PGPASSWORD", ""),
+    "HOST":     os.environ.get("PGHOST", ""),
+    "PORT":     os.environ.get("PGPORT", ""),
+}
+SHIPMENT_PARTITION_KEY = os.environ.get("SHIPMENT_PARTITION_KEY") or None
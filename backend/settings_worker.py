@@ -0,0 +1,22 @@
+"""
+Settings for headless ingestion workers and maintenance commands::
+
+    DJANGO_SETTINGS_MODULE=backend.settings_worker celery -A backend worker -Q imports.bulk
+
+Same database, broker and tuning as ``backend.settings``, without the web
+stack – DRF, drf-spectacular, django-filter, corsheaders, admin, sessions –
+so a cold worker imports only what the tasks use. ``manage.py benchmark
+--scenarios startup`` tracks the difference.
+
+Run ``migrate`` with ``backend.settings``: the apps left out here still have
+tables and migrations of their own.
+"""
+from .settings import *  # noqa: F401,F403
+
+WEB_ONLY_APPS = {
+    "django.contrib.admin", "django.contrib.sessions", "django.contrib.messages",
+    "django.contrib.staticfiles", "rest_framework", "corsheaders", "django_filters", "drf_spectacular",
+}
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in WEB_ONLY_APPS]  # noqa: F405
+MIDDLEWARE     = []
+ROOT_URLCONF   = "backend.urls_worker"
@@ -0,0 +1,24 @@
+"""
+``manage.py test`` runner: Celery tasks run inline, without Redis, whichever
+settings module the suite runs under.
+"""
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+# the Celery app reads these through django.conf.settings on every lookup
+CELERY_TEST_SETTINGS = override_settings(
+    CELERY_BROKER_URL="memory://",
+    CELERY_RESULT_BACKEND="cache+memory://",
+    CELERY_TASK_ALWAYS_EAGER=True,
+    CELERY_TASK_EAGER_PROPAGATES=True,
+)
+
+
+class CeleryEagerTestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        CELERY_TEST_SETTINGS.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        CELERY_TEST_SETTINGS.disable()
+        super().teardown_test_environment(**kwargs)
@@ -16,20 +16,37 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from django.utils.module_loading import import_string
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.routers import DefaultRouter
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
-from shipments.urls import api_router as shipments_router
+from shipments.urls import api_router as shipments_router, async_urlpatterns as shipments_async
 
 master_router = DefaultRouter()
 for app_router in (
     shipments_router,
 ):
     master_router.registry.extend(app_router.registry)
+
+
+def lazy_view(dotted_path, **initkwargs):
+    """Import a class-based view on its first request (drf-spectacular's generator is slow to load)."""
+    resolved = []
+
+    @csrf_exempt
+    def view(request, *args, **kwargs):
+        if not resolved:
+            resolved.append(import_string(dotted_path).as_view(**initkwargs))
+        return resolved[0](request, *args, **kwargs)
+    return view
+
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("api-auth/", include("rest_framework.urls", namespace="rest_framework")),
+    path("api/async/", include(shipments_async)),
     path("api/", include(master_router.urls)),
-    path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
-    path("api/schema/swagger-ui/", SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"),
+    path("api/schema/", lazy_view("backend.schema.CachedSpectacularAPIView"), name="schema"),
+    path("api/schema/swagger-ui/", lazy_view("drf_spectacular.views.SpectacularSwaggerView", url_name="schema"),
+         name="swagger-ui"),
 ]
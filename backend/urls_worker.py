@@ -0,0 +1,2 @@
+"""No routes: ``backend.settings_worker`` processes don't serve HTTP."""
+urlpatterns = []
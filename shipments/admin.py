@@ -1,8 +1,48 @@
 from django.contrib import admin
-from .models import Shipment, CsvImport, Consolidation
+from django.db import transaction
+from .models import (
+    Shipment, CsvImport, Consolidation, ConsolidationShipment, ConsolidationRun, ArchivedShipment, ShipmentEvent,
+)
+from . import changefeed, events, versioning
+from .signals import ShipmentChanges
+
+
+class ShipmentAdmin(admin.ModelAdmin):
+    """Admin edits notify ``shipments_changed`` like every other write path."""
+
+    def save_model(self, request, obj, form, change):
+        changes = ShipmentChanges()
+        before  = Shipment.objects.filter(pk=obj.pk).first() if change else None
+        if before is not None:
+            changes.add_shipment(before)   # state before the write
+        super().save_model(request, obj, form, change)
+        changes.add_shipment(obj)
+        if before is None or events.snapshot(obj) != events.snapshot(before):
+            events.record([obj])
+        changes.send_robust(sender=type(self))
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, Shipment.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        changes = ShipmentChanges()
+        ids     = []
+        for row in queryset.values("shipment_id", "destination", "status", "arrival_date", "departure_date"):
+            ids.append(row.pop("shipment_id"))
+            changes.add(**row)
+        with transaction.atomic():
+            linked = ConsolidationShipment.objects.filter(shipment_id__in=ids).exists()
+            super().delete_queryset(request, queryset)   # cascades to their consolidation links
+            changefeed.tombstone(ids)
+        if linked:
+            versioning.bump(versioning.CONSOLIDATIONS)
+        changes.send_robust(sender=type(self))
 
 
 # Register your models here.
-admin.site.register(Shipment)
+admin.site.register(Shipment, ShipmentAdmin)
 admin.site.register(CsvImport)
-admin.site.register(Consolidation)
\ No newline at end of file
+admin.site.register(Consolidation)
+admin.site.register(ConsolidationRun)
+admin.site.register(ArchivedShipment)
+admin.site.register(ShipmentEvent)
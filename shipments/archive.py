@@ -0,0 +1,97 @@
+"""
+Cold-storage tier for delivered shipments.
+
+``archive_delivered`` moves delivered shipments older than N days – with
+their consolidation link – from ``Shipment`` into ``ArchivedShipment`` in
+bulk batches, folding them into ``ArchiveRollup`` so metrics stay whole.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from . import changefeed, versioning
+from .models import ArchivedShipment, ArchiveRollup, ConsolidationShipment, Shipment, ShipmentTombstone
+from .signals import ShipmentChanges
+
+FIELDS = [
+    "shipment_id", "customer_id", "carrier", "origin", "destination", "weight", "volume",
+    "mode", "arrival_date", "departure_date", "delivered_date", "created_at", "updated_at",
+]
+ROLLUP_KEY = ("carrier", "mode", "arrival_date", "departure_date")
+
+
+def _fold_into_rollups(rows):
+    totals = defaultdict(lambda: [0, 0.0])
+    for row in rows:
+        bucket = totals[tuple(row[k] for k in ROLLUP_KEY)]
+        bucket[0] += 1
+        bucket[1] += row["volume"]
+
+    arrivals = {key[2] for key in totals if key[2] is not None}
+    existing = {
+        tuple(getattr(r, k) for k in ROLLUP_KEY): r
+        for r in ArchiveRollup.objects.select_for_update().filter(
+            Q(arrival_date__in=arrivals) | Q(arrival_date__isnull=True)
+        )
+    }
+    to_update, to_create = [], []
+    for key, (count, volume) in totals.items():
+        if key in existing:
+            rollup = existing[key]
+            rollup.shipments += count
+            rollup.volume    += volume
+            to_update.append(rollup)
+        else:
+            to_create.append(ArchiveRollup(**dict(zip(ROLLUP_KEY, key)), shipments=count, volume=volume))
+    ArchiveRollup.objects.bulk_update(to_update, ["shipments", "volume"])
+    ArchiveRollup.objects.bulk_create(to_create)
+
+
+def archive_delivered(older_than_days=None, batch_size=None, today=None):
+    """Archive delivered shipments whose delivered_date is older than the cutoff. Returns the count."""
+    if older_than_days is None:
+        older_than_days = settings.SHIPMENT_ARCHIVE_AFTER_DAYS
+    batch_size = batch_size or settings.SHIPMENT_ARCHIVE_BATCH_SIZE
+    cutoff     = (today or date.today()) - timedelta(days=older_than_days)
+    candidates = Shipment.objects.filter(status="delivered", delivered_date__lt=cutoff).order_by("pk")
+
+    archived = unlinked = 0
+    changes  = ShipmentChanges()
+    while True:
+        with transaction.atomic():
+            rows = list(candidates.values(*FIELDS)[:batch_size])
+            if not rows:
+                break
+            ids   = [row["shipment_id"] for row in rows]
+            links = ConsolidationShipment.objects.filter(shipment_id__in=ids)
+            consolidation_of = dict(links.values_list("shipment_id", "consolidation_id"))
+
+            ArchivedShipment.objects.bulk_create(
+                [ArchivedShipment(**row, consolidation_id=consolidation_of.get(row["shipment_id"]))
+                 for row in rows],
+                ignore_conflicts=True,
+            )
+            _fold_into_rollups(rows)
+            for row in rows:
+                changes.add(row["destination"], "delivered", row["arrival_date"], row["departure_date"])
+            unlinked += links.delete()[0]
+            Shipment.objects.filter(pk__in=ids).delete()
+            changefeed.tombstone(ids, ShipmentTombstone.ARCHIVED)
+        archived += len(rows)
+    if unlinked:   # /api/consolidations/ listed these shipments
+        versioning.bump(versioning.CONSOLIDATIONS)
+    changes.send_robust(sender=ArchivedShipment)
+    return archived
+
+
+def archived_rollups(window):
+    """
+    Rollups matching a ``window_filter`` window. Rollups only carry
+    departure_date, so a created_at window matches no archived rows.
+    """
+    if any(not k.startswith("departure_date") for k in window):
+        return ArchiveRollup.objects.none()
+    return ArchiveRollup.objects.filter(**window)
@@ -0,0 +1,180 @@
+"""
+ASGI-native read endpoints under ``/api/async/``.
+
+Same payloads as the DRF viewsets, served by plain ``async def`` views on
+Django's async ORM, so under ASGI a request waiting on the database doesn't
+hold a sync-pool thread. The DRF serializers still shape the rows – they only
+touch already-fetched instances – and the metrics aggregates run concurrently.
+"""
+import asyncio
+from functools import wraps
+from math import ceil
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import connection, connections
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from backend.db_routers import allow_replica_reads
+
+from . import versioning
+from .filters import ShipmentFilter
+from .listcache import current_versions, shipment_lists, signature
+from .metrics import build_metrics, cache_key, metrics_queries, parse_window
+from .models import ArchivedShipment, Consolidation, CsvImport, Shipment
+from .serializers import ArchivedShipmentSerializer, ConsolidationModelSerializer, ShipmentSerializer
+from .views import BulkPagination, MetricsViewSet
+
+
+def _json(data, status=200, **kwargs):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False, **kwargs)
+
+
+def _not_found(detail="Not found."):
+    return _json({"detail": detail}, status=404)
+
+
+def async_read(*scopes, daily=False):
+    """
+    GET/HEAD only, replica-eligible and – given ``scopes`` – answered 304
+    from the data versions like the DRF views. The versions are fetched off
+    the event loop first, so ``condition`` finds them cached on the request.
+    """
+    def decorator(view):
+        guarded = versioning.conditional(scopes, daily)(view) if scopes else view
+
+        @require_safe
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            allow_replica_reads()
+            if scopes:
+                await sync_to_async(versioning.versions)(request, scopes)
+            return await guarded(request, *args, **kwargs)
+        return inner
+    return decorator
+
+
+def _page_size(request, paginator=BulkPagination):
+    """``paginator``'s page size: PAGE_SIZE, or a valid ?page_size= capped at its ``max_page_size``."""
+    try:
+        asked = int(request.GET.get(paginator.page_size_query_param) or 0)
+    except ValueError:
+        asked = 0
+    return min(asked, paginator.max_page_size) if asked > 0 else api_settings.PAGE_SIZE
+
+
+async def _paginate(request, qs, serializer_class):
+    """BulkPagination's count / next / previous / results envelope, or None for a bad page."""
+    page_size = _page_size(request)
+    count     = await qs.acount()
+    pages     = max(ceil(count / page_size), 1)
+    raw       = request.GET.get("page") or 1
+    try:
+        page = pages if raw == "last" else int(raw)
+    except ValueError:
+        return None
+    if not 1 <= page <= pages:
+        return None
+
+    rows = [obj async for obj in qs[(page - 1) * page_size:page * page_size]]
+    url  = request.build_absolute_uri()
+    if page == 1:
+        previous = None
+    elif page == 2:
+        previous = remove_query_param(url, "page")
+    else:
+        previous = replace_query_param(url, "page", page - 1)
+    return {
+        "count":    count,
+        "next":     replace_query_param(url, "page", page + 1) if page < pages else None,
+        "previous": previous,
+        "results":  serializer_class(rows, many=True).data,
+    }
+
+
+@async_read(versioning.SHIPMENTS)
+async def shipment_list(request):
+    key, scopes = signature(request)
+    current     = await sync_to_async(current_versions)(request, scopes)
+    data        = shipment_lists.get(key, current)
+    if data is not None:
+        return _json(data, headers={"X-Cache": "HIT"})
+
+    filterset = ShipmentFilter(request.GET, queryset=Shipment.objects.all())
+    if not filterset.is_valid():
+        return _json({field: [str(e) for e in errors] for field, errors in filterset.errors.items()},
+                     status=400)
+    data = await _paginate(request, filterset.qs, ShipmentSerializer)
+    if data is None:
+        return _not_found("Invalid page.")
+    shipment_lists.set(key, current, data)
+    return _json(data, headers={"X-Cache": "MISS"})
+
+
+@async_read(versioning.SHIPMENTS)
+async def shipment_detail(request, pk):
+    shipment = await Shipment.objects.filter(pk=pk).afirst()
+    if shipment is not None:
+        return _json(ShipmentSerializer(shipment).data)
+    # delivered shipments may have moved to cold storage (shipments.archive)
+    archived = await ArchivedShipment.objects.filter(pk=pk).afirst()
+    if archived is None:
+        return _not_found()
+    return _json(ArchivedShipmentSerializer(archived).data)
+
+
+@async_read(versioning.CONSOLIDATIONS)
+async def consolidation_list(request):
+    qs   = Consolidation.objects.prefetch_related("consolidationshipment_set")
+    data = await _paginate(request, qs, ConsolidationModelSerializer)
+    return _json(data) if data is not None else _not_found("Invalid page.")
+
+
+@async_read()
+async def import_progress(request, pk):
+    progress = await CsvImport.objects.filter(pk=pk).values("processed_rows", "total_rows").afirst()
+    if progress is None:
+        return _not_found()
+    return _json({"processed": progress["processed_rows"], "total": progress["total_rows"]})
+
+
+def _own_connection(query):
+    # executor threads never see request_finished and may idle indefinitely,
+    # so the connection a query opens there is closed as soon as it's done
+    def run():
+        try:
+            return query()
+        finally:
+            connections.close_all()
+    return run
+
+
+async def _run(query):
+    # On a client/server database each aggregate gets a worker thread (and
+    # connection) of its own, so they really overlap. SQLite serialises
+    # access to the file anyway, so there they share the request's thread.
+    if connection.vendor == "sqlite":
+        return await sync_to_async(query)()
+    return await sync_to_async(_own_connection(query), thread_sensitive=False)()
+
+
+@async_read(versioning.SHIPMENTS, daily=True)
+async def metrics(request):
+    try:
+        window = parse_window(request.GET)
+    except ValueError as exc:
+        return _json({"detail": [str(exc)]}, status=400)
+    versions   = await sync_to_async(versioning.versions)(request, [versioning.SHIPMENTS])
+    key        = cache_key(versions[versioning.SHIPMENTS][0], window)
+
+    data = await cache.aget(key)
+    if data is None:
+        queries = metrics_queries(window)
+        results = await asyncio.gather(*(_run(query) for query in queries.values()))
+        data    = build_metrics(dict(zip(queries, results)))
+        await cache.aset(key, data, MetricsViewSet.CACHE_TIMEOUT)
+    return _json(data)
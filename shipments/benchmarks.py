@@ -0,0 +1,390 @@
+"""
+Benchmark scenarios run by ``manage.py benchmark``.
+
+Every scenario takes a ``BenchContext`` and returns a dict of measurements;
+timings are in seconds. Scenarios run against whatever database is current,
+so the command wraps them in a throwaway test database.
+"""
+import csv
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from datetime import date, timedelta
+from time import perf_counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import Coalesce, TruncWeek
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory
+
+from .filters import ShipmentFilter
+from .listcache import shipment_lists
+from . import lanes, occupancy
+from .models import CsvImport, LaneRollup, OccupancyDay, Shipment, ShipmentEvent
+from .renderers import BINARY_RENDERERS
+from .signals import ShipmentChanges
+from .synthetic import write_manifest
+from .tasks import generate_consolidations, process_csv
+from .views import BulkPagination, MetricsViewSet, ShipmentViewSet
+
+REPEAT = 5
+
+
+class BenchContext:
+    def __init__(self, rows, seed=42, repeat=REPEAT):
+        self.rows    = rows
+        self.seed    = seed
+        self.repeat  = repeat
+        self.factory = APIRequestFactory(SERVER_NAME="localhost")
+
+
+def _timings(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = perf_counter()
+        fn()
+        samples.append(perf_counter() - t0)
+    return {
+        "seconds": round(statistics.median(samples), 6),
+        "min_s":   round(min(samples), 6),
+        "max_s":   round(max(samples), 6),
+    }
+
+
+def _get(ctx, viewset, actions, path, **params):
+    view     = viewset.as_view(actions)
+    response = view(ctx.factory.get(path, params))
+    response.render()
+    if response.status_code != 200:
+        raise RuntimeError(f"GET {path} {params} → {response.status_code}")
+    return response
+
+
+def bench_ingest(ctx):
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        t0 = perf_counter()
+        with os.fdopen(fd, "w", newline="") as f:
+            write_manifest(f, ctx.rows, ctx.seed)
+        generate_s = perf_counter() - t0
+
+        imp = CsvImport.objects.create(file_name=os.path.basename(path), total_rows=ctx.rows)
+
+        t0 = perf_counter()
+        with override_settings(CONSOLIDATION_DEBOUNCE_SECONDS=None):   # timed by "consolidate"
+            process_csv.run(imp.id, path)
+        seconds = perf_counter() - t0
+    finally:
+        os.unlink(path)
+
+    imp.refresh_from_db()
+    return {
+        "seconds":      round(seconds, 6),
+        "rows_per_sec": round(ctx.rows / seconds, 1),
+        "generate_s":   round(generate_s, 6),
+        "telemetry":    imp.telemetry,
+    }
+
+
+def bench_consolidate(ctx):
+    t0 = perf_counter()
+    result = generate_consolidations.run()
+    return {"seconds": round(perf_counter() - t0, 6), "result": result}
+
+
+def bench_metrics(ctx):
+    def cold():
+        cache.clear()
+        _get(ctx, MetricsViewSet, {"get": "list"}, "/api/metrics/")
+    return _timings(cold, ctx.repeat)
+
+
+def bench_paginate(ctx):
+    """List pages with a cold list cache, plus one popular filter served from it."""
+    total    = Shipment.objects.count()
+    last     = max((total + 49) // 50, 1)
+    actions  = {"get": "list"}
+    results  = {}
+    for name, params in (
+        ("first_page",    {}),
+        ("middle_page",   {"page": max(last // 2, 1)}),
+        ("last_page",     {"page": last}),
+        ("filtered",      {"status": "in-transit", "destination": "JAM"}),
+        ("date_range",    {"arrival_after": "2025-06-01", "arrival_before": "2025-06-07"}),
+    ):
+        def cold():
+            shipment_lists.clear()
+            _get(ctx, ShipmentViewSet, actions, "/api/shipments/", **params)
+        results[name] = _timings(cold, ctx.repeat)
+    results["seconds"] = round(sum(r["seconds"] for r in results.values()), 6)
+
+    popular = {"status": "in-transit", "destination": "JAM"}
+    shipment_lists.reset_stats()
+    results["filtered_cached"] = _timings(
+        lambda: _get(ctx, ShipmentViewSet, actions, "/api/shipments/", **popular), ctx.repeat
+    )
+    results["filtered_cached"]["cache"] = shipment_lists.stats()
+    return results
+
+
+def bench_formats(ctx):
+    """One bulk page of shipments per response format: request time and body size."""
+    size    = min(max(Shipment.objects.count(), 1), BulkPagination.max_page_size)
+    results = {}
+    for fmt in ["json", *(renderer.format for renderer in BINARY_RENDERERS)]:
+        def cold():
+            shipment_lists.clear()
+            return _get(ctx, ShipmentViewSet, {"get": "list"}, "/api/shipments/", format=fmt, page_size=size)
+        results[fmt] = {**_timings(cold, ctx.repeat), "bytes": len(cold().content)}
+    results["rows"]    = size
+    results["seconds"] = results["msgpack" if "msgpack" in results else "json"]["seconds"]
+    return results
+
+
+def bench_dwell(ctx):
+    """Days-in-status percentiles over the event log written by ``ingest``."""
+    results = {
+        group_by: _timings(lambda: _get(ctx, MetricsViewSet, {"get": "dwell"}, "/api/metrics/dwell/",
+                                        group_by=group_by), ctx.repeat)
+        for group_by in ("lane", "carrier")
+    }
+    results["events"]  = ShipmentEvent.objects.count()
+    results["seconds"] = round(sum(r["seconds"] for r in results.values() if isinstance(r, dict)), 6)
+    return results
+
+
+def bench_lanes(ctx):
+    """Top lanes and a destination slice off the lane cube vs. the same GROUP BYs over the shipments."""
+    destination = Shipment.objects.values_list("destination", flat=True).first()
+    by_week     = Shipment.objects.filter(destination=destination).annotate(
+        week=TruncWeek(Coalesce("departure_date", "arrival_date"), output_field=DateField()))
+    results = {
+        "top_lanes": _timings(lambda: lanes.query(top=10), ctx.repeat),
+        "slice":     _timings(lambda: lanes.query(["mode", "week"], top=1000, destination=[destination]),
+                              ctx.repeat),
+        "raw_top_lanes": _timings(lambda: list(
+            Shipment.objects.values("origin", "destination").annotate(n=Count("*")).order_by("-n")[:10]),
+            ctx.repeat),
+        "raw_slice": _timings(lambda: list(
+            by_week.values("mode", "week").annotate(n=Count("*"), w=Sum("weight")).order_by("-n")[:1000]),
+            ctx.repeat),
+        "rebuild":   _timings(lanes.rebuild, 1),
+        "cells":     LaneRollup.objects.count(),
+    }
+    results["seconds"] = round(results["top_lanes"]["seconds"] + results["slice"]["seconds"], 6)
+    return results
+
+
+def bench_occupancy(ctx):
+    """Utilisation off the occupancy table vs. SUM(volume) over the shipments, plus its upkeep."""
+    day     = Shipment.objects.filter(arrival_date__isnull=False).values_list("arrival_date", flat=True).first()
+    changes = ShipmentChanges()
+    changes.add("JAM", "received", day, day and day + timedelta(days=3))
+    results = {
+        "on_hand":     _timings(occupancy.on_hand, ctx.repeat),
+        "raw_sum":     _timings(lambda: Shipment.objects.aggregate(v=Sum("volume")), ctx.repeat),
+        "forecast":    _timings(lambda: _get(ctx, MetricsViewSet, {"get": "occupancy"}, "/api/metrics/occupancy/"),
+                                ctx.repeat),
+        "refresh":     _timings(lambda: occupancy.refresh(changes), ctx.repeat),
+        "rebuild":     _timings(occupancy.rebuild, 1),
+        "days":        OccupancyDay.objects.count(),
+    }
+    results["seconds"] = round(results["on_hand"]["seconds"] + results["forecast"]["seconds"], 6)
+    return results
+
+
+def bench_changes(ctx):
+    """Change feed: a full initial sync vs. an idle poll from the final cursor."""
+    def drain(cursor=None):
+        records = 0
+        while True:
+            response = ShipmentViewSet.as_view({"get": "changes"})(
+                ctx.factory.get("/api/shipments/changes/", {"cursor": cursor} if cursor else {}))
+            lines    = b"".join(response.streaming_content).splitlines()
+            trailer  = json.loads(lines[-1])
+            records += len(lines) - 1
+            cursor   = trailer["cursor"] or cursor
+            if not trailer["more"]:
+                return records, cursor
+
+    with override_settings(CHANGE_FEED_SAFETY_LAG_SECONDS=0):
+        t0 = perf_counter()
+        records, cursor = drain()
+        full_s = perf_counter() - t0
+        idle   = _timings(lambda: drain(cursor), ctx.repeat)
+    return {"seconds": round(full_s, 6), "records": records, "idle_poll": idle}
+
+
+def bench_export(ctx):
+    """Full-table dump in import column order, streamed through the cursor."""
+    fields = [
+        "shipment_id", "customer_id", "origin", "destination", "weight", "volume",
+        "mode", "carrier", "status", "arrival_date", "departure_date", "delivered_date",
+    ]
+    t0 = perf_counter()
+    with open(os.devnull, "w", newline="") as out:
+        writer = csv.writer(out)
+        writer.writerow(fields)
+        rows = 0
+        for row in Shipment.objects.order_by().values_list(*fields).iterator(chunk_size=5000):
+            writer.writerow(row)
+            rows += 1
+    seconds = perf_counter() - t0
+    return {
+        "seconds":      round(seconds, 6),
+        "rows":         rows,
+        "rows_per_sec": round(rows / seconds, 1) if seconds else None,
+    }
+
+
+def plan_queries():
+    """The dashboard aggregates and popular ShipmentFilter combinations, unevaluated."""
+    qs = Shipment.objects.order_by()
+    filtered = lambda **params: ShipmentFilter(params, queryset=Shipment.objects.all()).qs[:50]
+    days     = [date(2025, 6, 2), date(2025, 6, 9)]   # days an occupancy refresh recomputes
+    return {
+        "metrics.counts":          qs.values("status").annotate(total=Count("*")),
+        "metrics.utilisation":     OccupancyDay.objects.filter(day__lte=date.today()).order_by("-day")
+                                       .values("on_hand")[:1],
+        "occupancy.arrivals":      qs.filter(arrival_date__in=days).values(day=F("arrival_date"))
+                                       .annotate(volume=Sum("volume")),
+        "occupancy.departures":    qs.filter(departure_date__in=days).values(day=F("departure_date"))
+                                       .annotate(volume=Sum("volume")),
+        "metrics.by_carrier":      qs.values("carrier").annotate(total=Count("*")),
+        "metrics.volume_by_mode":  qs.values("mode").annotate(total_volume=Sum("volume")),
+        "metrics.per_day":         qs.values(date=F("arrival_date")).annotate(count=Count("*")),
+        "consolidation.groups":    qs.values("destination", "departure_date").annotate(
+                                       count=Count("*"), total_weight=Sum("weight"), total_volume=Sum("volume")),
+        "filter.destination_status": filtered(destination="JAM", status="in-transit"),
+        "filter.open_arrivals":    filtered(status="received", arrival_after="2025-06-01"),
+        "filter.origin":           filtered(origin="FL", destination="JAM"),
+        "filter.carrier":          filtered(carrier="Crowley"),
+        "filter.arrival_range":    filtered(arrival_after="2025-06-01", arrival_before="2025-06-07"),
+        "filter.departure_range":  filtered(departure_after="2025-06-01", departure_before="2025-06-07"),
+    }
+
+
+def classify_plan(plan):
+    """
+    Reduce an EXPLAIN (PostgreSQL) / EXPLAIN QUERY PLAN (SQLite) text to the
+    worst access path on ``shipments_shipment``, from worst to best:
+    seq_scan, index_walk (whole index, non-covering), index_range, index_only.
+    """
+    lines = [l for l in plan.splitlines() if "shipments_shipment" in l or "Scan" in l]
+    if any("Seq Scan" in l or (" SCAN " in f" {l} " and "INDEX" not in l) for l in lines):
+        return "seq_scan"
+    if any(" SCAN " in f" {l} " and "COVERING" not in l for l in lines) or _walks_index(plan):
+        return "index_walk"
+    if any("Index Scan" in l or "Bitmap" in l or ("INDEX" in l and "COVERING" not in l) for l in lines):
+        return "index_range"
+    return "index_only"
+
+
+def _walks_index(plan):
+    """Whether a PostgreSQL Index Scan node reads its whole index (no Index Cond, e.g. ORDER BY pk + Filter)."""
+    nodes = re.split(r"\n\s*->", "\n" + plan)
+    return any(re.match(r"\s*Index Scan( Backward)? using \S+ on shipments_shipment", node)
+               and "Index Cond" not in node for node in nodes)
+
+
+def bench_plans(ctx):
+    """Access path of each dashboard / filter query (run after ``ingest``)."""
+    with connection.cursor() as cur:
+        # VACUUM also sets the visibility map that index-only scans rely on
+        # (autovacuum would, after a bulk load); it can't run in a transaction.
+        vacuum = connection.vendor == "postgresql" and not connection.in_atomic_block
+        cur.execute("VACUUM ANALYZE" if vacuum else "ANALYZE")
+    results = {}
+    for name, qs in plan_queries().items():
+        plan = qs.explain()
+        results[name] = {"access": classify_plan(plan), "plan": plan}
+    return results
+
+
+# settings module and what a process imports before it can serve its first task / request
+STARTUP_PROFILES = {
+    "worker": ("backend.settings_worker", "from backend.celery import app; app.loader.import_default_modules()"),
+    "web":    ("backend.settings",        "from django.urls import get_resolver; get_resolver().url_patterns"),
+}
+WEB_STACK = {"rest_framework", "drf_spectacular", "django_filters", "corsheaders"}
+
+
+def boot(profile, importtime=False):
+    """
+    Start a fresh interpreter on a ``STARTUP_PROFILES`` entry → (seconds,
+    loaded modules, self import time in ms per top-level package).
+    """
+    settings_module, ready = STARTUP_PROFILES[profile]
+    code = f"import sys, django; django.setup(); {ready}; print(*sys.modules, sep='\\n')"
+    args = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c", code]
+    env  = {**os.environ, "DJANGO_SETTINGS_MODULE": settings_module}
+    t0   = perf_counter()
+    proc = subprocess.run(args, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True)
+    seconds = perf_counter() - t0
+
+    packages = Counter()
+    for line in proc.stderr.splitlines():   # "import time: self [us] | cumulative | module"
+        if line.startswith("import time:") and "|" in line:
+            own, _, module = (part.strip() for part in line[len("import time:"):].split("|"))
+            if own.isdigit():
+                packages[module.split(".")[0]] += int(own) / 1000
+    return seconds, set(proc.stdout.split()), packages
+
+
+def bench_startup(ctx):
+    """Cold start of an ingestion worker and a web process; ``seconds`` is the worker's."""
+    results = {}
+    for profile in STARTUP_PROFILES:
+        timing = _timings(lambda: boot(profile), ctx.repeat)
+        _, modules, packages = boot(profile, importtime=True)
+        results[profile] = {
+            **timing,
+            "modules":     len(modules),
+            "web_stack":   sorted(WEB_STACK & {m.split(".")[0] for m in modules}),
+            "heaviest_ms": {name: round(ms, 1) for name, ms in packages.most_common(8)},
+        }
+    return {"seconds": results["worker"]["seconds"], **results}
+
+
+# Order matters: later scenarios read what "ingest" loaded.
+SCENARIOS = {
+    "ingest":      bench_ingest,
+    "consolidate": bench_consolidate,
+    "metrics":     bench_metrics,
+    "paginate":    bench_paginate,
+    "formats":     bench_formats,
+    "dwell":       bench_dwell,
+    "lanes":       bench_lanes,
+    "occupancy":   bench_occupancy,
+    "changes":     bench_changes,
+    "export":      bench_export,
+    "plans":       bench_plans,
+    "startup":     bench_startup,
+}
+
+
+def run_scenarios(ctx, names=None):
+    names = names or list(SCENARIOS)
+    return {name: SCENARIOS[name](ctx) for name in SCENARIOS if name in names}
+
+
+def compare(current, baseline, threshold):
+    """
+    List scenarios whose median time grew by more than ``threshold``
+    (0.1 = 10%) relative to a previous results document.
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name, {}).get("seconds")
+        after  = result.get("seconds")
+        if before and after and after > before * (1 + threshold):
+            regressions.append(f"{name}: {before:.4f}s → {after:.4f}s (+{(after / before - 1) * 100:.0f}%)")
+    return regressions
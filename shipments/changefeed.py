@@ -0,0 +1,143 @@
+"""
+Incremental change feed for downstream consumers (``/api/shipments/changes/``).
+
+Shipments are read in ``(updated_at, shipment_id)`` order off the
+``shp_updated`` index, merged with ``ShipmentTombstone`` rows for deletions
+and archiving, and resumed from an opaque cursor encoding the last position.
+
+Timestamps are taken when a row is written, not when its transaction
+commits, so the feed only serves rows older than a *horizon*: now minus
+``CHANGE_FEED_SAFETY_LAG_SECONDS`` and never past the start of a running
+import (the COPY path holds one long transaction). A row committed late
+therefore still lands after every cursor handed out so far. Both the
+horizon and the page are read from the primary: a lagging replica would miss
+rows the horizon already counts as settled, and ``stream`` runs lazily,
+after the request's replica routing has been torn down.
+"""
+import base64
+import heapq
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Min, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import CsvImport, Shipment, ShipmentTombstone
+
+FIELDS = [
+    "shipment_id", "customer", "carrier", "origin", "destination", "weight", "volume",
+    "mode", "status", "arrival_date", "departure_date", "delivered_date", "created_at", "updated_at",
+]
+CHUNK = 5000
+
+
+class CursorError(ValueError):
+    pass
+
+
+class CursorExpired(CursorError):
+    pass
+
+
+def encode_cursor(position):
+    stamp, shipment_id = position
+    raw = json.dumps([stamp.isoformat(), shipment_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        stamp, shipment_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        stamp = parse_datetime(stamp)
+    except (ValueError, TypeError):
+        raise CursorError("malformed cursor")
+    if stamp is None or not isinstance(shipment_id, str):
+        raise CursorError("malformed cursor")
+    return stamp, shipment_id
+
+
+def horizon(now=None):
+    """Latest position that can no longer gain rows."""
+    now   = now or timezone.now()
+    limit = now - timedelta(seconds=getattr(settings, "CHANGE_FEED_SAFETY_LAG_SECONDS", 5))
+    # an import stuck in PROCESSING for longer than this no longer holds the feed back
+    stuck = now - timedelta(seconds=getattr(settings, "CHANGE_FEED_MAX_HOLD_SECONDS", 3600))
+    running = (CsvImport.objects.using(DEFAULT_DB_ALIAS).filter(status="PROCESSING")
+               .alias(began=Coalesce("started_at", "uploaded_at")).filter(began__gte=stuck)
+               .aggregate(oldest=Min(Coalesce("started_at", "uploaded_at")))["oldest"])
+    return min(limit, running) if running else limit
+
+
+def tombstone(shipment_ids, reason=ShipmentTombstone.DELETED):
+    now = timezone.now()
+    ShipmentTombstone.objects.bulk_create(
+        [ShipmentTombstone(shipment_id=sid, deleted_at=now, reason=reason) for sid in shipment_ids]
+    )
+
+
+def prune_tombstones(now=None):
+    cutoff = (now or timezone.now()) - timedelta(days=settings.CHANGE_FEED_RETENTION_DAYS)
+    deleted, _ = ShipmentTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
+
+
+def _after(field, position):
+    if position is None:
+        return Q()
+    # (stamp, id) > position; the leading >= bounds the index range scan
+    stamp, shipment_id = position
+    return Q(**{f"{field}__gte": stamp}) & (Q(**{f"{field}__gt": stamp}) | Q(shipment_id__gt=shipment_id))
+
+
+def start(cursor=None, now=None):
+    """
+    Validate ``cursor`` → (position, horizon) for ``stream``. Raises
+    CursorError for a bad cursor and CursorExpired when deletions since it
+    may already have been pruned (the consumer must resync from scratch).
+    """
+    now      = now or timezone.now()
+    position = decode_cursor(cursor) if cursor else None
+    if position and position[0] < now - timedelta(days=settings.CHANGE_FEED_RETENTION_DAYS):
+        raise CursorExpired("cursor is older than the tombstone retention; resync from the start")
+    return position, horizon(now)
+
+
+def stream(position, until, limit):
+    """
+    Yield up to ``limit`` records after ``position`` – ``op`` "upsert" with
+    the shipment's fields or "delete" with ``shipment_id`` and ``reason`` –
+    then a trailer ``{"cursor": ..., "more": bool}`` to resume from. Once
+    caught up the cursor points just past ``until``.
+    """
+    upserts = (
+        Shipment.objects.using(DEFAULT_DB_ALIAS)
+        .filter(_after("updated_at", position), updated_at__lte=until)
+        .order_by("updated_at", "shipment_id").values(*FIELDS)[:limit + 1]
+    )
+    deletes = (
+        ShipmentTombstone.objects.using(DEFAULT_DB_ALIAS)
+        .filter(_after("deleted_at", position), deleted_at__lte=until)
+        .order_by("deleted_at", "shipment_id").values("shipment_id", "deleted_at", "reason")[:limit + 1]
+    )
+    merged = heapq.merge(
+        (((row["updated_at"], row["shipment_id"]), "upsert", row) for row in upserts.iterator(chunk_size=CHUNK)),
+        (((row["deleted_at"], row["shipment_id"]), "delete", row) for row in deletes.iterator(chunk_size=CHUNK)),
+        key=lambda item: item[0],
+    )
+
+    sent, last, more = 0, position, False
+    for pos, op, row in merged:
+        if sent == limit:
+            more = True
+            break
+        yield {"op": op, **row}
+        sent, last = sent + 1, pos
+    if not more:
+        # caught up: resume from the horizon itself, so a cursor polled on a quiet
+        # table keeps moving and doesn't expire with the tombstone retention
+        last = (until + timedelta(microseconds=1), "")
+    yield {"cursor": encode_cursor(last), "more": more}
@@ -0,0 +1,142 @@
+"""
+Customer dimension cache for the importer and the serializers.
+
+A bounded, per-process LRU with a TTL sits in front of ``Customer``; when
+``CUSTOMER_CACHE_ALIAS`` names a ``CACHES`` entry (e.g. Redis) it is checked
+as a shared second level before the database. Lookups resolve whole batches
+with a single ``pk__in`` query, and ``signals`` drop entries when a customer is
+saved or deleted (other processes catch up within the TTL).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .models import Customer
+
+FIELDS     = ("customer_id", "name", "email")
+KEY_PREFIX = "customer:"
+
+
+class CustomerCache:
+    def __init__(self, max_entries=None, ttl=None, alias=None):
+        self._max_entries = max_entries
+        self._ttl         = ttl
+        self._alias       = alias
+        self._entries     = OrderedDict()   # customer_id → (expires_at, (name, email))
+        self._lock        = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = self.shared_hits = self.misses = self.loads = 0
+
+    def _setting(self, value, name, default):
+        return value if value is not None else getattr(settings, name, default)
+
+    @property
+    def capacity(self):
+        return self._setting(self._max_entries, "CUSTOMER_CACHE_SIZE", 50_000)
+
+    @property
+    def ttl(self):
+        return self._setting(self._ttl, "CUSTOMER_CACHE_TTL", 300)
+
+    @property
+    def shared(self):
+        alias = self._setting(self._alias, "CUSTOMER_CACHE_ALIAS", None)
+        return caches[alias] if alias else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, rows):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for pk, values in rows.items():
+                self._entries[pk] = (expires, values)
+                self._entries.move_to_end(pk)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def get_many(self, ids):
+        """{customer_id: Customer} for the ``ids`` that exist; one query at most."""
+        ids, found, now = {str(pk) for pk in ids if pk not in (None, "")}, {}, time.monotonic()
+        with self._lock:
+            for pk in ids:
+                entry = self._entries.get(pk)
+                if entry and entry[0] > now:
+                    self._entries.move_to_end(pk)
+                    found[pk] = entry[1]
+        self.hits += len(found)
+
+        missing = ids - found.keys()
+        shared  = self.shared
+        if missing and shared is not None:
+            remote = {k[len(KEY_PREFIX):]: tuple(v)
+                      for k, v in shared.get_many([KEY_PREFIX + pk for pk in missing]).items()}
+            self.shared_hits += len(remote)
+            self._remember(remote)
+            found.update(remote)
+            missing -= remote.keys()
+
+        if missing:
+            self.misses += len(missing)
+            self.loads  += 1
+            loaded = {pk: (name, email) for pk, name, email in
+                      Customer.objects.filter(pk__in=missing).values_list(*FIELDS)}
+            self._remember(loaded)
+            if shared is not None and loaded:
+                shared.set_many({KEY_PREFIX + pk: list(v) for pk, v in loaded.items()}, self.ttl)
+            found.update(loaded)
+
+        return {pk: Customer.from_db(DEFAULT_DB_ALIAS, FIELDS, (pk, *values)) for pk, values in found.items()}
+
+    def get(self, pk):
+        return self.get_many([pk]).get(str(pk))
+
+    def ensure(self, ids):
+        """Create the ``ids`` that don't exist yet (blank name/email), in bulk."""
+        known   = self.get_many(ids)
+        missing = {str(pk) for pk in ids if pk not in (None, "")} - known.keys()
+        if missing:
+            Customer.objects.bulk_create([Customer(customer_id=pk, name="") for pk in missing],
+                                         ignore_conflicts=True)
+            # not before they're committed: a rolled-back batch must not leave them cached
+            transaction.on_commit(lambda: self._remember({pk: ("", "") for pk in missing}))
+        return len(missing)
+
+    def warm(self, ids=None):
+        """Preload ``ids`` – or, by default, as many customers as fit."""
+        if ids is not None:
+            return len(self.get_many(ids))
+        rows = Customer.objects.order_by().values_list(*FIELDS)[:self.capacity]
+        self._remember({pk: (name, email) for pk, name, email in rows.iterator(chunk_size=5000)})
+        return len(self._entries)
+
+    def invalidate(self, ids):
+        ids = [str(pk) for pk in ids]
+        with self._lock:
+            for pk in ids:
+                self._entries.pop(pk, None)
+        if self.shared is not None:
+            self.shared.delete_many([KEY_PREFIX + pk for pk in ids])
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "entries":     len(self._entries),
+            "capacity":    self.capacity,
+            "ttl_s":       self.ttl,
+            "hits":        self.hits,
+            "shared_hits": self.shared_hits,
+            "misses":      self.misses,
+            "db_loads":    self.loads,
+            "hit_ratio":   round((self.hits + self.shared_hits) / lookups, 4) if lookups else None,
+        }
+
+
+customer_cache = CustomerCache()
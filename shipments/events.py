@@ -0,0 +1,145 @@
+"""
+Shipment status history (``ShipmentEvent``) and dwell-time analytics.
+
+A shipment's status only moves forward – received → in-transit → delivered –
+and each step has a date column on ``Shipment``. ``derive`` turns a snapshot
+into the events it implies; writers (imports, the API, admin) insert them in
+bulk with ``ignore_conflicts``, so replaying the same snapshot adds nothing.
+
+``dwell`` measures time-in-status with a ``LEAD()`` window over each
+shipment's events in SQL, then takes nearest-rank percentiles per group from
+one ordered pass over the result.
+"""
+from itertools import groupby
+from operator import itemgetter
+
+from django.db.models import DurationField, ExpressionWrapper, F, Window
+from django.db.models.functions import Lead
+from django.utils import timezone
+
+from .models import ShipmentEvent
+from .telemetry import percentile
+
+Status = ShipmentEvent.Status
+
+# status → the Shipment date column recording when it was reached
+FLOW = [
+    (Status.RECEIVED,   "arrival_date"),
+    (Status.IN_TRANSIT, "departure_date"),
+    (Status.DELIVERED,  "delivered_date"),
+]
+CODES = {status.label: status.value for status, _ in FLOW}
+TRACKED_FIELDS = ("status", *(field for _, field in FLOW))
+
+GROUPINGS = {
+    "lane":         ("origin", "destination"),
+    "carrier":      ("carrier",),
+    "lane,carrier": ("origin", "destination", "carrier"),
+}
+PERCENTILES = (50, 90, 99)
+
+
+def derive(shipment, today=None, model=ShipmentEvent):
+    """
+    Events implied by a shipment snapshot: every status up to the current
+    one that has a date. The current status falls back to ``today`` when its
+    date is blank (it was reached now); earlier, undated ones are skipped.
+    """
+    current = CODES.get(shipment.status)
+    if current is None:
+        return []
+    events = []
+    for status, field in FLOW:
+        if status > current:
+            break
+        occurred = getattr(shipment, field) or (today or timezone.localdate() if status == current else None)
+        if occurred is not None:
+            events.append(model(
+                shipment_id=shipment.shipment_id, status=status, occurred_on=occurred,
+                origin=shipment.origin, destination=shipment.destination, carrier=shipment.carrier,
+            ))
+    return events
+
+
+def snapshot(shipment):
+    """What ``derive`` depends on – record events only when this changes."""
+    return tuple(getattr(shipment, field) for field in TRACKED_FIELDS)
+
+
+def record(shipments, today=None):
+    """Append the events of ``shipments`` (existing ones are skipped)."""
+    today  = today or timezone.localdate()
+    events = [event for shipment in shipments for event in derive(shipment, today)]
+    ShipmentEvent.objects.bulk_create(events, ignore_conflicts=True)
+    return len(events)
+
+
+def stage_insert_sql(stage):
+    """
+    PostgreSQL: ``derive`` set-wise from a staging table with Shipment's
+    columns (the COPY import path). It must hold just the shipments that were
+    inserted: a row skipped as a duplicate would get the events of a snapshot
+    that was never stored.
+    """
+    selects = []
+    for status, field in FLOW:
+        reached  = ", ".join(f"'{label}'" for label, code in CODES.items() if code >= status)
+        occurred = f"CASE WHEN status = '{status.label}' THEN COALESCE({field}, CURRENT_DATE) ELSE {field} END"
+        selects.append(
+            f"SELECT shipment_id, {status.value}, {occurred}, origin, destination, carrier "
+            f"FROM {stage} WHERE status IN ({reached}) AND {occurred} IS NOT NULL"
+        )
+    return (
+        f'INSERT INTO "{ShipmentEvent._meta.db_table}" '
+        f"(shipment_id, status, occurred_on, origin, destination, carrier) "
+        + " UNION ALL ".join(selects)
+        + " ON CONFLICT DO NOTHING"
+    )
+
+
+def history(shipment_id):
+    rows = (ShipmentEvent.objects.filter(shipment_id=shipment_id)
+            .order_by("occurred_on", "status").values("status", "occurred_on"))
+    return [{"status": Status(row["status"]).label, "occurred_on": row["occurred_on"]} for row in rows]
+
+
+def dwell(group_by="lane", since=None, until=None, **filters):
+    """
+    Days spent in each status before the next transition, as count / mean /
+    p50 / p90 / p99 per ``group_by`` group, for statuses entered in
+    [since, until). ``filters`` (origin, destination, carrier) narrow the
+    shipments considered. Shipments still in a status don't count yet.
+    """
+    keys       = GROUPINGS[group_by]
+    filters    = {k: v for k, v in filters.items() if v}
+    candidates = ShipmentEvent.objects.filter(**filters)
+    if since:
+        candidates = candidates.filter(occurred_on__gte=since)
+    if until:
+        candidates = candidates.filter(occurred_on__lt=until)
+
+    # Lead() runs over each candidate's whole history; filtering on its
+    # result makes Django wrap the query, so the window sees every event.
+    spans = (
+        ShipmentEvent.objects.filter(shipment_id__in=candidates.values("shipment_id"), **filters)
+        .annotate(left_on=Window(Lead("occurred_on"), partition_by=F("shipment_id"),
+                                 order_by=[F("occurred_on").asc(), F("status").asc()]))
+        .annotate(days=ExpressionWrapper(F("left_on") - F("occurred_on"), output_field=DurationField()))
+        .filter(left_on__isnull=False)
+        .values(*keys, "status", "occurred_on", "days")
+        .order_by(*keys, "status", "days")
+    )
+    in_window = lambda row: (not since or row["occurred_on"] >= since) and (not until or row["occurred_on"] < until)
+
+    results = []
+    for group, rows in groupby(filter(in_window, spans.iterator(chunk_size=5000)),
+                               key=itemgetter(*keys, "status")):
+        days = [row["days"].days for row in rows]
+        results.append({
+            **dict(zip(keys, group[:-1])),
+            "status":    Status(group[-1]).label,
+            "count":     len(days),
+            "mean_days": round(sum(days) / len(days), 2),
+            **{f"p{pct}_days": percentile(days, pct) for pct in PERCENTILES},
+        })
+    return results
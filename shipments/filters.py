@@ -6,10 +6,14 @@ class ShipmentFilter(filters.FilterSet):
     departure_before = filters.DateFilter(field_name="departure_date", lookup_expr="lte")
     arrival_after    = filters.DateFilter(field_name="arrival_date",   lookup_expr="gte")
     arrival_before   = filters.DateFilter(field_name="arrival_date",   lookup_expr="lte")
+    # prune partitions when SHIPMENT_PARTITION_KEY = "created_at"
+    created_after    = filters.DateTimeFilter(field_name="created_at", lookup_expr="gte")
+    created_before   = filters.DateTimeFilter(field_name="created_at", lookup_expr="lt")
 
     class Meta:
         model  = Shipment
         fields = [
             "status", "destination", "origin", "mode", "carrier",
             "departure_after", "departure_before", "arrival_after", "arrival_before",
+            "created_after", "created_before",
         ]
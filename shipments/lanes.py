@@ -0,0 +1,103 @@
+"""
+Lane analytics cube: shipments, weight and volume per origin × destination ×
+mode × week, kept in ``LaneRollup``.
+
+A shipment counts in the week (starting Monday) of its departure – or of its
+arrival at the origin warehouse while it has no departure date – and stays
+counted once archived. ``refresh`` recomputes only the destination × week
+cells a ``ShipmentChanges`` touched (API updates report the before and after
+state) from ``Shipment`` and ``ArchivedShipment``; ``full`` changes rebuild
+the whole cube. ``query`` answers top-N and slice/dice requests off the cube,
+which is orders of magnitude smaller than the shipments it summarises.
+"""
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Count, DateField, Q, Sum
+from django.db.models.functions import Coalesce, TruncWeek
+
+from .models import ArchivedShipment, LaneRollup, Shipment
+
+DIMENSIONS = ("origin", "destination", "mode", "week")
+MEASURES   = ("shipments", "weight", "volume")
+TOP_MAX    = 1000
+
+
+def week_of(day):
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    return day - timedelta(days=day.weekday())
+
+
+def aggregate(querysets, destinations=None, weeks=None):
+    """Cube cells of the shipments in ``querysets``, optionally only the given destinations × weeks."""
+    cells = {}
+    for qs in querysets:
+        qs = qs.annotate(week=TruncWeek(Coalesce("departure_date", "arrival_date"), output_field=DateField()))
+        if destinations is not None:
+            qs = qs.filter(destination__in=destinations)
+        if weeks is not None:
+            # the date ranges can use the date indexes; week__in then trims them exactly
+            lo, hi = min(weeks), max(weeks) + timedelta(days=6)
+            qs = qs.filter(Q(departure_date__range=(lo, hi)) |
+                           Q(departure_date__isnull=True, arrival_date__range=(lo, hi)))
+            qs = qs.filter(week__in=weeks)
+        rows = (qs.filter(week__isnull=False).values(*DIMENSIONS)
+                .annotate(shipments=Count("*"), weight=Sum("weight"), volume=Sum("volume")).order_by())
+        for row in rows:
+            key  = tuple(row[d] for d in DIMENSIONS)
+            cell = cells.setdefault(key, dict(zip(DIMENSIONS, key), shipments=0, weight=0.0, volume=0.0))
+            for measure in MEASURES:
+                cell[measure] += row[measure] or 0
+    return list(cells.values())
+
+
+def _sources():
+    return [Shipment.objects.all(), ArchivedShipment.objects.all()]
+
+
+def rebuild():
+    with transaction.atomic():
+        LaneRollup.objects.all().delete()
+        cells = aggregate(_sources())
+        LaneRollup.objects.bulk_create([LaneRollup(**cell) for cell in cells], batch_size=5000)
+    return len(cells)
+
+
+def refresh(changes):
+    """Bring the cells ``changes`` touched up to date; returns how many were written."""
+    if changes.full:
+        return rebuild()
+    weeks = {week_of(day) for day in changes.dates}
+    if not weeks or not changes.destinations:
+        return 0   # undated shipments aren't in the cube
+    with transaction.atomic():
+        LaneRollup.objects.filter(destination__in=changes.destinations, week__in=weeks).delete()
+        cells = aggregate(_sources(), changes.destinations, weeks)
+        LaneRollup.objects.bulk_create([LaneRollup(**cell) for cell in cells], batch_size=5000)
+    return len(cells)
+
+
+def query(group_by=("origin", "destination"), order_by="shipments", top=20,
+          since=None, until=None, **filters):
+    """
+    Totals per ``group_by`` combination, largest ``order_by`` first, for the
+    weeks starting in [since, until): a week that began before ``since`` is
+    left out, like one starting on or after ``until``. ``filters`` (origin, destination, mode) take
+    lists of values. Raises ValueError for unknown dimensions / measures.
+    """
+    group_by = list(group_by)
+    if not group_by or set(group_by) - set(DIMENSIONS):
+        raise ValueError(f"group_by must be a comma-separated subset of {', '.join(DIMENSIONS)}")
+    if order_by not in MEASURES:
+        raise ValueError(f"order_by must be one of {', '.join(MEASURES)}")
+
+    qs = LaneRollup.objects.filter(**{f"{k}__in": v for k, v in filters.items() if v})
+    if since:
+        qs = qs.filter(week__gte=since)
+    if until:
+        qs = qs.filter(week__lt=until)
+    rows = (qs.values(*group_by)
+            .annotate(shipments=Sum("shipments"), weight=Sum("weight"), volume=Sum("volume"))
+            .order_by(f"-{order_by}", *group_by)[:min(top, TOP_MAX)])
+    return [{**row, "weight": round(row["weight"], 2), "volume": round(row["volume"], 2)} for row in rows]
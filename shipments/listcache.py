@@ -0,0 +1,141 @@
+"""
+Process-local response cache for ``GET /api/shipments/``.
+
+Entries are keyed on a normalised request signature – the ``ShipmentFilter``
+parameters that are set, ordering, page and page size, host, path and negotiated
+format – and bounded by ``SHIPMENT_LIST_CACHE_SIZE`` entries and
+``SHIPMENT_LIST_CACHE_ROWS`` rows in total, with LRU eviction. Bulk pages can
+hold up to 5000 rows, so the row budget is what bounds memory; a page larger
+than the whole budget is not cached at all.
+
+Each entry records the tag versions it was built from: one tag per filtered
+destination / status (``shipments:destination:JAM``), or the whole-table
+``shipments`` version when neither is filtered, plus ``shipments:bulk`` for
+writes whose extent is unknown. ``signals.bump_shipments_version`` bumps the
+tags a write touched, so an import into KIN leaves ``destination=JAM`` pages
+cached. Tag versions live in ``DataVersion`` rows, so every web process sees
+every write.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import versioning
+from .filters import ShipmentFilter
+
+TAGGED_FILTERS = ("destination", "status")
+PAGE_PARAMS    = ("page", "page_size", "ordering")
+
+
+class ListCache:
+    def __init__(self, max_entries=None, max_rows=None):
+        self.max_entries = max_entries
+        self.max_rows    = max_rows
+        self._entries    = OrderedDict()   # key → (tag versions, data, rows)
+        self._rows       = 0
+        self._lock       = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = self.misses = self.stale = self.evictions = self.oversized = 0
+
+    @property
+    def capacity(self):
+        if self.max_entries is not None:
+            return self.max_entries
+        return getattr(settings, "SHIPMENT_LIST_CACHE_SIZE", 256)
+
+    @property
+    def row_budget(self):
+        if self.max_rows is not None:
+            return self.max_rows
+        return getattr(settings, "SHIPMENT_LIST_CACHE_ROWS", 50_000)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._rows = 0
+
+    def get(self, key, current):
+        """Cached data for ``key`` if its tags still carry ``current`` versions."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if not _fresh(entry[0], current):
+                self._rows -= self._entries.pop(key)[2]
+                self.stale  += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, current, data):
+        capacity, budget, rows = self.capacity, self.row_budget, page_rows(data)
+        if capacity <= 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._rows -= self._entries.pop(key)[2]
+            if rows > budget:
+                self.oversized += 1
+                return
+            self._entries[key] = (current, data, rows)
+            self._rows += rows
+            while len(self._entries) > capacity or self._rows > budget:
+                self._rows -= self._entries.popitem(last=False)[1][2]
+                self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries":    len(self._entries),
+            "capacity":   self.capacity,
+            "rows":       self._rows,
+            "row_budget": self.row_budget,
+            "hits":       self.hits,
+            "misses":     self.misses,
+            "stale":      self.stale,
+            "evictions":  self.evictions,
+            "oversized":  self.oversized,
+            "hit_ratio":  round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+def page_rows(data):
+    """Rows held by a list response's data: the page's ``results``, or the unpaginated list."""
+    results = data.get("results", ()) if isinstance(data, dict) else data
+    return len(results)
+
+
+def _fresh(cached, current):
+    # A write that changes a matching row bumps *every* tag the entry carries
+    # (the row has that destination and that status), so the entry is stale
+    # only once all of them moved – or a bulk write happened.
+    if cached[versioning.BULK] != current[versioning.BULK]:
+        return False
+    tags = [scope for scope in cached if scope != versioning.BULK]
+    return any(cached[scope] == current[scope] for scope in tags)
+
+
+def signature(request):
+    """(cache key, tag scopes) for a DRF or plain Django list request."""
+    params = getattr(request, "query_params", request.GET)
+    media  = getattr(request, "accepted_media_type", "application/json")
+    known  = [*ShipmentFilter.base_filters, *PAGE_PARAMS]
+    pairs  = tuple(sorted((name, params.get(name)) for name in known if params.get(name)))
+    key    = (request.get_host(), request.scheme, request.path, media, pairs)
+
+    filtered = dict(pairs)
+    tags = [versioning.tag(name, filtered[name]) for name in TAGGED_FILTERS if name in filtered]
+    return key, (tags or [versioning.SHIPMENTS]) + [versioning.BULK]
+
+
+def current_versions(request, scopes):
+    return {scope: version for scope, (version, _) in versioning.versions(request, scopes).items()}
+
+
+shipment_lists = ListCache()
@@ -0,0 +1,93 @@
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from shipments.benchmarks import SCENARIOS, BenchContext, compare, run_scenarios
+from shipments.synthetic import parse_rows
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=settings.BASE_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a synthetic manifest into a throwaway database and time ingestion, "
+        "consolidation, metrics, pagination and export. Benchmark PostgreSQL by "
+        "pointing --settings at a module whose default database is PostgreSQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", default="10k", help="10k, 1m, 10m or an integer (default 10k)")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--repeat", type=int, default=5, help="samples per read scenario")
+        parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                            help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+        parser.add_argument("--output", help="write the JSON results here (default: stdout)")
+        parser.add_argument("--compare", help="previous results JSON to check for regressions")
+        parser.add_argument("--threshold", type=float, default=0.10,
+                            help="allowed slowdown vs --compare before failing (default 0.10)")
+
+    def handle(self, *args, **opts):
+        names   = [n.strip() for n in opts["scenarios"].split(",") if n.strip()]
+        unknown = set(names) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+        ctx = BenchContext(parse_rows(opts["rows"]), opts["seed"], opts["repeat"])
+
+        # SQLite test databases default to in-memory; benchmark against a real file.
+        tmpdir = None
+        if connection.vendor == "sqlite":
+            tmpdir = tempfile.mkdtemp()
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(tmpdir, "bench.sqlite3")
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=["localhost"]):
+                results = run_scenarios(ctx, names)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            if tmpdir:
+                shutil.rmtree(tmpdir, ignore_errors=True)
+
+        document = {
+            "meta": {
+                "commit":    _git_commit(),
+                "timestamp": timezone.now().isoformat(),
+                "rows":      ctx.rows,
+                "seed":      ctx.seed,
+                "vendor":    connection.vendor,
+                "python":    platform.python_version(),
+                "django":    django.get_version(),
+            },
+            "results": results,
+        }
+        payload = json.dumps(document, indent=2, default=str)
+        if opts["output"]:
+            with open(opts["output"], "w") as f:
+                f.write(payload)
+            self.stderr.write(f"Results written to {opts['output']}")
+        else:
+            self.stdout.write(payload)
+
+        if opts["compare"]:
+            with open(opts["compare"]) as f:
+                regressions = compare(document, json.load(f), opts["threshold"])
+            if regressions:
+                raise CommandError("Performance regressions:\n  " + "\n  ".join(regressions))
+            self.stderr.write("No regressions against " + opts["compare"])
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the OpenAPI schema (YAML and JSON) into SCHEMA_CACHE_DIR for the current "
+        "code version, so /api/schema/ never generates it on a request. Run at build time; "
+        "files of other code versions are removed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--api-version", help="also used as ?version= by clients (default: none)")
+        parser.add_argument("--keep-old", action="store_true", help="keep other code versions' files")
+
+    def handle(self, *args, **opts):
+        from backend.schema import CachedSpectacularAPIView, code_version, schemas
+
+        if schemas.directory is None:
+            raise CommandError("SCHEMA_CACHE_DIR is not set; the schema would only be cached in memory")
+        view, version, built = CachedSpectacularAPIView(), opts["api_version"], set()
+        for renderer_class in view.renderer_classes:
+            renderer = renderer_class()
+            if renderer.format in built:   # the *2 renderers differ only in media type
+                continue
+            document = schemas.get((renderer.format, version, None), lambda: view.render_schema(renderer, version))
+            built.add(renderer.format)
+            self.stdout.write(f"{renderer.format}: {len(document.body)} bytes, "
+                              f"{len(document.gzipped)} gzipped, ETag {document.etag}")
+
+        pruned = 0 if opts["keep_old"] else schemas.prune()
+        self.stderr.write(f"Schema for code version {code_version()} in {schemas.directory}"
+                          + (f" ({pruned} old version(s) removed)" if pruned else ""))
@@ -0,0 +1,99 @@
+import json
+import threading
+from itertools import count
+from time import perf_counter
+from urllib.request import urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shipments.telemetry import percentile
+
+DEFAULT_PATHS = "shipments/,shipments/?status=in-transit&destination=JAM,metrics/,consolidations/"
+
+
+def run_load(urls, concurrency, requests, timeout=30):
+    """GET ``urls`` round-robin, ``requests`` times in total, from ``concurrency`` threads."""
+    latencies, errors = [], []
+    lock  = threading.Lock()
+    issue = count()
+
+    def worker():
+        while (i := next(issue)) < requests:
+            t0 = perf_counter()
+            try:
+                with urlopen(urls[i % len(urls)], timeout=timeout) as resp:
+                    resp.read()
+            except OSError as exc:   # URLError / HTTPError / timeouts
+                with lock:
+                    errors.append(str(exc))
+                continue
+            with lock:
+                latencies.append(perf_counter() - t0)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    t0 = perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = perf_counter() - t0
+
+    latencies.sort()
+    ms = lambda s: round(s * 1000, 2) if s is not None else None
+    return {
+        "concurrency":  concurrency,
+        "requests":     requests,
+        "errors":       len(errors),
+        "first_error":  errors[0] if errors else None,
+        "rps":          round(len(latencies) / wall, 1) if wall else None,
+        "p50_ms":       ms(percentile(latencies, 50)),
+        "p90_ms":       ms(percentile(latencies, 90)),
+        "p99_ms":       ms(percentile(latencies, 99)),
+        "max_ms":       ms(latencies[-1] if latencies else None),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test running deployments side by side, e.g. gunicorn (WSGI) against "
+        "uvicorn (ASGI), at several concurrency levels; reports throughput and "
+        "p50/p90/p99 latency per target."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target", action="append", required=True, metavar="NAME=BASE_URL",
+                            help="repeatable, e.g. wsgi=http://127.0.0.1:8000/api/ "
+                                 "asgi=http://127.0.0.1:8001/api/async/")
+        parser.add_argument("--paths", default=DEFAULT_PATHS,
+                            help="comma-separated paths relative to each base URL")
+        parser.add_argument("--concurrency", default="1,8,32,64", help="comma-separated levels")
+        parser.add_argument("--requests", type=int, default=500, help="requests per target and level")
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument("--output", help="write the JSON results here (default: stdout)")
+
+    def handle(self, *args, **opts):
+        targets = {}
+        for spec in opts["target"]:
+            name, sep, base = spec.partition("=")
+            if not sep or not base:
+                raise CommandError(f"--target must look like NAME=BASE_URL, got {spec!r}")
+            targets[name] = base if base.endswith("/") else base + "/"
+        paths  = [p.strip().lstrip("/") for p in opts["paths"].split(",") if p.strip()]
+        levels = [int(c) for c in opts["concurrency"].split(",") if c.strip()]
+
+        results = {name: [] for name in targets}
+        for level in levels:
+            line = [f"c={level:<4}"]
+            for name, base in targets.items():
+                run = run_load([base + p for p in paths], level, opts["requests"], opts["timeout"])
+                results[name].append(run)
+                line.append(f"{name}: {run['rps']} req/s p99 {run['p99_ms']} ms ({run['errors']} errors)")
+            self.stderr.write("  |  ".join(line))
+
+        payload = json.dumps({"targets": targets, "paths": paths, "results": results}, indent=2)
+        if opts["output"]:
+            with open(opts["output"], "w") as f:
+                f.write(payload)
+            self.stderr.write(f"Results written to {opts['output']}")
+        else:
+            self.stdout.write(payload)
@@ -0,0 +1,43 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from shipments import partitioning
+
+
+class Command(BaseCommand):
+    help = (
+        "Maintain the monthly partitions of shipments_shipment (PostgreSQL with "
+        "SHIPMENT_PARTITION_KEY set): create upcoming months, convert an existing "
+        "plain table, or detach old months for archiving."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--convert", action="store_true",
+                            help="convert the plain table to a partitioned one first")
+        parser.add_argument("--months-ahead", type=int, default=None)
+        parser.add_argument("--detach-before", metavar="YYYY-MM",
+                            help="detach partitions whose month ends on or before this month starts")
+        parser.add_argument("--drop", action="store_true", help="drop detached partitions")
+
+    def handle(self, *args, **opts):
+        if not partitioning.enabled(connection):
+            self.stdout.write("Partitioning is disabled (needs PostgreSQL and SHIPMENT_PARTITION_KEY); nothing to do.")
+            return
+
+        if opts["convert"] and partitioning.convert_to_partitioned(connection):
+            self.stdout.write(f"Converted {partitioning.TABLE} to partitioned by {partitioning.partition_key()}")
+        if not partitioning.is_partitioned(connection):
+            raise CommandError(f"{partitioning.TABLE} is not partitioned; run with --convert")
+
+        for name in partitioning.ensure_partitions(connection, opts["months_ahead"]):
+            self.stdout.write(f"Created {name}")
+
+        if opts["detach_before"]:
+            try:
+                before = datetime.strptime(opts["detach_before"], "%Y-%m").date()
+            except ValueError:
+                raise CommandError("--detach-before expects YYYY-MM")
+            for name in partitioning.detach_partitions(before, connection, drop=opts["drop"]):
+                self.stdout.write(f"{'Dropped' if opts['drop'] else 'Detached'} {name}")
@@ -0,0 +1,114 @@
+"""
+Dashboard aggregates behind ``/api/metrics/`` and ``/api/async/metrics/``.
+
+``metrics_queries`` returns one zero-argument callable per independent
+aggregate, so the sync view can run them in turn and the async view can run
+them concurrently; ``build_metrics`` merges their results (live rows plus
+archived rollups) into the response body. ``utilisation_pct`` is today's
+on-hand volume from ``shipments.occupancy``, whatever the window.
+"""
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import occupancy
+from .archive import archived_rollups
+from .models import Shipment
+from .partitioning import window_filter
+
+CACHE_KEY = "metrics_cache"
+
+
+def query_date(params, name):
+    """
+    The ``name`` query parameter as a date, None when it's absent. Raises
+    ValueError unless it's a real YYYY-MM-DD date (``parse_date`` alone
+    returns None for strings that don't look like one).
+    """
+    value = params.get(name) or ""
+    if not value:
+        return None
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValueError(f"{name} must be a date (YYYY-MM-DD), got {value!r}")
+    return day
+
+
+def parse_window(params):
+    """
+    Optional ?since=&until= window on the partition key, so a partitioned
+    table only scans the months asked for. Raises ValueError on a bad date.
+    """
+    return window_filter(query_date(params, "since"), query_date(params, "until"))
+
+
+def cache_key(version, window):
+    # utilisation_pct is today's occupancy, so entries also expire at midnight
+    return f"{CACHE_KEY}:v{version}:{timezone.localdate()}" + "".join(f":{k}={v}" for k, v in sorted(window.items()))
+
+
+def _merge_rows(live, archived, key, value):
+    """Add archived per-``key`` totals into live ``values().annotate()`` rows."""
+    merged = {row[key]: dict(row) for row in live}
+    for row in archived:
+        merged.setdefault(row[key], {key: row[key], value: 0})[value] += row[value]
+    return list(merged.values())
+
+
+def metrics_queries(window):
+    qs      = Shipment.objects.filter(**window)
+    archive = archived_rollups(window)   # delivered shipments moved to cold storage
+    return {
+        "archived":              lambda: archive.aggregate(total=Sum("shipments")),
+        "counts":                lambda: list(qs.values("status").annotate(total=Count("*"))),
+        "on_hand":               occupancy.on_hand,
+        "by_carrier":            lambda: list(qs.values("carrier").annotate(total=Count("*"))),
+        "archived_by_carrier":   lambda: list(archive.values("carrier").annotate(total=Sum("shipments"))),
+        "volume_by_mode":        lambda: list(qs.values("mode").annotate(total_volume=Sum("volume"))),
+        "archived_by_mode":      lambda: list(archive.values("mode").annotate(total_volume=Sum("volume"))),
+        "per_day":               lambda: list(qs.values(date=F("arrival_date")).annotate(count=Count("*"))),
+        "archived_per_day":      lambda: list(archive.values(date=F("arrival_date")).annotate(count=Sum("shipments"))),
+    }
+
+
+def build_metrics(r):
+    # 1️⃣ Counts by status
+    archived = r["archived"]
+    counts = sorted(_merge_rows(
+        r["counts"],
+        [{"status": "delivered", "total": archived["total"]}] if archived["total"] else [],
+        "status", "total",
+    ), key=lambda row: row["status"])
+
+    # 2️⃣ Warehouse utilisation % (volume on hand now)
+    utilisation = occupancy.utilisation_pct(r["on_hand"])
+
+    # 3️⃣ Shipments by carrier
+    by_carrier = sorted(_merge_rows(
+        r["by_carrier"], r["archived_by_carrier"], "carrier", "total",
+    ), key=lambda row: -row["total"])
+
+    # 4️⃣ Volume by mode (air vs sea)
+    volume_by_mode = sorted(_merge_rows(
+        r["volume_by_mode"], r["archived_by_mode"], "mode", "total_volume",
+    ), key=lambda row: row["mode"])
+
+    # 5️⃣ Shipments per day (by arrival_date)
+    shipments_per_day = sorted(_merge_rows(
+        r["per_day"], r["archived_per_day"], "date", "count",
+    ), key=lambda row: (row["date"] is not None, row["date"]))
+
+    return {
+        "counts":              counts,
+        "utilisation_pct":     utilisation,
+        "by_carrier":          by_carrier,
+        "volume_by_mode":      volume_by_mode,
+        "shipments_per_day":   shipments_per_day,
+    }
+
+
+def compute_metrics(window):
+    return build_metrics({name: query() for name, query in metrics_queries(window).items()})
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipments', '0005_alter_shipment_carrier_delete_carrier'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsolidationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('PROCESSING', 'processing'), ('ERROR', 'error'), ('COMPLETED', 'completed')], default='PROCESSING', max_length=20)),
+                ('groups', models.PositiveIntegerField(default=0)),
+                ('telemetry', models.JSONField(blank=True, default=dict)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='csvimport',
+            name='telemetry',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
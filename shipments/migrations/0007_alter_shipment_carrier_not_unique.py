@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipments', '0006_task_telemetry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='shipment',
+            name='carrier',
+            field=models.CharField(blank=True, max_length=120, null=True),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipments', '0007_alter_shipment_carrier_not_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['destination', 'departure_date'], include=('weight', 'volume', 'shipment_id'), name='shp_dest_dep_cov'),
+        ),
+        migrations.RemoveIndex(
+            model_name='shipment',
+            name='shipments_s_destina_947ba2_idx',
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['carrier'], name='shp_carrier'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['mode', 'volume'], name='shp_mode_volume'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['arrival_date'], name='shp_arrival'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['departure_date'], name='shp_departure'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['origin', 'destination'], name='shp_origin_dest'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(condition=models.Q(('status', 'delivered'), _negated=True), fields=['destination', 'status', 'departure_date'], name='shp_open_dest_status'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(condition=models.Q(('status', 'delivered'), _negated=True), fields=['status', 'arrival_date'], name='shp_open_status_arrival'),
+        ),
+    ]
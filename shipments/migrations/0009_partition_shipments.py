@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def partition_shipments(apps, schema_editor):
+    """
+    Convert shipments_shipment to a monthly-partitioned table when
+    SHIPMENT_PARTITION_KEY is set and the database is PostgreSQL.
+    Everywhere else this is a no-op; ``manage.py shipment_partitions --convert``
+    performs the same conversion later if partitioning is enabled afterwards.
+    """
+    from shipments.partitioning import convert_to_partitioned, enabled
+
+    if enabled(schema_editor.connection):
+        convert_to_partitioned(schema_editor.connection, model=apps.get_model("shipments", "Shipment"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipments', '0008_shipment_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_shipments, migrations.RunPython.noop, elidable=True),
+    ]
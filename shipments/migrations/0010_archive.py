@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:58
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipments', '0009_partition_shipments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedShipment',
+            fields=[
+                ('shipment_id', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('customer_id', models.CharField(blank=True, max_length=32, null=True)),
+                ('carrier', models.CharField(blank=True, max_length=120, null=True)),
+                ('origin', models.CharField(max_length=2)),
+                ('destination', models.CharField(max_length=3)),
+                ('weight', models.FloatField()),
+                ('volume', models.FloatField()),
+                ('mode', models.CharField(max_length=4)),
+                ('arrival_date', models.DateField(blank=True, null=True)),
+                ('departure_date', models.DateField(blank=True, null=True)),
+                ('delivered_date', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('consolidation_id', models.BigIntegerField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchiveRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('carrier', models.CharField(blank=True, max_length=120, null=True)),
+                ('mode', models.CharField(max_length=4)),
+                ('arrival_date', models.DateField(blank=True, null=True)),
+                ('departure_date', models.DateField(blank=True, null=True)),
+                ('shipments', models.PositiveBigIntegerField(default=0)),
+                ('volume', models.FloatField(default=0)),
+            ],
+            options={
+                'unique_together': {('carrier', 'mode', 'arrival_date', 'departure_date')},
+            },
+        ),
+    ]
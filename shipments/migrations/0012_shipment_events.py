@@ -0,0 +1,48 @@
+# Generated by Django 5.2.1 on 2026-10-19 04:12
+
+from django.db import migrations, models
+
+
+def backfill_events(apps, schema_editor):
+    """Seed the history with what current and archived snapshots imply."""
+    from shipments.events import derive
+
+    Event = apps.get_model("shipments", "ShipmentEvent")
+    db    = schema_editor.connection.alias
+    for model_name in ("Shipment", "ArchivedShipment"):
+        batch = []
+        for obj in apps.get_model("shipments", model_name).objects.using(db).iterator(chunk_size=5000):
+            if model_name == "ArchivedShipment":
+                obj.status = "delivered"
+            batch.extend(derive(obj, model=Event))
+            if len(batch) >= 5000:
+                Event.objects.using(db).bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        Event.objects.using(db).bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipments', '0011_data_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShipmentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shipment_id', models.CharField(max_length=40)),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'received'), (2, 'in-transit'), (3, 'delivered')])),
+                ('occurred_on', models.DateField()),
+                ('origin', models.CharField(max_length=2)),
+                ('destination', models.CharField(max_length=3)),
+                ('carrier', models.CharField(blank=True, max_length=120, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['origin', 'destination', 'occurred_on'], name='evt_lane'), models.Index(fields=['carrier', 'occurred_on'], name='evt_carrier'), models.Index(fields=['occurred_on'], name='evt_occurred')],
+                'constraints': [models.UniqueConstraint(fields=('shipment_id', 'occurred_on', 'status'), name='evt_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_events, migrations.RunPython.noop, elidable=True),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-19 04:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipments', '0012_shipment_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShipmentTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shipment_id', models.CharField(max_length=40)),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('reason', models.CharField(choices=[('deleted', 'deleted'), ('archived', 'archived')], default='deleted', max_length=8)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['updated_at', 'shipment_id'], name='shp_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='shipmenttombstone',
+            index=models.Index(fields=['deleted_at', 'shipment_id'], name='tomb_deleted'),
+        ),
+    ]
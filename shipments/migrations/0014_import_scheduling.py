@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-19 04:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipments', '0013_change_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvimport',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='csvimport',
+            name='tenant',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='consolidationrun',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'pending'), ('PROCESSING', 'processing'), ('ERROR', 'error'), ('COMPLETED', 'completed')], default='PROCESSING', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='csvimport',
+            index=models.Index(fields=['tenant', 'status'], name='imp_tenant_status'),
+        ),
+        migrations.AddConstraint(
+            model_name='consolidationrun',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'PENDING')), fields=('status',), name='one_pending_consolidation'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-19 04:33
+
+from django.db import migrations, models
+
+
+def backfill_lanes(apps, schema_editor):
+    """Build the cube from the current and archived shipments."""
+    from shipments.lanes import aggregate
+
+    Rollup  = apps.get_model("shipments", "LaneRollup")
+    db      = schema_editor.connection.alias
+    sources = [apps.get_model("shipments", name).objects.using(db) for name in ("Shipment", "ArchivedShipment")]
+    Rollup.objects.using(db).bulk_create([Rollup(**cell) for cell in aggregate(sources)], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipments', '0014_import_scheduling'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LaneRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origin', models.CharField(max_length=2)),
+                ('destination', models.CharField(max_length=3)),
+                ('mode', models.CharField(max_length=4)),
+                ('week', models.DateField()),
+                ('shipments', models.PositiveIntegerField(default=0)),
+                ('weight', models.FloatField(default=0)),
+                ('volume', models.FloatField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['origin', 'destination'], name='lane_od')],
+                'constraints': [models.UniqueConstraint(fields=('destination', 'week', 'origin', 'mode'), name='lane_cell')],
+            },
+        ),
+        migrations.RunPython(backfill_lanes, migrations.RunPython.noop, elidable=True),
+    ]
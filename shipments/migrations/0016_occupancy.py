@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-19 04:43
+
+from django.db import migrations, models
+
+
+def backfill_occupancy(apps, schema_editor):
+    """Build the daily occupancy from the current and archived shipments."""
+    from shipments.occupancy import day_rows, flows
+
+    Day  = apps.get_model("shipments", "OccupancyDay")
+    db   = schema_editor.connection.alias
+    rows = day_rows(flows(*(apps.get_model("shipments", name).objects.using(db)
+                            for name in ("Shipment", "ArchivedShipment"))))
+    Day.objects.using(db).bulk_create([Day(**row) for row in rows], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipments', '0015_lane_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OccupancyDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('arrived', models.FloatField(default=0)),
+                ('departed', models.FloatField(default=0)),
+                ('arrivals', models.PositiveIntegerField(default=0)),
+                ('departures', models.PositiveIntegerField(default=0)),
+                ('on_hand', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_occupancy, migrations.RunPython.noop, elidable=True),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def unique_ids(apps, schema_editor):
+    """
+    Give tables partitioned before shipments_shipment_ids existed their
+    cross-partition shipment_id uniqueness; a no-op everywhere else.
+    """
+    from shipments.partitioning import install_unique_ids, is_partitioned
+
+    if is_partitioned(schema_editor.connection):
+        install_unique_ids(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipments', '0016_occupancy'),
+    ]
+
+    operations = [
+        migrations.RunPython(unique_ids, migrations.RunPython.noop, elidable=True),
+    ]
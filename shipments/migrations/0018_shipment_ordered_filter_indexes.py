@@ -0,0 +1,57 @@
+# Generated by Django 5.2.1 on 2026-10-19 05:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipments', '0017_partition_unique_ids'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='shipment',
+            name='shipments_s_status_536511_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='shipment',
+            name='shp_dest_dep_cov',
+        ),
+        migrations.RemoveIndex(
+            model_name='shipment',
+            name='shp_carrier',
+        ),
+        migrations.RemoveIndex(
+            model_name='shipment',
+            name='shp_origin_dest',
+        ),
+        migrations.RemoveIndex(
+            model_name='shipment',
+            name='shp_open_dest_status',
+        ),
+        migrations.RemoveIndex(
+            model_name='shipment',
+            name='shp_open_status_arrival',
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['status', 'shipment_id'], name='shp_status'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['destination', 'departure_date', 'shipment_id', 'weight', 'volume'], name='shp_dest_dep_cov'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['carrier', 'shipment_id'], name='shp_carrier'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['origin', 'destination', 'shipment_id'], name='shp_origin_dest'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['destination', 'status', 'shipment_id'], name='shp_dest_status'),
+        ),
+    ]
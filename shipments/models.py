@@ -5,6 +5,8 @@ class CsvImport(models.Model):
     file           = models.FileField(upload_to="csv_imports/")
     file_name      = models.CharField(max_length=255)
     uploaded_at    = models.DateTimeField(default=timezone.now)
+    started_at     = models.DateTimeField(null=True, blank=True)
+    tenant         = models.CharField(max_length=64, blank=True, default="")
     status         = models.CharField(
         max_length=20,
         choices=[("PENDING","pending"),("PROCESSING","processing"),
@@ -14,6 +16,11 @@ class CsvImport(models.Model):
     total_rows     = models.PositiveBigIntegerField(default=0)
     processed_rows = models.PositiveBigIntegerField(default=0)
     error_log      = models.TextField(blank=True)
+    telemetry      = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        # per-tenant concurrency checks (shipments.scheduling.claim_import)
+        indexes = [models.Index(fields=["tenant", "status"], name="imp_tenant_status")]
 
     def save(self, *args, **kwargs):
         if self.file and not self.file_name:
@@ -33,7 +40,7 @@ class Customer(models.Model):
 class Shipment(models.Model):
     shipment_id   = models.CharField(max_length=40, primary_key=True)
     customer      = models.ForeignKey(Customer, on_delete=models.PROTECT, db_column="customer_id", related_name="shipments", null=True, blank=True)
-    carrier       = models.CharField(max_length=120, unique=True, null=True, blank=True)
+    carrier       = models.CharField(max_length=120, null=True, blank=True)
     origin        = models.CharField(max_length=2)   # US state
     destination   = models.CharField(max_length=3)   # Caribbean ISO
     weight        = models.FloatField()              # grams
@@ -51,13 +58,90 @@ class Shipment(models.Model):
     updated_at      = models.DateTimeField(auto_now=True)
 
     class Meta:
+        # Derived from ShipmentFilter, MetricsViewSet and generate_consolidations.
+        # List pages are ORDER BY shipment_id LIMIT n, so the equality filters
+        # end in shipment_id and the page is read in index order, without a
+        # sort. With COUNT(*) the metrics GROUP BYs are index-only scans, and
+        # so is the consolidation grouping: weight and volume are key columns
+        # rather than INCLUDE, which only PostgreSQL supports.
         indexes = [
-            models.Index(fields=["status"]),
-            models.Index(fields=["destination", "departure_date"]),
+            models.Index(fields=["status", "shipment_id"], name="shp_status"),
+            models.Index(fields=["destination", "departure_date", "shipment_id", "weight", "volume"],
+                         name="shp_dest_dep_cov"),
+            models.Index(fields=["carrier", "shipment_id"], name="shp_carrier"),
+            models.Index(fields=["mode", "volume"], name="shp_mode_volume"),
+            models.Index(fields=["arrival_date"], name="shp_arrival"),
+            models.Index(fields=["departure_date"], name="shp_departure"),
+            models.Index(fields=["origin", "destination", "shipment_id"], name="shp_origin_dest"),
+            models.Index(fields=["destination", "status", "shipment_id"], name="shp_dest_status"),
+            # change feed order (shipments.changefeed)
+            models.Index(fields=["updated_at", "shipment_id"], name="shp_updated"),
         ]
         ordering = ["shipment_id"]
         db_table = "shipments_shipment"
 
+class ArchivedShipment(models.Model):
+    """
+    Cold copy of a delivered shipment moved out of the hot table by
+    ``shipments.archive``. Status is implicitly "delivered"; the customer and
+    consolidation are kept as plain IDs so archiving never blocks on FKs.
+    """
+    shipment_id      = models.CharField(max_length=40, primary_key=True)
+    customer_id      = models.CharField(max_length=32, null=True, blank=True)
+    carrier          = models.CharField(max_length=120, null=True, blank=True)
+    origin           = models.CharField(max_length=2)
+    destination      = models.CharField(max_length=3)
+    weight           = models.FloatField()
+    volume           = models.FloatField()
+    mode             = models.CharField(max_length=4)
+    arrival_date     = models.DateField(null=True, blank=True)
+    departure_date   = models.DateField(null=True, blank=True)
+    delivered_date   = models.DateField(null=True, blank=True)
+    created_at       = models.DateTimeField()
+    updated_at       = models.DateTimeField()
+    consolidation_id = models.BigIntegerField(null=True, blank=True)
+    archived_at      = models.DateTimeField(default=timezone.now)
+
+class ArchiveRollup(models.Model):
+    """
+    Running totals of archived shipments in the dimensions MetricsViewSet
+    groups by, so the dashboard stays whole without scanning the archive.
+    """
+    carrier        = models.CharField(max_length=120, null=True, blank=True)
+    mode           = models.CharField(max_length=4)
+    arrival_date   = models.DateField(null=True, blank=True)
+    departure_date = models.DateField(null=True, blank=True)
+    shipments      = models.PositiveBigIntegerField(default=0)
+    volume         = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ("carrier", "mode", "arrival_date", "departure_date")
+
+class LaneRollup(models.Model):
+    """One cell of the lane cube (shipments.lanes): a lane, mode and week's totals."""
+    origin      = models.CharField(max_length=2)
+    destination = models.CharField(max_length=3)
+    mode        = models.CharField(max_length=4)
+    week        = models.DateField()   # Monday
+    shipments   = models.PositiveIntegerField(default=0)
+    weight      = models.FloatField(default=0)
+    volume      = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["destination", "week", "origin", "mode"], name="lane_cell"),
+        ]
+        indexes = [models.Index(fields=["origin", "destination"], name="lane_od")]
+
+class OccupancyDay(models.Model):
+    """A day's warehouse arrivals and departures and the volume on hand at its end (shipments.occupancy)."""
+    day        = models.DateField(unique=True)
+    arrived    = models.FloatField(default=0)   # cm³
+    departed   = models.FloatField(default=0)   # cm³
+    arrivals   = models.PositiveIntegerField(default=0)
+    departures = models.PositiveIntegerField(default=0)
+    on_hand    = models.FloatField(default=0)   # running total of arrived − departed
+
 class Consolidation(models.Model):
     destination     = models.CharField(max_length=3)
     departure_date  = models.DateField()
@@ -70,9 +154,80 @@ class Consolidation(models.Model):
         indexes = [models.Index(fields=["destination", "departure_date"])]
         ordering = ["destination", "departure_date"]
 
+class ConsolidationRun(models.Model):
+    """One execution of the ``generate_consolidations`` task."""
+    started_at  = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    status      = models.CharField(
+        max_length=20,
+        choices=[("PENDING","pending"),("PROCESSING","processing"),
+                 ("ERROR","error"),("COMPLETED","completed")],
+        default="PROCESSING",
+    )
+    groups      = models.PositiveIntegerField(default=0)
+    telemetry   = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        ordering = ["-started_at"]
+        constraints = [
+            # debounced rebuilds: at most one run waits at a time (shipments.scheduling)
+            models.UniqueConstraint(fields=["status"], condition=models.Q(status="PENDING"),
+                                    name="one_pending_consolidation"),
+        ]
+
 class ConsolidationShipment(models.Model):
     consolidation = models.ForeignKey(Consolidation, on_delete=models.CASCADE)
     shipment      = models.ForeignKey(Shipment,      on_delete=models.CASCADE)
 
     class Meta:
         unique_together = ("consolidation", "shipment")
+
+class DataVersion(models.Model):
+    """Write counter per data scope; feeds the API's ETag / Last-Modified headers."""
+    scope      = models.CharField(max_length=64, primary_key=True)
+    version    = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+class ShipmentEvent(models.Model):
+    """
+    Append-only status history: one narrow row per transition, written in
+    bulk by ``shipments.events``. Status is a small int and the shipment a
+    plain ID (history outlives archiving); origin, destination and carrier
+    are copied in so dwell-time queries per lane / carrier read this table only.
+    """
+    class Status(models.IntegerChoices):
+        RECEIVED   = 1, "received"
+        IN_TRANSIT = 2, "in-transit"
+        DELIVERED  = 3, "delivered"
+
+    shipment_id = models.CharField(max_length=40)
+    status      = models.PositiveSmallIntegerField(choices=Status.choices)
+    occurred_on = models.DateField()
+    origin      = models.CharField(max_length=2)
+    destination = models.CharField(max_length=3)
+    carrier     = models.CharField(max_length=120, null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # replays (re-imports, repeated saves) are no-ops; also serves the
+            # per-shipment window in dwell queries
+            models.UniqueConstraint(fields=["shipment_id", "occurred_on", "status"], name="evt_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["origin", "destination", "occurred_on"], name="evt_lane"),
+            models.Index(fields=["carrier", "occurred_on"], name="evt_carrier"),
+            models.Index(fields=["occurred_on"], name="evt_occurred"),
+        ]
+
+class ShipmentTombstone(models.Model):
+    """A shipment that left the live table, for the change feed (``shipments.changefeed``)."""
+    DELETED  = "deleted"
+    ARCHIVED = "archived"
+
+    shipment_id = models.CharField(max_length=40)
+    deleted_at  = models.DateTimeField(default=timezone.now)
+    reason      = models.CharField(max_length=8, choices=[(DELETED, "deleted"), (ARCHIVED, "archived")],
+                                   default=DELETED)
+
+    class Meta:
+        indexes = [models.Index(fields=["deleted_at", "shipment_id"], name="tomb_deleted")]
@@ -0,0 +1,143 @@
+"""
+Warehouse occupancy: the volume on hand at the origin warehouse, day by day.
+
+A shipment is on hand from its ``arrival_date`` until its ``departure_date``
+(the day it leaves isn't counted). Shipments that departed before they
+arrived, or were delivered without a departure date, are left out.
+``OccupancyDay`` keeps each day's arrivals and departures and the running
+``on_hand`` total at its end, so current utilisation is one indexed lookup
+instead of a SUM over every shipment.
+
+``refresh`` recomputes only the days a ``ShipmentChanges`` touched and
+re-accumulates the running total from the first of them, writing just the rows
+that moved; ``full`` changes rebuild the table. Scheduled departures – future
+``departure_date`` values – are rows ahead of today, so ``forecast`` reads the
+next days off the table and adds a projection of arrivals at the recent daily
+average.
+"""
+from datetime import date, timedelta
+from itertools import accumulate, repeat
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import ArchivedShipment, OccupancyDay, Shipment
+
+FLOWS = ("arrived", "departed", "arrivals", "departures")
+
+
+def _day(value):
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def flows(shipments, archived, days=None):
+    """{day: [arrived, departed, arrivals, departures]} of ``shipments`` and ``archived``, optionally only ``days``."""
+    departs = Q(arrival_date__isnull=False, departure_date__gte=F("arrival_date"))
+    waiting = Q(arrival_date__isnull=False, departure_date__isnull=True) & ~Q(status="delivered")
+    totals  = {}
+    # archived shipments are delivered: they count only with a departure date
+    for qs, stays in ((shipments, departs | waiting), (archived, departs)):
+        for field, moves, offset in (("arrival_date", qs.filter(stays), 0), ("departure_date", qs.filter(departs), 1)):
+            if days is not None:
+                moves = moves.filter(**{f"{field}__in": days})
+            for row in moves.values(day=F(field)).annotate(volume=Sum("volume"), n=Count("*")).order_by():
+                flow = totals.setdefault(row["day"], [0.0, 0.0, 0, 0])
+                flow[offset]     += row["volume"] or 0
+                flow[offset + 2] += row["n"]
+    return totals
+
+
+def day_rows(totals):
+    """``OccupancyDay`` field dicts for ``flows`` totals, with the running on-hand volume."""
+    days    = sorted(totals)
+    on_hand = accumulate(totals[day][0] - totals[day][1] for day in days)
+    return [dict(zip(FLOWS, totals[day]), day=day, on_hand=level) for day, level in zip(days, on_hand)]
+
+
+def rebuild():
+    with transaction.atomic():
+        OccupancyDay.objects.all().delete()
+        rows = day_rows(flows(Shipment.objects.all(), ArchivedShipment.objects.all()))
+        OccupancyDay.objects.bulk_create([OccupancyDay(**row) for row in rows], batch_size=5000)
+    return len(rows)
+
+
+def refresh(changes):
+    """Bring the days ``changes`` touched up to date; returns how many rows were written."""
+    if changes.full:
+        return rebuild()
+    days = {_day(day) for day in changes.dates}
+    if not days:
+        return 0
+    first = min(days)
+    with transaction.atomic():
+        fresh  = flows(Shipment.objects.all(), ArchivedShipment.objects.all(), days)
+        stored = {row.day: row for row in OccupancyDay.objects.select_for_update().filter(day__gte=first)}
+        totals = {day: [getattr(row, f) for f in FLOWS] for day, row in stored.items() if day not in days}
+        totals.update(fresh)
+
+        # one pass re-accumulates on_hand from the first touched day; only rows that moved are written
+        base, added, moved = on_hand(first - timedelta(days=1)), [], []
+        for row in day_rows(totals):
+            row["on_hand"] += base
+            current = stored.pop(row["day"], None)
+            if current is None:
+                added.append(OccupancyDay(**row))
+            elif any(getattr(current, f) != v for f, v in row.items()):
+                for f, v in row.items():
+                    setattr(current, f, v)
+                moved.append(current)
+        OccupancyDay.objects.filter(pk__in=[row.pk for row in stored.values()]).delete()   # days now empty
+        OccupancyDay.objects.bulk_create(added, batch_size=5000)
+        OccupancyDay.objects.bulk_update(moved, [*FLOWS, "on_hand"], batch_size=1000)
+    return len(added) + len(moved) + len(stored)
+
+
+def on_hand(day=None):
+    """Volume (cm³) on hand at the end of ``day`` – today by default."""
+    level = (OccupancyDay.objects.filter(day__lte=day or timezone.localdate())
+             .order_by("-day").values_list("on_hand", flat=True).first())
+    return level or 0.0
+
+
+def utilisation_pct(volume):
+    return round(volume / settings.WAREHOUSE_CAPACITY_CM3 * 100, 2)
+
+
+def series(start, end):
+    """One point per day in [start, end]: that day's flows and the volume on hand at its end."""
+    rows   = {row["day"]: row for row in OccupancyDay.objects.filter(day__range=(start, end)).values()}
+    level  = on_hand(start - timedelta(days=1))
+    points = []
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        row = rows.get(day)
+        if row is not None:
+            level = row["on_hand"]
+        points.append({
+            "date":            day,
+            "arrived":         round(row["arrived"], 2) if row else 0.0,
+            "departed":        round(row["departed"], 2) if row else 0.0,
+            "on_hand":         round(level, 2),
+            "utilisation_pct": utilisation_pct(level),
+        })
+    return points
+
+
+def forecast(horizon, today=None):
+    """
+    The ``horizon`` days after ``today``: ``on_hand`` once the departures (and
+    dated arrivals) already on file happen, and ``projected`` with arrivals
+    also continuing at their average over the last OCCUPANCY_TREND_DAYS.
+    """
+    today  = today or timezone.localdate()
+    trend  = settings.OCCUPANCY_TREND_DAYS
+    recent = OccupancyDay.objects.filter(day__range=(today - timedelta(days=trend - 1), today))
+    rate   = (recent.aggregate(volume=Sum("arrived"))["volume"] or 0) / trend
+    points = series(today + timedelta(days=1), today + timedelta(days=horizon))
+    for point, expected in zip(points, accumulate(repeat(rate, len(points)))):
+        point["projected"]                 = round(point["on_hand"] + expected, 2)
+        point["projected_utilisation_pct"] = utilisation_pct(point["on_hand"] + expected)
+    return points
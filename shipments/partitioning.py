@@ -0,0 +1,319 @@
+"""
+Optional monthly RANGE partitioning of ``shipments_shipment`` on PostgreSQL.
+
+Enabled by ``settings.SHIPMENT_PARTITION_KEY`` ("departure_date" or
+"created_at"). Every other backend – and PostgreSQL with the setting unset –
+keeps the plain table, so all helpers here are no-ops there.
+
+PostgreSQL requires unique constraints on a partitioned table to contain the
+partition key, so once converted:
+  * the primary key becomes (shipment_id, <key>) – or a UNIQUE constraint when
+    the key is the nullable ``departure_date`` (NULLs land in the DEFAULT
+    partition);
+  * ``shipment_id`` stays unique across partitions through
+    ``shipments_shipment_ids``, a one-column table that row triggers keep in
+    step with the shipments; inserting a known ID raises a unique violation
+    just like the old primary key (``ON CONFLICT`` can't see it, so bulk
+    inserts filter known IDs first);
+  * ``shipments_consolidationshipment.shipment_id`` loses its database-level
+    foreign key (the ORM relation is unchanged).
+"""
+from datetime import date, datetime, time, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection as default_connection, transaction
+
+from . import versioning
+
+TABLE          = "shipments_shipment"
+IDS_TABLE      = f"{TABLE}_ids"
+DEFAULT_SUFFIX = "_pdefault"
+PARTITION_KEYS = ("departure_date", "created_at")
+
+
+def partition_key():
+    """The configured partition column, or None when partitioning is off."""
+    key = getattr(settings, "SHIPMENT_PARTITION_KEY", None)
+    if key is not None and key not in PARTITION_KEYS:
+        raise ValueError(f"SHIPMENT_PARTITION_KEY must be one of {PARTITION_KEYS}, got {key!r}")
+    return key
+
+
+def prune_field():
+    """Column date-window filters should target so PostgreSQL can prune partitions."""
+    return partition_key() or "departure_date"
+
+
+def window_filter(since=None, until=None):
+    """ORM kwargs for a [since, until) date window on ``prune_field()``."""
+    field = prune_field()
+    if field == "created_at":
+        as_dt = lambda d: datetime.combine(d, time.min, tzinfo=dt_timezone.utc)
+        since, until = since and as_dt(since), until and as_dt(until)
+    window = {f"{field}__gte": since, f"{field}__lt": until}
+    return {k: v for k, v in window.items() if v is not None}
+
+
+def month_start(d):
+    return date(d.year, d.month, 1)
+
+
+def add_months(d, n):
+    months = d.year * 12 + d.month - 1 + n
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{TABLE}_p{month:%Y%m}"
+
+
+def partition_month(name):
+    """Inverse of ``partition_name`` (None for the DEFAULT partition / foreign names)."""
+    suffix = name.rsplit("_p", 1)[-1]
+    if len(suffix) != 6 or not suffix.isdigit():
+        return None
+    return date(int(suffix[:4]), int(suffix[4:]), 1)
+
+
+def partition_ddl(month):
+    return (
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(month)}" PARTITION OF "{TABLE}" '
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+    )
+
+
+# row triggers on the partitioned table, cloned onto every partition
+IDS_TRIGGER_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION "{IDS_TABLE}_sync"() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        TRUNCATE "{IDS_TABLE}";
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND OLD.shipment_id IS DISTINCT FROM NEW.shipment_id) THEN
+        DELETE FROM "{IDS_TABLE}" WHERE shipment_id = OLD.shipment_id;
+    END IF;
+    IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND OLD.shipment_id IS DISTINCT FROM NEW.shipment_id) THEN
+        INSERT INTO "{IDS_TABLE}" (shipment_id) VALUES (NEW.shipment_id);
+    END IF;
+    RETURN NULL;
+END $$
+"""
+
+
+def install_unique_ids(connection=default_connection):
+    """
+    Create and fill ``shipments_shipment_ids`` and its triggers on a
+    partitioned table that doesn't have them yet. Fails if the table already
+    holds duplicate shipment IDs.
+    """
+    with transaction.atomic(using=connection.alias), connection.cursor() as cur:
+        cur.execute("SELECT to_regclass(%s)", [IDS_TABLE])
+        if cur.fetchone()[0] is not None:
+            return False
+        cur.execute(f'SELECT shipment_id FROM "{TABLE}" GROUP BY shipment_id HAVING count(*) > 1 LIMIT 5')
+        duplicates = [row[0] for row in cur.fetchall()]
+        if duplicates:
+            raise RuntimeError(f"{TABLE} holds duplicate shipment IDs (e.g. {', '.join(duplicates)}); "
+                               f"remove them before installing {IDS_TABLE}")
+        cur.execute(f'CREATE TABLE "{IDS_TABLE}" AS SELECT "shipment_id" FROM "{TABLE}"')
+        cur.execute(f'ALTER TABLE "{IDS_TABLE}" ADD PRIMARY KEY ("shipment_id")')
+        cur.execute(IDS_TRIGGER_FUNCTION)
+        cur.execute(
+            f'CREATE TRIGGER "{IDS_TABLE}_row" AFTER INSERT OR DELETE OR UPDATE OF "shipment_id" '
+            f'ON "{TABLE}" FOR EACH ROW EXECUTE FUNCTION "{IDS_TABLE}_sync"()'
+        )
+        cur.execute(
+            f'CREATE TRIGGER "{IDS_TABLE}_truncate" AFTER TRUNCATE '
+            f'ON "{TABLE}" FOR EACH STATEMENT EXECUTE FUNCTION "{IDS_TABLE}_sync"()'
+        )
+    return True
+
+
+def enabled(connection=default_connection):
+    return connection.vendor == "postgresql" and partition_key() is not None
+
+
+def is_partitioned(connection=default_connection):
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cur:
+        cur.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [TABLE],
+        )
+        return cur.fetchone() is not None
+
+
+def list_partitions(connection=default_connection):
+    with connection.cursor() as cur:
+        cur.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s ORDER BY c.relname",
+            [TABLE],
+        )
+        return [row[0] for row in cur.fetchall()]
+
+
+def split_default(cur, month):
+    """
+    Create ``month``'s partition when the DEFAULT partition already holds rows
+    for it (PostgreSQL won't add a partition over them): DEFAULT is detached,
+    its rows for the month move into a new table that is then attached as the
+    partition, and DEFAULT is attached again. Detached tables carry no
+    triggers, so ``shipments_shipment_ids`` is left as it is.
+    """
+    key, name, default = partition_key(), partition_name(month), f"{TABLE}{DEFAULT_SUFFIX}"
+    lo, hi = f"{month:%Y-%m-%d}", f"{add_months(month, 1):%Y-%m-%d}"
+    cur.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{default}"')
+    cur.execute(f'CREATE TABLE "{name}" (LIKE "{TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    cur.execute(
+        f'WITH moved AS (DELETE FROM "{default}" WHERE "{key}" >= %s AND "{key}" < %s RETURNING *) '
+        f'INSERT INTO "{name}" SELECT * FROM moved',
+        [lo, hi],
+    )
+    cur.execute(
+        f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{name}" '
+        f"FOR VALUES FROM ('{lo}') TO ('{hi}')"
+    )
+    cur.execute(f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{default}" DEFAULT')
+
+
+def ensure_partitions(connection=default_connection, months_ahead=None, today=None):
+    """Create the monthly partitions from this month to ``months_ahead`` months out."""
+    if not is_partitioned(connection):
+        return []
+    if months_ahead is None:
+        months_ahead = getattr(settings, "SHIPMENT_PARTITION_MONTHS_AHEAD", 3)
+    first    = month_start(today or date.today())
+    existing = set(list_partitions(connection))
+    default  = f"{TABLE}{DEFAULT_SUFFIX}"
+    key      = partition_key()
+    created  = []
+    with transaction.atomic(using=connection.alias), connection.cursor() as cur:
+        for n in range(months_ahead + 1):
+            month = add_months(first, n)
+            if partition_name(month) in existing:
+                continue
+            stranded = False
+            if default in existing:
+                cur.execute(f'SELECT EXISTS (SELECT 1 FROM "{default}" WHERE "{key}" >= %s AND "{key}" < %s)',
+                            [month, add_months(month, 1)])
+                stranded = cur.fetchone()[0]
+            if stranded:
+                split_default(cur, month)
+            else:
+                cur.execute(partition_ddl(month))
+            created.append(partition_name(month))
+    return created
+
+
+def detach_partitions(before, connection=default_connection, drop=False):
+    """
+    Detach (and optionally drop) every monthly partition that ends on or before
+    ``before``. A detached partition is an ordinary table – dump or archive it
+    at leisure; the hot table no longer scans or vacuums it.
+
+    Its shipments leave the API like archived ones: tombstoned for the change
+    feed, unlinked from their consolidations (there's no foreign key to do it)
+    and followed by a full ``shipments_changed`` and a consolidations bump.
+    """
+    from .models import ConsolidationShipment, ShipmentTombstone
+    from .signals import ShipmentChanges
+
+    if not is_partitioned(connection):
+        return []
+    detached, unlinked = [], 0
+    with transaction.atomic(using=connection.alias), connection.cursor() as cur:
+        for name in list_partitions(connection):
+            month = partition_month(name)
+            if month is None or add_months(month, 1) > before:
+                continue
+            cur.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+            cur.execute(
+                f'INSERT INTO "{ShipmentTombstone._meta.db_table}" (shipment_id, deleted_at, reason) '
+                f'SELECT shipment_id, now(), %s FROM "{name}"',
+                [ShipmentTombstone.ARCHIVED],
+            )
+            cur.execute(
+                f'DELETE FROM "{ConsolidationShipment._meta.db_table}" c USING "{name}" p '
+                f"WHERE c.shipment_id = p.shipment_id"
+            )
+            unlinked += cur.rowcount
+            # its shipments are gone from the table, so their IDs are free again
+            cur.execute(f'DELETE FROM "{IDS_TABLE}" i USING "{name}" p WHERE i.shipment_id = p.shipment_id')
+            if drop:
+                cur.execute(f'DROP TABLE "{name}"')
+            detached.append(name)
+    if detached:
+        ShipmentChanges(full=True).send_robust(sender=ShipmentTombstone)   # bumps the shipment versions
+    if unlinked:
+        versioning.bump(versioning.CONSOLIDATIONS)
+    return detached
+
+
+def convert_to_partitioned(connection=default_connection, key=None, today=None, model=None):
+    """
+    Rebuild ``shipments_shipment`` as a partitioned table: one partition per
+    month that holds data, the upcoming months, and a DEFAULT partition, with
+    ``shipments_shipment_ids`` keeping ``shipment_id`` unique.
+    Runs in a single transaction; rows are copied once. Migrations pass their
+    historical ``model`` so only the indexes that exist at that point are built.
+    """
+    if model is None:
+        from .models import Shipment as model
+
+    key    = key or partition_key()
+    legacy = f"{TABLE}_legacy"
+    if connection.vendor != "postgresql" or key is None or is_partitioned(connection):
+        return False
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cur:
+        cur.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{legacy}"')
+
+        # FKs pointing at the old PK can't reference a partitioned table
+        cur.execute(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+            "WHERE contype = 'f' AND confrelid = %s::regclass",
+            [legacy],
+        )
+        for table, name in cur.fetchall():
+            cur.execute(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"')
+
+        cur.execute(
+            f'CREATE TABLE "{TABLE}" (LIKE "{legacy}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE ("{key}")'
+        )
+        nullable = model._meta.get_field(key).null
+        cur.execute(
+            f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{TABLE}_pk" '
+            f'{"UNIQUE" if nullable else "PRIMARY KEY"} ("shipment_id", "{key}")'
+        )
+        cur.execute(
+            f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{TABLE}_customer_id_fk" FOREIGN KEY ("customer_id") '
+            f'REFERENCES "shipments_customer" ("customer_id") DEFERRABLE INITIALLY DEFERRED'
+        )
+
+        cur.execute(f'SELECT min("{key}")::date FROM "{legacy}"')
+        oldest = cur.fetchone()[0]
+        first  = month_start(oldest or today or date.today())
+        last   = add_months(month_start(today or date.today()),
+                            getattr(settings, "SHIPMENT_PARTITION_MONTHS_AHEAD", 3))
+        month = first
+        while month <= last:
+            cur.execute(partition_ddl(month))
+            month = add_months(month, 1)
+        cur.execute(f'CREATE TABLE "{TABLE}{DEFAULT_SUFFIX}" PARTITION OF "{TABLE}" DEFAULT')
+
+        cur.execute(f'INSERT INTO "{TABLE}" SELECT * FROM "{legacy}"')
+        cur.execute(f'DROP TABLE "{legacy}"')
+        install_unique_ids(connection)
+
+        # indexes last: cheaper to build once the data is in
+        cur.execute(f'CREATE INDEX "{TABLE}_customer_id_idx" ON "{TABLE}" ("customer_id")')
+        with connection.schema_editor(atomic=False) as editor:
+            for index in model._meta.indexes:
+                editor.add_index(model, index)
+    return True
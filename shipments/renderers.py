@@ -0,0 +1,160 @@
+"""
+Compact binary formats for bulk API clients.
+
+``MessagePackRenderer`` (``Accept: application/msgpack`` or ``?format=msgpack``)
+and ``ArrowRenderer`` (``Accept: application/vnd.apache.arrow.stream`` or
+``?format=arrow``) are offered next to JSON by the shipment and consolidation
+viewsets. Their list pages skip the serializer: rows come straight from
+``values_list`` into a ``Columns`` page – one list per field – so no per-row
+dict is built and floats / datetimes are written natively instead of through
+``repr`` / ``isoformat``.
+
+* MessagePack: the usual ``count / next / previous / results`` envelope with
+  ``results`` as ``{field: [values]}``. Dates are ISO strings, datetimes
+  MessagePack timestamps (``msgpack.unpackb(body, timestamp=3)`` gives
+  datetimes back).
+* Arrow: one IPC stream of typed columns; ``count`` / ``next`` / ``previous``
+  are in the schema metadata.
+
+msgpack and pyarrow are optional; without them the format isn't offered
+(406, or 404 for ``?format=``). pyarrow is only imported by the first Arrow response,
+so web processes don't pay for it at boot.
+"""
+import functools
+import importlib
+import importlib.util
+from datetime import date
+from decimal import Decimal
+from uuid import UUID
+
+from rest_framework.renderers import BaseRenderer
+
+try:
+    import msgpack
+except ImportError:        # pragma: no cover
+    msgpack = None
+
+HAS_ARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+@functools.cache
+def arrow():
+    importlib.import_module("pyarrow.ipc")
+    return importlib.import_module("pyarrow")
+
+
+FIELD_TYPES = {
+    "AutoField":            "int",
+    "BigAutoField":         "int",
+    "IntegerField":         "int",
+    "PositiveIntegerField": "int",
+    "FloatField":           "float",
+    "DateField":            "date",
+    "DateTimeField":        "datetime",
+}
+
+
+def column_type(model, name):
+    """Renderer type of ``model.name`` – relations take their target's type."""
+    field = model._meta.get_field(name)
+    if field.is_relation:
+        field = field.target_field
+    return FIELD_TYPES.get(field.get_internal_type(), "string")
+
+
+class Columns:
+    """A page of rows held column-wise: ``names``, their ``types`` and one list per name."""
+
+    def __init__(self, names, types, data):
+        self.names = list(names)
+        self.types = list(types)
+        self.data  = data
+
+    @classmethod
+    def from_rows(cls, model, names, rows):
+        """Columns of ``values_list(*names)`` rows of ``model``."""
+        rows = list(rows)
+        data = [list(column) for column in zip(*rows)] if rows else [[] for _ in names]
+        return cls(names, [column_type(model, name) for name in names], data)
+
+    def __len__(self):
+        return len(self.data[0]) if self.data else 0
+
+    def add(self, name, kind, values):
+        self.names.append(name)
+        self.types.append(kind)
+        self.data.append(values)
+
+
+def _to_msgpack(obj):
+    if isinstance(obj, Columns):
+        return {name: [d.isoformat() if d is not None else None for d in column] if kind == "date" else column
+                for name, kind, column in zip(obj.names, obj.types, obj.data)}
+    if isinstance(obj, date):   # aware datetimes are packed natively
+        return obj.isoformat()
+    if isinstance(obj, (Decimal, UUID)):
+        return str(obj)
+    if isinstance(obj, (tuple, set, frozenset)):
+        return list(obj)
+    raise TypeError(f"{type(obj).__name__} is not MessagePack serializable")
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format     = "msgpack"
+    charset    = None
+    columnar   = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_to_msgpack, datetime=True)
+
+
+class ArrowRenderer(BaseRenderer):
+    """Tabular responses as an Arrow IPC stream; anything else becomes a one-row table."""
+    media_type = "application/vnd.apache.arrow.stream"
+    format     = "arrow"
+    charset    = None
+    columnar   = True
+
+    @staticmethod
+    def arrow_type(kind):
+        pa = arrow()
+        return {
+            "int":      pa.int64(),
+            "float":    pa.float64(),
+            "date":     pa.date32(),
+            "datetime": pa.timestamp("us", tz="UTC"),
+            "strings":  pa.list_(pa.string()),
+        }.get(kind, pa.string())
+
+    def table(self, data):
+        pa = arrow()
+        metadata = {}
+        if isinstance(data, dict) and "results" in data:
+            metadata = {k: "" if v is None else str(v) for k, v in data.items() if k != "results"}
+            data     = data["results"]
+        if isinstance(data, Columns):
+            arrays = [pa.array(column, type=self.arrow_type(kind)) for kind, column in zip(data.types, data.data)]
+            table  = pa.Table.from_arrays(arrays, names=data.names)
+        else:
+            rows  = data if isinstance(data, list) else [data]
+            table = pa.Table.from_pylist([dict(row) for row in rows])
+        return table.replace_schema_metadata(metadata) if metadata else table
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        pa    = arrow()
+        table = self.table(data)
+        sink  = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+
+BINARY_RENDERERS = [
+    *([MessagePackRenderer] if msgpack is not None else []),
+    *([ArrowRenderer] if HAS_ARROW else []),
+]
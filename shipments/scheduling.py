@@ -0,0 +1,109 @@
+"""
+Queues and admission control for the background tasks.
+
+``route_task`` (``CELERY_TASK_ROUTES``) sends imports to ``imports.bulk`` or
+``imports.small`` by file size and rebuilds to ``consolidation``, so a
+multi-million-row upload only occupies the bulk workers::
+
+    celery -A backend worker -Q imports.small,consolidation -c 4
+    celery -A backend worker -Q imports.bulk -c 1
+
+``claim_import`` caps how many imports of one tenant run at once; the task
+retries later when the tenant is at its limit. The tenant is the uploading
+user (``tenant_of``), never a value the client chooses, so the cap can't be
+sidestepped by naming a new one. ``request_consolidation``
+debounces rebuilds: a burst of imports leaves one PENDING run behind.
+"""
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ConsolidationRun, CsvImport
+
+BULK_QUEUE          = "imports.bulk"
+SMALL_QUEUE         = "imports.small"
+CONSOLIDATION_QUEUE = "consolidation"
+PENDING_GRACE       = timedelta(hours=1)   # past its countdown, a PENDING run is presumed lost
+
+
+def import_queue(file_path):
+    try:
+        size = os.path.getsize(file_path)
+    except OSError:
+        return SMALL_QUEUE
+    return BULK_QUEUE if size >= settings.IMPORT_BULK_THRESHOLD_BYTES else SMALL_QUEUE
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    if name == "shipments.tasks.process_csv":
+        file_path = args[1] if len(args) > 1 else kwargs.get("file_path")
+        return {"queue": import_queue(file_path)}
+    if name == "shipments.tasks.generate_consolidations":
+        return {"queue": CONSOLIDATION_QUEUE}
+    return None   # maintenance tasks stay on the default queue
+
+
+def tenant_of(request):
+    """The tenant an upload counts against: its user, or "" – one shared limit – when anonymous."""
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return ""
+    return user.get_username()[:CsvImport._meta.get_field("tenant").max_length]
+
+
+def running_imports(now=None):
+    """PROCESSING imports, minus ones stuck for longer than IMPORT_MAX_RUNTIME_SECONDS."""
+    stuck = (now or timezone.now()) - timedelta(seconds=settings.IMPORT_MAX_RUNTIME_SECONDS)
+    return (CsvImport.objects.filter(status="PROCESSING")
+            .alias(began=Coalesce("started_at", "uploaded_at")).filter(began__gte=stuck))
+
+
+def claim_import(import_id):
+    """
+    Mark the import PROCESSING unless its tenant already runs
+    IMPORT_TENANT_CONCURRENCY imports; None means "retry later".
+    """
+    with transaction.atomic():
+        imp = CsvImport.objects.select_for_update().get(pk=import_id)
+        # lock the tenant's queued and running imports in one order, so
+        # concurrent claims for the same tenant take turns
+        list(CsvImport.objects.select_for_update()
+             .filter(tenant=imp.tenant, status__in=["PENDING", "PROCESSING"])
+             .order_by("pk").values_list("pk", flat=True))
+        running = running_imports().filter(tenant=imp.tenant).exclude(pk=imp.pk).count()
+        if running >= settings.IMPORT_TENANT_CONCURRENCY:
+            return None
+        imp.status, imp.started_at = "PROCESSING", timezone.now()
+        imp.save(update_fields=["status", "started_at"])
+    return imp
+
+
+def request_consolidation(delay=None):
+    """
+    Schedule a rebuild ``delay`` seconds out (CONSOLIDATION_DEBOUNCE_SECONDS)
+    unless one is already waiting – it will see the new rows too. Returns
+    the pending ConsolidationRun, or None when nothing new was scheduled.
+    """
+    from .tasks import generate_consolidations
+
+    delay = settings.CONSOLIDATION_DEBOUNCE_SECONDS if delay is None else delay
+    if delay is None:   # imports don't trigger rebuilds
+        return None
+    now   = timezone.now()
+    # a run whose message never arrived must not block scheduling forever
+    ConsolidationRun.objects.filter(
+        status="PENDING", started_at__lt=now - timedelta(seconds=delay) - PENDING_GRACE,
+    ).update(status="ERROR", finished_at=now)
+    try:
+        with transaction.atomic():
+            run = ConsolidationRun.objects.create(status="PENDING", started_at=now)
+    except IntegrityError:   # one_pending_consolidation
+        return None
+    transaction.on_commit(
+        lambda: generate_consolidations.apply_async(kwargs={"run_id": run.pk}, countdown=delay)
+    )
+    return run
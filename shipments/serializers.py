@@ -1,22 +1,62 @@
 from rest_framework import serializers
-from .models import Shipment, CsvImport, Consolidation, ConsolidationShipment, Customer
+from .models import (
+    Shipment, CsvImport, Consolidation, ConsolidationShipment, ConsolidationRun, Customer,
+    ArchivedShipment,
+)
+from .customers import customer_cache
+
+class CachedCustomerField(serializers.PrimaryKeyRelatedField):
+    """Validates customer ids against the customer cache instead of a query per write."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool) or data in (None, ""):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        customer = customer_cache.get(data)
+        if customer is None:
+            self.fail("does_not_exist", pk_value=data)
+        return customer
 
 class ShipmentSerializer(serializers.ModelSerializer):
-    customer_id = serializers.PrimaryKeyRelatedField(
+    customer_id = CachedCustomerField(
         source='customer',
         queryset=Customer.objects.all(),
         write_only=True
     )
+    customer = CachedCustomerField(queryset=Customer.objects.all(), required=False, allow_null=True)
+
     class Meta:
         model  = Shipment
         fields = "__all__"
         include = ['customer_id']
 
+class ArchivedShipmentSerializer(serializers.ModelSerializer):
+    """Renders an archived shipment in the same shape as ShipmentSerializer."""
+    customer = serializers.CharField(source="customer_id", allow_null=True)
+    status   = serializers.SerializerMethodField()
+
+    class Meta:
+        model  = ArchivedShipment
+        fields = [
+            "shipment_id", "customer", "carrier", "origin", "destination", "weight", "volume",
+            "mode", "status", "arrival_date", "departure_date", "delivered_date",
+            "created_at", "updated_at",
+        ]
+
+    def get_status(self, obj):
+        return "delivered"
+
 class CsvImportSerializer(serializers.ModelSerializer):
     class Meta:
         model  = CsvImport
-        fields = ["id", "file", "file_name", "uploaded_at", "status", "processed_rows", "total_rows"]
-        read_only_fields = ["file_name", "uploaded_at", "status", "processed_rows", "total_rows"]
+        fields = ["id", "file", "file_name", "tenant", "uploaded_at", "started_at", "status",
+                  "processed_rows", "total_rows", "telemetry"]
+        read_only_fields = ["file_name", "tenant", "uploaded_at", "started_at", "status", "processed_rows",
+                            "total_rows", "telemetry"]   # tenant: set from the uploading user
+
+class ConsolidationRunSerializer(serializers.ModelSerializer):
+    class Meta:
+        model  = ConsolidationRun
+        fields = ["id", "started_at", "finished_at", "status", "groups", "telemetry"]
 
 class ConsolidationShipmentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -35,4 +75,5 @@ class ConsolidationModelSerializer(serializers.ModelSerializer):
 
     def get_shipments(self, obj):
         # return a list of shipment IDs (or use a nested ShipmentSerializer)
-        return obj.consolidationshipment_set.values_list("shipment_id", flat=True)
+        # read the prefetched links – a values_list() here would query per consolidation
+        return [link.shipment_id for link in obj.consolidationshipment_set.all()]
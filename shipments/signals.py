@@ -0,0 +1,83 @@
+"""
+``shipments_changed`` is sent once per logical write – an API create/update/
+delete, a CSV import, an archive run – with a ``ShipmentChanges`` summary of
+what was touched. Bulk paths bypass model signals, so receivers that keep
+derived data fresh (data versions, caches, rollups) listen here instead.
+"""
+import logging
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from . import lanes, occupancy, versioning
+from .customers import customer_cache
+from .models import Customer
+
+logger = logging.getLogger(__name__)
+
+shipments_changed = Signal()   # kwargs: changes (ShipmentChanges)
+
+
+class ShipmentChanges:
+    """Destinations, statuses and dates touched by a write (``full``: extent unknown)."""
+
+    def __init__(self, full=False):
+        self.full         = full
+        self.destinations = set()
+        self.statuses     = set()
+        self.dates        = set()
+
+    def add(self, destination, status, arrival_date=None, departure_date=None):
+        self.destinations.add(destination)
+        self.statuses.add(status)
+        if arrival_date:
+            self.dates.add(arrival_date)
+        if departure_date:
+            self.dates.add(departure_date)
+
+    def add_shipment(self, shipment):
+        self.add(shipment.destination, shipment.status, shipment.arrival_date, shipment.departure_date)
+
+    def __bool__(self):
+        return self.full or bool(self.destinations)
+
+    def send(self, sender):
+        if self:
+            shipments_changed.send(sender=sender, changes=self)
+
+    def send_robust(self, sender):
+        """Like ``send``, but every receiver runs and failures are logged instead of raised."""
+        if not self:
+            return []
+        failed = [(r, e) for r, e in shipments_changed.send_robust(sender=sender, changes=self)
+                  if isinstance(e, Exception)]
+        for receiver, exc in failed:
+            logger.error("shipments_changed receiver %s failed", receiver.__name__, exc_info=exc)
+        return failed
+
+
+@receiver(shipments_changed)
+def refresh_lane_rollups(sender, changes, **kwargs):
+    lanes.refresh(changes)
+
+
+@receiver(shipments_changed)
+def refresh_occupancy(sender, changes, **kwargs):
+    occupancy.refresh(changes)
+
+
+# Connected last: a new version must not go live before the derived tables
+# above are refreshed, or a read in between would cache stale data under it.
+@receiver(shipments_changed)
+def bump_shipments_version(sender, changes, **kwargs):
+    scopes = [versioning.SHIPMENTS]
+    scopes += [versioning.tag("destination", d) for d in changes.destinations]
+    scopes += [versioning.tag("status", s) for s in changes.statuses]
+    if changes.full:
+        scopes.append(versioning.BULK)
+    versioning.bump(*scopes)
+
+
+@receiver([post_save, post_delete], sender=Customer)
+def invalidate_customer(sender, instance, **kwargs):
+    customer_cache.invalidate([instance.pk])
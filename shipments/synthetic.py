@@ -0,0 +1,117 @@
+"""
+Deterministic generator for realistic freight manifests.
+
+Rows follow the column order ``process_csv`` COPYs/parses and mimic what
+real manifests look like: a handful of destinations and origin states carry
+most of the volume (Zipf-skewed), departures cluster on scheduled sailing /
+flight days, and a small pool of customers ships again and again.
+The same ``(rows, seed)`` pair always yields byte-identical output.
+"""
+import csv
+import math
+import random
+from datetime import date, timedelta
+from itertools import accumulate
+
+HEADER = [
+    "shipment_id", "customer_id", "origin", "destination", "weight", "volume",
+    "mode", "carrier", "status", "arrival_date", "departure_date", "delivered_date",
+]
+
+DESTINATIONS = ["JAM", "TRI", "BAR", "BAH", "GUY", "DOM", "CAY", "LCA", "GRD", "ANT", "SKN", "VCT", "BLZ", "TCA"]
+ORIGINS      = ["FL", "NY", "NJ", "TX", "GA", "CA", "MD", "PA", "MA", "CT", "IL", "NC", "VA", "OH", "MI"]
+CARRIERS     = {
+    "air": ["SkyLink Cargo", "Caribbean Air Freight", "Island Express", "AeroCarib"],
+    "sea": ["Tropical Shipping", "Seaboard Marine", "Crowley", "King Ocean", "Hamburg Sud"],
+}
+AIR_SHARE    = 0.3
+AS_OF        = date(2025, 6, 30)   # "today" of the synthetic world
+HISTORY_DAYS = 365
+CHUNK        = 10_000
+
+PRESETS = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+
+
+def parse_rows(value):
+    """'10k' / '1m' / '10m' or a plain integer."""
+    value = str(value).lower()
+    return PRESETS[value] if value in PRESETS else int(value)
+
+
+def _zipf_cum_weights(n, s=1.1):
+    return list(accumulate(1 / (i + 1) ** s for i in range(n)))
+
+
+def customer_ids(rows):
+    """The customer pool a manifest of ``rows`` draws from (numeric IDs, as the importer expects)."""
+    return [str(100_000 + i) for i in range(max(rows // 40, 10))]
+
+
+def _sailings(rng):
+    """Departure days per (mode, destination): sea sails weekly, air 3×/week."""
+    first = AS_OF - timedelta(days=HISTORY_DAYS)
+    days  = [first + timedelta(days=d) for d in range(HISTORY_DAYS + 30)]
+    sailings = {}
+    for dest in DESTINATIONS:
+        sea_day  = rng.randrange(7)
+        air_days = set(rng.sample(range(7), 3))
+        sailings["sea", dest] = [d for d in days if d.weekday() == sea_day]
+        sailings["air", dest] = [d for d in days if d.weekday() in air_days]
+    return sailings
+
+
+def generate_manifest(rows, seed=42):
+    """Yield ``rows`` manifest rows (lists of strings in ``HEADER`` order)."""
+    rng       = random.Random(seed)
+    sailings  = _sailings(rng)
+    customers = customer_ids(rows)
+    cust_w    = _zipf_cum_weights(len(customers))
+    dest_w    = _zipf_cum_weights(len(DESTINATIONS))
+    orig_w    = _zipf_cum_weights(len(ORIGINS))
+
+    produced = 0
+    while produced < rows:
+        n     = min(CHUNK, rows - produced)
+        custs = rng.choices(customers, cum_weights=cust_w, k=n)
+        dests = rng.choices(DESTINATIONS, cum_weights=dest_w, k=n)
+        origs = rng.choices(ORIGINS, cum_weights=orig_w, k=n)
+        for i in range(n):
+            mode      = "air" if rng.random() < AIR_SHARE else "sea"
+            departure = rng.choice(sailings[mode, dests[i]])
+            arrival   = departure - timedelta(days=rng.randint(1, 14))
+            delivered = departure + timedelta(days=rng.randint(1, 3) if mode == "air" else rng.randint(4, 12))
+            if arrival > AS_OF:
+                # booked but not yet dropped at the warehouse
+                status, arrival, delivered = "received", None, None
+            elif departure > AS_OF:
+                status, delivered = "received", None
+            elif delivered > AS_OF:
+                status, delivered = "in-transit", None
+            else:
+                status = "delivered"
+
+            # weights in grams / volumes in cm³, log-normally distributed
+            weight = round(math.exp(rng.gauss(9.5 if mode == "air" else 11.0, 1.0)), 1)
+            volume = round(weight * rng.uniform(2.0, 6.0), 1)
+            yield [
+                f"SHP{produced + i:010d}",
+                custs[i],
+                origs[i],
+                dests[i],
+                weight,
+                volume,
+                mode,
+                rng.choice(CARRIERS[mode]),
+                status,
+                arrival.isoformat() if arrival else "",
+                departure.isoformat(),
+                delivered.isoformat() if delivered else "",
+            ]
+        produced += n
+
+
+def write_manifest(fileobj, rows, seed=42):
+    """Write a CSV manifest (with header) to an open text file."""
+    writer = csv.writer(fileobj)
+    writer.writerow(HEADER)
+    writer.writerows(generate_manifest(rows, seed))
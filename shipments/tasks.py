@@ -3,8 +3,16 @@ from celery import shared_task
 from django.conf import settings
 from django.db import connection, transaction
 from django.db.models import Count, Sum
-from .models import CsvImport, Shipment, Consolidation, ConsolidationShipment, Customer
+from django.utils import timezone
+from .models import (
+    CsvImport, Shipment, Consolidation, ConsolidationShipment, ConsolidationRun
+)
+from .telemetry import TaskTelemetry
+from . import archive, changefeed, events, partitioning, scheduling, versioning
+from .customers import customer_cache
+from .signals import ShipmentChanges
 from datetime import datetime
+from time import perf_counter
 
 DATE_INPUT_FORMATS = ("%m/%d/%Y", "%d/%m/%Y", "%Y-%m-%d")
 
@@ -23,123 +31,276 @@ def parse_date(value: str | None):
     # If none match, raise so you see the bad value
     raise ValueError(f"Unrecognised date format: {value!r}")
 
+CSV_COLUMNS = (
+    "shipment_id, customer_id, origin, destination, weight, volume, "
+    "mode, carrier, status, arrival_date, departure_date, delivered_date"
+)
+
+def _copy_csv(file_path, tel, changes):
+    """
+    PostgreSQL fast path: COPY the file into a temp staging table, then
+    upsert customers and shipments set-wise. Going through staging lets
+    duplicate shipment IDs be skipped (like ``ignore_conflicts`` on the
+    bulk_create path – the first row of an ID in the file wins) and fills
+    the NOT NULL timestamps COPY can't.
+    """
+    t0 = perf_counter()
+    with transaction.atomic(), connection.cursor() as cur:
+        with tel.phase("read"), open(file_path, "r") as f:
+            cur.execute(
+                f"CREATE TEMP TABLE shipments_stage ON COMMIT DROP AS "
+                f"SELECT {CSV_COLUMNS} FROM shipments_shipment WITH NO DATA"
+            )
+            cur.copy_expert(
+                sql=f"COPY shipments_stage({CSV_COLUMNS}) FROM STDIN WITH (FORMAT csv, HEADER true)",
+                file=f,
+            )
+        with tel.phase("customers"):
+            cur.execute(
+                "INSERT INTO shipments_customer (customer_id, name, email) "
+                "SELECT DISTINCT customer_id, '', '' FROM shipments_stage "
+                "WHERE customer_id IS NOT NULL ON CONFLICT DO NOTHING"
+            )
+        with tel.phase("insert"):
+            # staging keeps only the rows that become shipments – the first of
+            # each new ID – so events and changes come from those alone. Known
+            # IDs are filtered here: on a partitioned table ON CONFLICT can't
+            # see shipment_id's uniqueness (see partitioning). Anti-joins, not
+            # NOT IN (subquery): that rescans per row once it outgrows work_mem.
+            cur.execute(
+                "DELETE FROM shipments_stage s USING shipments_stage d "
+                "WHERE d.shipment_id = s.shipment_id AND d.ctid < s.ctid"
+            )
+            cur.execute(
+                "DELETE FROM shipments_stage s USING shipments_shipment t WHERE t.shipment_id = s.shipment_id"
+            )
+            cur.execute(
+                f"WITH inserted AS ("
+                f"INSERT INTO shipments_shipment ({CSV_COLUMNS}, created_at, updated_at) "
+                f"SELECT {CSV_COLUMNS}, now(), now() FROM shipments_stage "
+                f"ON CONFLICT DO NOTHING RETURNING shipment_id) "
+                f"DELETE FROM shipments_stage s "
+                f"WHERE NOT EXISTS (SELECT 1 FROM inserted i WHERE i.shipment_id = s.shipment_id)"
+            )
+            cur.execute(
+                "SELECT array_agg(DISTINCT destination), array_agg(DISTINCT status), "
+                "array_agg(DISTINCT arrival_date) || array_agg(DISTINCT departure_date) "
+                "FROM shipments_stage"
+            )
+            destinations, statuses, dates = cur.fetchone()
+            changes.destinations.update(destinations or ())
+            changes.statuses.update(statuses or ())
+            changes.dates.update(d for d in dates or () if d)
+        with tel.phase("events"):
+            cur.execute(events.stage_insert_sql("shipments_stage"))
+        # ON COMMIT DROP only fires at the outermost commit; a caller's
+        # transaction may run another import first
+        cur.execute("DROP TABLE shipments_stage")
+        commit_t0 = perf_counter()
+    tel.phases["commit"] += perf_counter() - commit_t0
+    tel.record_batch(perf_counter() - t0)
+
+def _flush_batch(import_id, batch, processed, tel):
+    t0 = perf_counter()
+    with tel.phase("customers"):
+        customer_cache.ensure({shipment.customer_id for shipment in batch})
+    with tel.phase("insert"):
+        # events only for the rows that become shipments: known IDs are
+        # skipped and the first row of a repeated one wins
+        known = set(Shipment.objects.filter(pk__in=[s.shipment_id for s in batch]).values_list("pk", flat=True))
+        fresh = {}
+        for shipment in batch:
+            if shipment.shipment_id not in known:
+                fresh.setdefault(shipment.shipment_id, shipment)
+        Shipment.objects.bulk_create(fresh.values(), ignore_conflicts=True)
+    with tel.phase("events"):
+        events.record(fresh.values())
+    with tel.phase("progress"):   # each statement above autocommits; this is the processed_rows UPDATE
+        CsvImport.objects.filter(pk=import_id).update(processed_rows=processed)
+    tel.record_batch(perf_counter() - t0)
+    batch.clear()
+
 @shared_task(bind=True)
 def process_csv(self, import_id, file_path):
-    imp = CsvImport.objects.get(pk=import_id)
-    imp.status = "PROCESSING"
-    imp.save(update_fields=["status"])
+    imp = scheduling.claim_import(import_id)
+    if imp is None:   # the tenant is at IMPORT_TENANT_CONCURRENCY; stay PENDING
+        raise self.retry(countdown=settings.IMPORT_RETRY_SECONDS, max_retries=None)
 
     POSTGRES = connection.vendor == "postgresql"
+    tel = TaskTelemetry()
+    changes = ShipmentChanges()
 
     try:
         if POSTGRES:
-            with connection.cursor() as cur, open(file_path, "r") as f:
-                cur.copy_expert(
-                    sql="""
-                    COPY shipments_shipment(
-                        shipment_id, customer_id, origin, destination, weight, volume,
-                        mode, carrier, status,
-                        arrival_date, departure_date, delivered_date
-                    )
-                    FROM STDIN WITH (FORMAT csv, HEADER true)
-                    """,
-                    file=f,
-                )
+            _copy_csv(file_path, tel, changes)
             imp.processed_rows = imp.total_rows
+            tel.rows = imp.total_rows
         else:
             # SQLite or any DB without COPY ─ row-by-row bulk_create
+            # (per-row phases are timed inline: a context manager per row is measurable)
+            phases = tel.phases
             with open(file_path, newline="") as f:
                 reader = csv.DictReader(f)
                 batch, processed = [], 0
 
-                for row in reader:
+                while True:
+                    t0 = perf_counter()
+                    row = next(reader, None)
+                    t1 = perf_counter()
+                    phases["read"] += t1 - t0
+                    if row is None:
+                        break
                     processed += 1
-                    cust_pk = int(row["customer_id"]) if row["customer_id"] else None
-                    customer = None
-                    if cust_pk:
-                        customer, _ = Customer.objects.get_or_create(pk=cust_pk)
-
-                    batch.append(
-                        Shipment(
-                            shipment_id=row["shipment_id"],
-                            customer=customer,
-                            origin=row["origin"],
-                            destination=row["destination"],
-                            weight=float(row.get("weight") or 0),
-                            volume=float(row.get("volume") or 0),
-                            mode=row["mode"],
-                            carrier=row.get("carrier") or None,
-                            status=row["status"],
-                            arrival_date=parse_date(row.get("arrival_date")),
-                            departure_date=parse_date(row.get("departure_date")),
-                            delivered_date=parse_date(row.get("delivered_date")),
-                        )
+
+                    # resolved per batch in _flush_batch, not with a query per row
+                    cust_pk = str(int(row["customer_id"])) if row["customer_id"] else None
+                    t2 = perf_counter()
+                    phases["customers"] += t2 - t1
+
+                    shipment = Shipment(
+                        shipment_id=row["shipment_id"],
+                        customer_id=cust_pk,
+                        origin=row["origin"],
+                        destination=row["destination"],
+                        weight=float(row.get("weight") or 0),
+                        volume=float(row.get("volume") or 0),
+                        mode=row["mode"],
+                        carrier=row.get("carrier") or None,
+                        status=row["status"],
+                        arrival_date=parse_date(row.get("arrival_date")),
+                        departure_date=parse_date(row.get("departure_date")),
+                        delivered_date=parse_date(row.get("delivered_date")),
                     )
+                    batch.append(shipment)
+                    changes.add_shipment(shipment)
+                    phases["parse"] += perf_counter() - t2
                     if len(batch) >= 500:
-                        Shipment.objects.bulk_create(batch, ignore_conflicts=True)
-                        batch.clear()
-                        CsvImport.objects.filter(pk=import_id).update(processed_rows=processed)
+                        _flush_batch(import_id, batch, processed, tel)
 
                 if batch:
-                    Shipment.objects.bulk_create(batch, ignore_conflicts=True)
-                    CsvImport.objects.filter(pk=import_id).update(processed_rows=processed)
+                    _flush_batch(import_id, batch, processed, tel)
 
                 imp.processed_rows = processed
+                tel.rows = processed
 
     except Exception as exc:
         imp.status = "FAILED"
-        imp.save(update_fields=["status"])
+        imp.telemetry = tel.as_dict()
+        imp.save(update_fields=["status", "telemetry"])
+        changes.send_robust(sender=CsvImport)   # earlier batches are already committed
         raise exc      # so Celery marks the task failed
 
-    imp.status = "COMPLETED"
-    imp.save(update_fields=["processed_rows", "status"])
+    # The rows are committed: mark the import done before refreshing derived
+    # data, so a failing receiver can't leave it PROCESSING – holding a tenant
+    # slot and the change-feed horizon – until IMPORT_MAX_RUNTIME_SECONDS.
+    with tel.phase("progress"):
+        imp.status = "COMPLETED"
+        imp.save(update_fields=["processed_rows", "status"])
+    with tel.phase("derived"):
+        changes.send_robust(sender=CsvImport)
+    imp.telemetry = tel.as_dict()
+    imp.save(update_fields=["telemetry"])
+    scheduling.request_consolidation()
 
 
 @shared_task
-def generate_consolidations():
+def generate_consolidations(run_id=None):
     """
     Rebuilds the Consolidation and ConsolidationShipment tables:
       1. Deletes any existing records.
       2. Groups Shipment rows by (destination, departure_date) where count >= 2.
       3. Creates a Consolidation per group with total_weight & total_volume.
       4. Links each Shipment in the group via ConsolidationShipment.
+    Timings are recorded on a ConsolidationRun row – the PENDING one
+    ``run_id`` names when scheduled by ``scheduling.request_consolidation``.
     """
-    with transaction.atomic():
-        # 1️⃣ Clear out old consolidations
-        ConsolidationShipment.objects.all().delete()
-        Consolidation.objects.all().delete()
-
-        # 2️⃣ Find all groups worth consolidating
-        groups = (
-            Shipment.objects
-            .values("destination", "departure_date")
-            .annotate(
-                count=Count("shipment_id"),
-                total_weight=Sum("weight"),
-                total_volume=Sum("volume"),
-            )
-            .filter(count__gte=2)
-        )
-
-        # 3️⃣ Persist each consolidation and its links
-        for g in groups:
-            con = Consolidation.objects.create(
-                destination    = g["destination"],
-                departure_date = g["departure_date"],
-                total_weight   = g["total_weight"],
-                total_volume   = g["total_volume"],
-            )
-            # 4️⃣ Link the shipments
-            shipment_ids = Shipment.objects.filter(
-                destination=con.destination,
-                departure_date=con.departure_date
-            ).values_list("shipment_id", flat=True)
-
-            cs_objs = [
-                ConsolidationShipment(consolidation=con, shipment_id=shp_id)
-                for shp_id in shipment_ids
-            ]
-            ConsolidationShipment.objects.bulk_create(cs_objs)
-
-    return f"Generated {groups.count()} consolidations"
-    
+    if run_id is None:
+        run = ConsolidationRun.objects.create()
+    elif ConsolidationRun.objects.filter(pk=run_id, status="PENDING").update(
+            status="PROCESSING", started_at=timezone.now()):
+        run = ConsolidationRun.objects.get(pk=run_id)   # later imports now schedule a new run
+    else:
+        return f"Run {run_id} is no longer pending"      # redelivered or expired
+    tel = TaskTelemetry()
+
+    try:
+        with transaction.atomic():
+            # 1️⃣ Clear out old consolidations
+            with tel.phase("clear"):
+                ConsolidationShipment.objects.all().delete()
+                Consolidation.objects.all().delete()
+
+            # 2️⃣ Find all groups worth consolidating
+            with tel.phase("group"):
+                groups = list(
+                    Shipment.objects
+                    .values("destination", "departure_date")
+                    .annotate(
+                        count=Count("*"),
+                        total_weight=Sum("weight"),
+                        total_volume=Sum("volume"),
+                    )
+                    .filter(count__gte=2)
+                )
+
+            # 3️⃣ Persist each consolidation and its links
+            for g in groups:
+                t0 = perf_counter()
+                with tel.phase("insert"):
+                    con = Consolidation.objects.create(
+                        destination    = g["destination"],
+                        departure_date = g["departure_date"],
+                        total_weight   = g["total_weight"],
+                        total_volume   = g["total_volume"],
+                    )
+                # 4️⃣ Link the shipments
+                with tel.phase("read"):
+                    shipment_ids = list(Shipment.objects.filter(
+                        destination=con.destination,
+                        departure_date=con.departure_date
+                    ).values_list("shipment_id", flat=True))
+
+                with tel.phase("insert"):
+                    cs_objs = [
+                        ConsolidationShipment(consolidation=con, shipment_id=shp_id)
+                        for shp_id in shipment_ids
+                    ]
+                    ConsolidationShipment.objects.bulk_create(cs_objs)
+                tel.rows += len(cs_objs)
+                tel.record_batch(perf_counter() - t0)
+
+            commit_t0 = perf_counter()
+        tel.phases["commit"] += perf_counter() - commit_t0
+    except Exception:
+        run.status, run.finished_at, run.telemetry = "ERROR", timezone.now(), tel.as_dict()
+        run.save(update_fields=["status", "finished_at", "telemetry"])
+        raise
+
+    versioning.bump(versioning.CONSOLIDATIONS)
+    run.status      = "COMPLETED"
+    run.finished_at = timezone.now()
+    run.groups      = len(groups)
+    run.telemetry   = tel.as_dict()
+    run.save(update_fields=["status", "finished_at", "groups", "telemetry"])
+
+    return f"Generated {len(groups)} consolidations"
+
+
+@shared_task
+def ensure_shipment_partitions():
+    """Keep the upcoming monthly shipment partitions created (scheduled via Celery beat)."""
+    created = partitioning.ensure_partitions()
+    return f"Created {len(created)} partitions"
+
+
+@shared_task
+def archive_delivered_shipments(older_than_days=None):
+    """Move delivered shipments older than SHIPMENT_ARCHIVE_AFTER_DAYS to cold storage."""
+    archived = archive.archive_delivered(older_than_days)
+    return f"Archived {archived} shipments"
+
+
+@shared_task
+def prune_shipment_tombstones():
+    """Drop change-feed deletions older than CHANGE_FEED_RETENTION_DAYS."""
+    return f"Pruned {changefeed.prune_tombstones()} tombstones"
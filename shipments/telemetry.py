@@ -0,0 +1,71 @@
+"""
+Lightweight telemetry for the Celery ingestion & consolidation tasks.
+
+A ``TaskTelemetry`` collects per-phase wall time, per-batch latencies and the
+process' peak RSS, then flattens itself into a JSON-friendly dict that is
+stored on ``CsvImport.telemetry`` / ``ConsolidationRun.telemetry``.
+"""
+import math
+from collections import defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+
+try:                       # not available on Windows
+    import resource
+except ImportError:        # pragma: no cover
+    resource = None
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list (None if empty)."""
+    if not values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def peak_memory_kb():
+    """High-water RSS of this process in KiB, or None if unknown."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class TaskTelemetry:
+    def __init__(self):
+        self.phases  = defaultdict(float)   # phase name → seconds
+        self.batches = []                   # seconds per batch
+        self.rows    = 0
+        self.extra   = {}
+        self._started = perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        t0 = perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] += perf_counter() - t0
+
+    def record_batch(self, seconds):
+        self.batches.append(seconds)
+
+    def as_dict(self):
+        elapsed = perf_counter() - self._started
+        batches = sorted(self.batches)
+        as_ms   = lambda s: None if s is None else round(s * 1000, 3)
+        return {
+            "elapsed_s":      round(elapsed, 4),
+            "rows":           self.rows,
+            "rows_per_sec":   round(self.rows / elapsed, 1) if elapsed else None,
+            "phases_s":       {k: round(v, 4) for k, v in self.phases.items()},
+            "batches": {
+                "count":  len(batches),
+                "p50_ms": as_ms(percentile(batches, 50)),
+                "p90_ms": as_ms(percentile(batches, 90)),
+                "p99_ms": as_ms(percentile(batches, 99)),
+                "max_ms": as_ms(batches[-1] if batches else None),
+            },
+            "peak_memory_kb": peak_memory_kb(),
+            **self.extra,
+        }
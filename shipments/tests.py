@@ -1,25 +1,51 @@
-from django.test import TestCase, override_settings
+from django.test import AsyncClient, LiveServerTestCase, TestCase, override_settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 from shipments.models import (
-    Customer, Carrier, Shipment, CsvImport,
-    Consolidation, ConsolidationShipment
+    Customer, Shipment, CsvImport,
+    Consolidation, ConsolidationShipment, ConsolidationRun, ArchivedShipment, ShipmentEvent,
+    ShipmentTombstone, LaneRollup, OccupancyDay,
 )
 from shipments.serializers import (
     ShipmentSerializer, CsvImportSerializer,
     ConsolidationModelSerializer
 )
-from shipments.tasks import generate_consolidations
-import tempfile, os, csv
+from shipments.tasks import generate_consolidations, process_csv
+from shipments.telemetry import TaskTelemetry, percentile
+from shipments.synthetic import HEADER, generate_manifest, parse_rows
+from shipments.benchmarks import (
+    SCENARIOS, BenchContext, bench_plans, classify_plan, compare, run_scenarios
+)
+from shipments import archive, async_views, changefeed, events, lanes, occupancy, partitioning, renderers, scheduling, versioning
+from shipments.listcache import ListCache, shipment_lists
+from shipments.customers import CustomerCache, customer_cache
+from shipments.signals import ShipmentChanges
+from shipments.management.commands.loadtest import run_load
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from django.test import RequestFactory
+from backend import db_routers
+from backend.schema import CachedSpectacularAPIView, schemas
+from collections import Counter
+from datetime import date, timedelta
+from io import StringIO
+from django.core.management import call_command
+from unittest import mock, skipUnless
+from asgiref.sync import sync_to_async
+import tempfile, os, csv, gzip, json
 
 class ShipmentModelTests(TestCase):
     def setUp(self):
         self.customer = Customer.objects.create(
             customer_id="C1", name="TestCustomer", email="test@example.com"
         )
-        self.carrier = Carrier.objects.create(name="TestCarrier", mode="air")
+        self.carrier = "TestCarrier"
 
     def test_create_and_retrieve_shipment(self):
         shipment = Shipment.objects.create(
@@ -44,7 +70,7 @@ class SerializerTests(TestCase):
         self.customer = Customer.objects.create(
             customer_id="C2", name="Cust2", email="cust2@example.com"
         )
-        self.carrier = Carrier.objects.create(name="Carrier2", mode="sea")
+        self.carrier = "Carrier2"
         self.shipment = Shipment.objects.create(
             shipment_id="S2",
             customer=self.customer,
@@ -107,7 +133,7 @@ class ConsolidationTaskTests(TestCase):
         self.customer = Customer.objects.create(
             customer_id="C3", name="Cust3", email="c3@example.com"
         )
-        self.carrier = Carrier.objects.create(name="Carrier3", mode="air")
+        self.carrier = "Carrier3"
         # create shipments in two groups
         for i in range(3):
             Shipment.objects.create(
@@ -133,13 +159,15 @@ class ConsolidationTaskTests(TestCase):
         self.assertEqual(cons.total_weight, 60.0)
         self.assertEqual(ConsolidationShipment.objects.filter(consolidation=cons).count(), 3)
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class APITests(TestCase):
     def setUp(self):
+        shipment_lists.clear()   # data versions roll back with each test, the LRU doesn't
         self.client = APIClient()
         self.customer = Customer.objects.create(
             customer_id="C4", name="Cust4", email="c4@example.com"
         )
-        self.carrier = Carrier.objects.create(name="Carrier4", mode="sea")
+        self.carrier = "Carrier4"
 
     def test_import_and_progress_endpoints(self):
         # create a temp CSV file
@@ -149,10 +177,11 @@ class APITests(TestCase):
         tmp.flush()
         tmp.close()
 
-        with open(tmp.name, 'rb') as f:
+        with open(tmp.name, 'rb') as f, mock.patch("shipments.views.process_csv.delay") as delay:
             response = self.client.post(
                 reverse('imports-list'), {'file': f}, format='multipart'
             )
+        delay.assert_called_once()
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         imp_id = response.data['id']
 
@@ -224,3 +253,1129 @@ class APITests(TestCase):
         self.assertEqual(item['destination'], 'BAR')
         # shipments should be a list of shipment_ids
         self.assertListEqual(sorted(item['shipments']), ['SC0', 'SC1'])
+
+class TelemetryTests(TestCase):
+    def test_percentile_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertIsNone(percentile([], 50))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 99), 7)
+
+    def test_as_dict_reports_phases_and_batches(self):
+        tel = TaskTelemetry()
+        with tel.phase("parse"):
+            pass
+        tel.record_batch(0.002)
+        tel.record_batch(0.004)
+        tel.rows = 10
+        data = tel.as_dict()
+        self.assertIn("parse", data["phases_s"])
+        self.assertEqual(data["batches"]["count"], 2)
+        self.assertEqual(data["batches"]["max_ms"], 4.0)
+        self.assertEqual(data["rows"], 10)
+
+    def test_process_csv_stores_telemetry(self):
+        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".csv", mode="w", newline="")
+        writer = csv.writer(tmp)
+        writer.writerow(["shipment_id", "customer_id", "origin", "destination", "weight", "volume",
+                         "mode", "carrier", "status", "arrival_date", "departure_date", "delivered_date"])
+        for i in range(3):
+            writer.writerow([f"T{i}", "7", "NY", "JAM", 10, 20, "air", f"Carrier{i}",
+                             "received", "2025-05-01", "2025-05-03", ""])
+        tmp.close()
+        imp = CsvImport.objects.create(file_name="t.csv", total_rows=3)
+
+        process_csv.run(imp.id, tmp.name)
+        os.unlink(tmp.name)
+
+        imp.refresh_from_db()
+        self.assertEqual(imp.status, "COMPLETED")
+        self.assertEqual(imp.telemetry["rows"], 3)
+        # COPY parses server-side and commits once; the ORM path autocommits per statement
+        expected = {"read", "customers", "insert", "events", "progress"} | \
+                   ({"commit"} if connection.vendor == "postgresql" else {"parse"})
+        self.assertLessEqual(expected, imp.telemetry["phases_s"].keys())
+
+    def test_failing_receiver_doesnt_hold_the_import(self):
+        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".csv", mode="w", newline="")
+        writer = csv.writer(tmp)
+        writer.writerow(["shipment_id", "customer_id", "origin", "destination", "weight", "volume",
+                         "mode", "carrier", "status", "arrival_date", "departure_date", "delivered_date"])
+        writer.writerow(["T9", "7", "NY", "JAM", 10, 20, "air", "", "received", "2025-05-01", "", ""])
+        tmp.close()
+        imp    = CsvImport.objects.create(file_name="t.csv", total_rows=1)
+        before = versioning.versions(RequestFactory().get("/"), [versioning.SHIPMENTS])[versioning.SHIPMENTS][0]
+
+        with mock.patch("shipments.lanes.refresh", side_effect=RuntimeError("boom")), \
+             self.assertLogs("shipments.signals", "ERROR"):
+            process_csv.run(imp.id, tmp.name)
+        os.unlink(tmp.name)
+
+        imp.refresh_from_db()
+        self.assertEqual(imp.status, "COMPLETED")
+        self.assertTrue(OccupancyDay.objects.filter(day="2025-05-01").exists())   # the other receivers ran
+        after = versioning.versions(RequestFactory().get("/"), [versioning.SHIPMENTS])[versioning.SHIPMENTS][0]
+        self.assertGreater(after, before)
+
+    def test_consolidation_run_and_metrics_tasks_endpoint(self):
+        for i in range(2):
+            Shipment.objects.create(
+                shipment_id=f"TR{i}", origin="TX", destination="DOM", weight=1, volume=1,
+                mode="air", departure_date="2025-04-08",
+            )
+        generate_consolidations.run()
+        run = ConsolidationRun.objects.get()
+        self.assertEqual(run.status, "COMPLETED")
+        self.assertEqual(run.groups, 1)
+        self.assertEqual(run.telemetry["rows"], 2)
+
+        resp = APIClient().get(reverse("metrics-tasks"))
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["consolidations"][0]["groups"], 1)
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        customer_cache.clear()   # customers cached by earlier tests were rolled back
+
+    def test_manifest_is_deterministic_and_skewed(self):
+        rows = list(generate_manifest(2000, seed=7))
+        self.assertEqual(rows, list(generate_manifest(2000, seed=7)))
+        self.assertNotEqual(rows, list(generate_manifest(2000, seed=8)))
+        self.assertEqual(len(rows[0]), len(HEADER))
+
+        dests = Counter(r[HEADER.index("destination")] for r in rows)
+        top, *_, bottom = [n for _, n in dests.most_common()]
+        self.assertGreater(top, 3 * bottom)
+        customers = {r[HEADER.index("customer_id")] for r in rows}
+        self.assertLess(len(customers), 100)
+
+    def test_parse_rows_presets(self):
+        self.assertEqual(parse_rows("10k"), 10_000)
+        self.assertEqual(parse_rows("10M"), 10_000_000)
+        self.assertEqual(parse_rows("250"), 250)
+
+    @override_settings(ALLOWED_HOSTS=["localhost"])
+    def test_scenarios_run_and_compare(self):
+        results = run_scenarios(BenchContext(rows=300, repeat=1))
+        self.assertEqual(list(results), list(SCENARIOS))
+        self.assertEqual(Shipment.objects.count(), 300)
+        self.assertEqual(results["export"]["rows"], 300)
+        for fmt in (r.format for r in renderers.BINARY_RENDERERS):
+            self.assertLess(results["formats"][fmt]["bytes"], results["formats"]["json"]["bytes"])
+        # a cold ingestion worker must not pull the web stack back in
+        self.assertEqual(results["startup"]["worker"]["web_stack"], [])
+        self.assertLess(results["startup"]["worker"]["modules"], results["startup"]["web"]["modules"])
+
+        current  = {"results": {"metrics": {"seconds": 2.0}}}
+        baseline = {"results": {"metrics": {"seconds": 1.0}}}
+        self.assertEqual(len(compare(current, baseline, 0.10)), 1)
+        self.assertEqual(compare(current, baseline, 1.5), [])
+
+    def test_classify_plan(self):
+        self.assertEqual(classify_plan("2 0 0 SCAN shipments_shipment"), "seq_scan")
+        self.assertEqual(classify_plan("Seq Scan on shipments_shipment"), "seq_scan")
+        self.assertEqual(classify_plan("5 0 0 SCAN shipments_shipment USING INDEX x"), "index_walk")
+        self.assertEqual(classify_plan("5 0 0 SEARCH shipments_shipment USING INDEX x (a=?)"), "index_range")
+        self.assertEqual(classify_plan("Index Only Scan using shp_carrier on shipments_shipment"), "index_only")
+        self.assertEqual(classify_plan("6 0 0 SCAN shipments_shipment USING COVERING INDEX x"), "index_only")
+        self.assertEqual(classify_plan("Limit\n  ->  Index Scan using shipments_shipment_pkey on shipments_shipment\n"
+                                       "        Filter: ((status)::text = 'received'::text)"), "index_walk")
+        self.assertEqual(classify_plan("Limit\n  ->  Index Scan using shp_status on shipments_shipment\n"
+                                       "        Index Cond: ((status)::text = 'received'::text)"), "index_range")
+
+    # PostgreSQL costs a 2000-row table as cheaper to scan or sort than to
+    # walk an index; its plans are checked with "benchmark --scenarios plans"
+    @skipUnless(connection.vendor == "sqlite", "SQLite only")
+    @override_settings(ALLOWED_HOSTS=["localhost"])
+    def test_filter_and_dashboard_queries_use_indexes(self):
+        ctx = BenchContext(rows=2000, repeat=1)
+        run_scenarios(ctx, ["ingest"])
+        plans = bench_plans(ctx)
+        self.assertEqual([n for n, p in plans.items() if p["access"] == "seq_scan"], [])
+        for name in ("metrics.counts", "metrics.by_carrier", "metrics.volume_by_mode", "metrics.per_day"):
+            self.assertEqual(plans[name]["access"], "index_only", plans[name]["plan"])
+        # list pages come out of the index in shipment_id order, no sort
+        for name in ("filter.destination_status", "filter.open_arrivals", "filter.origin", "filter.carrier"):
+            self.assertEqual(plans[name]["access"], "index_range", plans[name]["plan"])
+            self.assertNotRegex(plans[name]["plan"], r"TEMP B-TREE|Sort", name)
+
+class PartitioningTests(TestCase):
+    def test_month_arithmetic_and_names(self):
+        self.assertEqual(partitioning.add_months(date(2025, 11, 1), 3), date(2026, 2, 1))
+        self.assertEqual(partitioning.add_months(date(2025, 1, 1), -1), date(2024, 12, 1))
+        name = partitioning.partition_name(date(2025, 7, 1))
+        self.assertEqual(name, "shipments_shipment_p202507")
+        self.assertEqual(partitioning.partition_month(name), date(2025, 7, 1))
+        self.assertIsNone(partitioning.partition_month("shipments_shipment_pdefault"))
+        self.assertIn("FROM ('2025-12-01') TO ('2026-01-01')", partitioning.partition_ddl(date(2025, 12, 1)))
+
+    @skipUnless(connection.vendor == "sqlite", "SQLite only")
+    def test_disabled_on_sqlite(self):
+        with override_settings(SHIPMENT_PARTITION_KEY="departure_date"):
+            self.assertFalse(partitioning.enabled())
+            self.assertEqual(partitioning.ensure_partitions(), [])
+            self.assertFalse(partitioning.convert_to_partitioned())
+        out = StringIO()
+        call_command("shipment_partitions", stdout=out)
+        self.assertIn("nothing to do", out.getvalue())
+
+    def test_window_filter_targets_partition_key(self):
+        self.assertEqual(partitioning.window_filter(date(2025, 1, 1)), {"departure_date__gte": date(2025, 1, 1)})
+        with override_settings(SHIPMENT_PARTITION_KEY="created_at"):
+            window = partitioning.window_filter(until=date(2025, 2, 1))
+            self.assertEqual(list(window), ["created_at__lt"])
+            self.assertIsNotNone(window["created_at__lt"].tzinfo)
+
+    def test_metrics_window(self):
+        for i, dep in enumerate(["2025-01-10", "2025-02-10", "2025-03-10"]):
+            Shipment.objects.create(shipment_id=f"W{i}", origin="FL", destination="JAM", weight=1,
+                                    volume=1, mode="sea", departure_date=dep)
+        resp = APIClient().get(reverse("metrics-list"), {"since": "2025-02-01", "until": "2025-03-01"})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(sum(c["total"] for c in resp.data["counts"]), 1)
+        for since in ("2025-02-31", "yesterday", "01/02/2025"):   # impossible or not a date at all
+            bad = APIClient().get(reverse("metrics-list"), {"since": since})
+            self.assertEqual(bad.status_code, status.HTTP_400_BAD_REQUEST)
+
+@skipUnless(connection.vendor == "postgresql", "PostgreSQL only")
+@override_settings(SHIPMENT_PARTITION_KEY="departure_date")
+class PostgresPartitioningTests(TestCase):
+    def setUp(self):
+        partitioning.convert_to_partitioned()   # no-op when migrate already converted
+        self.assertTrue(partitioning.is_partitioned())
+
+    def ship(self, shipment_id, departure_date):
+        return Shipment.objects.create(shipment_id=shipment_id, origin="FL", destination="JAM", weight=1,
+                                       volume=1, mode="sea", departure_date=departure_date)
+
+    def partition_of(self, shipment_id):
+        with connection.cursor() as cur:
+            cur.execute("SELECT tableoid::regclass::text FROM shipments_shipment WHERE shipment_id = %s",
+                        [shipment_id])
+            return cur.fetchone()[0]
+
+    def test_new_month_takes_its_rows_out_of_default(self):
+        self.ship("P1", "2031-03-10")
+        self.ship("P2", None)
+        self.assertEqual(self.partition_of("P1"), "shipments_shipment_pdefault")
+
+        created = partitioning.ensure_partitions(months_ahead=1, today=date(2031, 3, 1))
+        self.assertEqual(created, ["shipments_shipment_p203103", "shipments_shipment_p203104"])
+        self.assertEqual(self.partition_of("P1"), "shipments_shipment_p203103")
+        self.assertEqual(self.partition_of("P2"), "shipments_shipment_pdefault")
+        with transaction.atomic(), self.assertRaises(IntegrityError):   # still registered
+            self.ship("P1", "2031-04-02")
+
+    def test_shipment_id_unique_across_partitions(self):
+        self.ship("U1", "2025-01-10")
+        for departure in ("2025-02-10", None):
+            with transaction.atomic(), self.assertRaises(IntegrityError):
+                self.ship("U1", departure)
+        Shipment.objects.filter(pk="U1").update(departure_date="2025-03-10")   # moves partition
+        Shipment.objects.filter(pk="U1").delete()
+        self.ship("U1", "2025-04-10")
+
+    def test_detached_shipments_leave_like_archived_ones(self):
+        partitioning.ensure_partitions(months_ahead=0, today=date(2025, 1, 1))
+        self.ship("D1", "2025-01-10")
+        consolidation = Consolidation.objects.create(destination="JAM", departure_date="2025-01-10",
+                                                     total_weight=1, total_volume=1)
+        ConsolidationShipment.objects.create(consolidation=consolidation, shipment_id="D1")
+        scopes = [versioning.SHIPMENTS, versioning.CONSOLIDATIONS, versioning.BULK]
+        before = versioning.versions(RequestFactory().get("/"), scopes)
+
+        with connection.cursor() as cur:   # fire the deferred FK checks DROP TABLE would otherwise trip on
+            cur.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        with mock.patch("shipments.lanes.rebuild") as rebuild:
+            self.assertEqual(partitioning.detach_partitions(date(2025, 2, 1), drop=True),
+                             ["shipments_shipment_p202501"])
+        rebuild.assert_called_once_with()   # a full change
+        after = versioning.versions(RequestFactory().get("/"), scopes)
+        self.assertTrue(all(after[scope][0] > before[scope][0] for scope in scopes))
+        self.assertEqual(ShipmentTombstone.objects.get(shipment_id="D1").reason, ShipmentTombstone.ARCHIVED)
+        self.assertFalse(ConsolidationShipment.objects.exists())
+        self.ship("D1", "2025-03-10")   # the ID is free again
+
+    def test_import_skips_known_and_repeated_ids(self):
+        self.ship("I1", "2025-01-10")
+        path = os.path.join(tempfile.mkdtemp(), "p.csv")
+        with open(path, "w", newline="") as f:
+            f.write(",".join(HEADER) + "\n")
+            for shipment_id, departure in (("I1", "2025-02-10"), ("I2", "2025-02-11"), ("I2", "2025-03-11")):
+                f.write(f"{shipment_id},,FL,JAM,10,100,sea,Crowley,received,2025-01-01,{departure},\n")
+        imp = CsvImport.objects.create(file_name="p.csv", total_rows=3)
+        process_csv.run(imp.id, path)
+        self.assertEqual(CsvImport.objects.get(pk=imp.id).status, "COMPLETED")
+        self.assertEqual(dict(Shipment.objects.values_list("shipment_id", "departure_date")),
+                         {"I1": date(2025, 1, 10), "I2": date(2025, 2, 11)})
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        for i in range(3):
+            Shipment.objects.create(
+                shipment_id=f"D{i}", origin="FL", destination="JAM", weight=10, volume=100,
+                mode="sea", carrier="Crowley", status="delivered",
+                arrival_date="2025-01-02", departure_date="2025-01-05", delivered_date="2025-01-12",
+            )
+        Shipment.objects.create(
+            shipment_id="OPEN", origin="FL", destination="JAM", weight=10, volume=100,
+            mode="air", carrier="Crowley", status="in-transit",
+            arrival_date="2025-01-02", departure_date="2025-01-05",
+        )
+        generate_consolidations.run()
+
+    def metrics(self):
+        cache.clear()
+        return self.client.get(reverse("metrics-list")).data
+
+    def test_archive_moves_rows_and_keeps_metrics(self):
+        before = self.metrics()
+        moved  = archive.archive_delivered(older_than_days=30, batch_size=2, today=date(2025, 6, 1))
+
+        self.assertEqual(moved, 3)
+        self.assertEqual(list(Shipment.objects.values_list("pk", flat=True)), ["OPEN"])
+        self.assertEqual(ArchivedShipment.objects.count(), 3)
+        self.assertEqual(ConsolidationShipment.objects.count(), 1)
+        self.assertIsNotNone(ArchivedShipment.objects.get(pk="D0").consolidation_id)
+        self.assertEqual(self.metrics(), before)
+
+    def test_unlinking_shipments_moves_the_consolidations_version(self):
+        def etag():
+            return self.client.get(reverse("consolidations-list"))["ETag"]
+        first = etag()
+        archive.archive_delivered(older_than_days=30, today=date(2025, 6, 1))
+        second = etag()
+        self.assertNotEqual(second, first)
+        self.client.delete(reverse("shipments-detail", args=["OPEN"]))
+        self.assertNotEqual(etag(), second)
+
+    def test_recent_deliveries_stay_hot(self):
+        self.assertEqual(archive.archive_delivered(older_than_days=30, today=date(2025, 1, 20)), 0)
+
+    def test_retrieve_falls_back_to_archive(self):
+        archive.archive_delivered(older_than_days=30, today=date(2025, 6, 1))
+        resp = self.client.get(reverse("shipments-detail", args=["D1"]))
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["status"], "delivered")
+        self.assertEqual(resp.data["destination"], "JAM")
+        self.assertEqual(self.client.get(reverse("shipments-detail", args=["NOPE"])).status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.router  = db_routers.ReplicaRouter()
+        self.factory = RequestFactory()
+        patcher = mock.patch.object(db_routers, "_healthy", return_value=True)
+        self.healthy = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def route(self, request, write=False):
+        """Run a fake read-only view through the middleware; return (read alias, response)."""
+        seen = {}
+        def view(req):
+            db_routers.allow_replica_reads()
+            if write:
+                self.router.db_for_write(Shipment)
+            seen["db"] = self.router.db_for_read(Shipment)
+            return HttpResponse()
+        response = db_routers.ReplicaPinningMiddleware(view)(request)
+        return seen["db"], response
+
+    def test_reads_outside_requests_stay_on_primary(self):
+        self.assertIsNone(self.router.db_for_read(Shipment))
+
+    def test_safe_request_reads_from_replica(self):
+        db, response = self.route(self.factory.get("/api/shipments/"))
+        self.assertEqual(db, "replica")
+        self.assertNotIn(db_routers.PIN_COOKIE, response.cookies)
+
+    def test_write_pins_request_and_sets_cookie(self):
+        db, response = self.route(self.factory.get("/api/shipments/"), write=True)
+        self.assertIsNone(db)
+        self.assertIn(db_routers.PIN_COOKIE, response.cookies)
+
+        db, _ = self.route(self.factory.post("/api/shipments/"))
+        self.assertIsNone(db)
+
+    def test_pin_cookie_sticks_reads_to_primary(self):
+        request = self.factory.get("/api/metrics/")
+        request.COOKIES[db_routers.PIN_COOKIE] = "1"
+        self.assertIsNone(self.route(request)[0])
+
+    def test_unhealthy_replica_is_skipped(self):
+        self.healthy.return_value = False
+        self.assertIsNone(self.route(self.factory.get("/api/shipments/"))[0])
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate("replica", "shipments"))
+        self.assertIsNone(self.router.allow_migrate("default", "shipments"))
+
+class ConditionalRequestTests(TestCase):
+    def setUp(self):
+        cache.clear()   # versions roll back with each test, the caches don't
+        shipment_lists.clear()
+        self.client   = APIClient()
+        self.customer = Customer.objects.create(customer_id="C1", name="Acme")
+        Shipment.objects.create(
+            shipment_id="S1", customer=self.customer, origin="FL", destination="JAM",
+            weight=10, volume=100, mode="sea", carrier="Crowley", status="received",
+            arrival_date="2025-01-02", departure_date="2025-01-05",
+        )
+
+    def get(self, name, etag=None, **params):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(reverse(name), params, **headers)
+
+    def test_unchanged_data_answers_304_without_queries(self):
+        for name in ("metrics-list", "shipments-list", "consolidations-list"):
+            first = self.get(name)
+            self.assertEqual(first.status_code, status.HTTP_200_OK)
+            with self.assertNumQueries(1):   # the version lookup only
+                again = self.get(name, first["ETag"])
+            self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_varies_with_query_string(self):
+        self.assertNotEqual(self.get("shipments-list")["ETag"],
+                            self.get("shipments-list", status="received")["ETag"])
+
+    def test_writes_change_the_etag(self):
+        etag = self.get("metrics-list")["ETag"]
+        self.client.post(reverse("shipments-list"), {
+            "shipment_id": "S2", "customer_id": "C1", "origin": "FL", "destination": "JAM",
+            "weight": 5, "volume": 50, "mode": "air", "status": "received",
+            "arrival_date": "2025-01-03", "departure_date": "2025-01-06",
+        }, format="json")
+        fresh = self.get("metrics-list", etag)
+        self.assertEqual(fresh.status_code, status.HTTP_200_OK)
+        self.assertEqual(sum(c["total"] for c in fresh.data["counts"]), 2)
+
+        etag = self.get("consolidations-list")["ETag"]
+        generate_consolidations.run()
+        self.assertEqual(self.get("consolidations-list", etag).status_code, status.HTTP_200_OK)
+
+class ShipmentListCacheTests(TestCase):
+    def setUp(self):
+        shipment_lists.clear()
+        shipment_lists.reset_stats()
+        self.client = APIClient()
+        for i, (dest, st) in enumerate([("JAM", "in-transit"), ("JAM", "received"), ("KIN", "in-transit")]):
+            Shipment.objects.create(
+                shipment_id=f"S{i}", origin="FL", destination=dest, weight=10, volume=100,
+                mode="sea", carrier="Crowley", status=st,
+                arrival_date="2025-01-02", departure_date="2025-01-05",
+            )
+
+    def get(self, **params):
+        return self.client.get(reverse("shipments-list"), params)
+
+    def test_equivalent_requests_share_an_entry(self):
+        self.assertEqual(self.get(status="in-transit", destination="JAM")["X-Cache"], "MISS")
+        with self.assertNumQueries(2):   # ETag + tag versions, no shipment query
+            resp = self.get(destination="JAM", status="in-transit", origin="", _="123")
+        self.assertEqual(resp["X-Cache"], "HIT")
+        self.assertEqual([r["shipment_id"] for r in resp.data["results"]], ["S0"])
+        self.assertEqual(shipment_lists.stats()["hit_ratio"], 0.5)
+
+    def test_writes_invalidate_only_matching_tags(self):
+        self.get(destination="JAM")
+        self.get(destination="KIN")
+        changes = ShipmentChanges()
+        changes.add("KIN", "in-transit")
+        changes.send(sender=Shipment)
+        self.assertEqual(self.get(destination="JAM")["X-Cache"], "HIT")
+        self.assertEqual(self.get(destination="KIN")["X-Cache"], "MISS")
+        self.assertEqual(self.get()["X-Cache"], "MISS")
+
+        self.get(destination="JAM", status="received")
+        ShipmentChanges(full=True).send(sender=Shipment)
+        self.assertEqual(self.get(destination="JAM", status="received")["X-Cache"], "MISS")
+
+    def test_api_write_refreshes_page(self):
+        self.assertEqual(self.get(destination="JAM").data["count"], 2)
+        self.client.delete(reverse("shipments-detail", args=["S1"]))
+        resp = self.get(destination="JAM")
+        self.assertEqual((resp["X-Cache"], resp.data["count"]), ("MISS", 1))
+
+    def test_lru_eviction_and_stats_endpoint(self):
+        lru = ListCache(max_entries=2)
+        for key in "abc":
+            lru.set(key, {versioning.BULK: 0, versioning.SHIPMENTS: 0}, key)
+        self.assertIsNone(lru.get("a", {versioning.BULK: 0, versioning.SHIPMENTS: 0}))
+        self.assertEqual(lru.stats()["evictions"], 1)
+
+        self.get()
+        self.get()
+        stats = self.client.get(reverse("metrics-cache")).data["shipment_lists"]
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+
+    def test_row_budget_evicts_and_skips_oversized_pages(self):
+        lru     = ListCache(max_entries=10, max_rows=5)
+        current = {versioning.BULK: 0, versioning.SHIPMENTS: 0}
+        page    = lambda n: {"count": n, "results": [{}] * n}
+        lru.set("a", current, page(2))
+        lru.set("b", current, page(3))
+        lru.set("c", current, page(2))   # 7 rows > 5: "a" goes
+        self.assertIsNone(lru.get("a", current))
+        self.assertEqual((lru.stats()["rows"], lru.stats()["evictions"]), (5, 1))
+
+        lru.set("d", current, page(6))   # larger than the whole budget
+        self.assertIsNone(lru.get("d", current))
+        self.assertIsNotNone(lru.get("b", current))
+        self.assertEqual((lru.stats()["rows"], lru.stats()["oversized"]), (5, 1))
+
+    @override_settings(SHIPMENT_LIST_CACHE_ROWS=1)
+    def test_bulk_pages_over_the_budget_are_not_cached(self):
+        self.assertEqual(self.get(destination="JAM").data["count"], 2)
+        self.assertEqual(self.get(destination="JAM")["X-Cache"], "MISS")
+        self.assertEqual(self.get(destination="JAM", page_size=1)["X-Cache"], "MISS")
+        self.assertEqual(self.get(destination="JAM", page_size=1)["X-Cache"], "HIT")
+
+
+class AsyncEndpointTests(TestCase):
+    """The /api/async/ views return the same payloads as the DRF viewsets."""
+
+    def setUp(self):
+        cache.clear()
+        shipment_lists.clear()
+        self.customer = Customer.objects.create(customer_id="C1", name="Acme")
+        for i in range(3):
+            Shipment.objects.create(
+                shipment_id=f"S{i}", customer=self.customer, origin="FL", destination="JAM",
+                weight=10, volume=100, mode="sea", carrier="Crowley",
+                status="in-transit" if i else "received",
+                arrival_date="2025-01-02", departure_date="2025-01-05",
+            )
+        generate_consolidations.run()
+        self.imp = CsvImport.objects.create(file_name="x.csv", total_rows=10, processed_rows=4)
+
+    async def compare(self, sync_url, async_url, **params):
+        # drop pagination links, they name the endpoint that served them
+        strip  = lambda d: {k: v for k, v in d.items() if k not in ("next", "previous")}
+        resp   = await AsyncClient().get(async_url, params)
+        expect = await sync_to_async(APIClient().get)(sync_url, params)
+        self.assertEqual(resp.status_code, expect.status_code)
+        self.assertEqual(strip(resp.json()), strip(expect.json()))
+        return resp
+
+    async def test_payloads_match_drf_views(self):
+        await self.compare(reverse("shipments-list"), reverse("async-shipments-list"), status="in-transit")
+        page = await self.compare(reverse("shipments-list"), reverse("async-shipments-list"), page_size=2, page=2)
+        self.assertEqual(len(page.json()["results"]), 1)
+        with mock.patch("shipments.views.BulkPagination.max_page_size", 2):
+            await self.compare(reverse("shipments-list"), reverse("async-shipments-list"), page_size=500)
+        await self.compare(reverse("shipments-detail", args=["S1"]), reverse("async-shipments-detail", args=["S1"]))
+        await self.compare(reverse("metrics-list"), reverse("async-metrics"), since="2025-01-01")
+        await self.compare(reverse("consolidations-list"), reverse("async-consolidations-list"))
+        await self.compare(reverse("imports-progress", args=[self.imp.pk]),
+                           reverse("async-imports-progress", args=[self.imp.pk]))
+
+    def test_worker_threads_close_their_connections(self):
+        with mock.patch("shipments.async_views.connections") as conns:
+            self.assertEqual(async_views._own_connection(lambda: 42)(), 42)
+        conns.close_all.assert_called_once_with()
+
+    async def test_errors_and_conditional_get(self):
+        client = AsyncClient()
+        self.assertEqual((await client.get(reverse("async-shipments-detail", args=["NOPE"]))).status_code, 404)
+        self.assertEqual((await client.get(reverse("async-shipments-list"), {"page": 9})).status_code, 404)
+        self.assertEqual((await client.get(reverse("async-shipments-list"), {"status": "lost"})).status_code, 400)
+        for since in ("2025-13-01", "soon"):
+            self.assertEqual((await client.get(reverse("async-metrics"), {"since": since})).status_code, 400)
+        self.assertEqual((await client.post(reverse("async-metrics"))).status_code, 405)
+
+        first = await client.get(reverse("async-metrics"))
+        again = await client.get(reverse("async-metrics"), headers={"If-None-Match": first["ETag"]})
+        self.assertEqual(again.status_code, 304)
+
+
+class LoadTestTests(LiveServerTestCase):
+    def test_run_load_reports_latency_percentiles(self):
+        url    = self.live_server_url + reverse("async-imports-progress", args=[1])
+        result = run_load([url, self.live_server_url + "/api/async/metrics/"], concurrency=4, requests=20)
+        self.assertEqual(result["requests"], 20)
+        self.assertEqual(result["errors"], 10)   # no import 1 → 404s are counted as errors
+        self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+
+
+class ShipmentEventTests(TestCase):
+    def setUp(self):
+        self.client   = APIClient()
+        self.customer = Customer.objects.create(customer_id="C1", name="Acme")
+
+    def shipment(self, sid, status_, arrival, departure=None, delivered=None, carrier="Crowley"):
+        return Shipment.objects.create(
+            shipment_id=sid, customer=self.customer, origin="FL", destination="JAM",
+            weight=10, volume=100, mode="sea", carrier=carrier, status=status_,
+            arrival_date=arrival, departure_date=departure, delivered_date=delivered,
+        )
+
+    def test_derive_follows_status_flow(self):
+        scheduled = self.shipment("S1", "received", date(2025, 1, 1), departure=date(2025, 1, 9))
+        self.assertEqual([(e.status, e.occurred_on) for e in events.derive(scheduled)],
+                         [(ShipmentEvent.Status.RECEIVED, date(2025, 1, 1))])
+        undated = self.shipment("S2", "in-transit", date(2025, 1, 1))
+        self.assertEqual([e.occurred_on for e in events.derive(undated, today=date(2025, 1, 3))],
+                         [date(2025, 1, 1), date(2025, 1, 3)])
+
+    def test_import_writes_events_once(self):
+        path = os.path.join(tempfile.mkdtemp(), "m.csv")
+        with open(path, "w", newline="") as f:
+            f.write(",".join(HEADER) + "\n")
+            f.write("S1,,FL,JAM,10,100,sea,Crowley,delivered,2025-01-01,2025-01-03,2025-01-08\n")
+            f.write("S1,,FL,JAM,10,100,sea,Crowley,delivered,2025-02-01,2025-02-03,2025-02-08\n")
+        for _ in range(2):
+            imp = CsvImport.objects.create(file_name="m.csv", total_rows=2)
+            process_csv.run(imp.id, path)
+        # only the stored snapshot – the file's first S1 – has events
+        self.assertEqual(sorted(ShipmentEvent.objects.values_list("occurred_on", flat=True)),
+                         [date(2025, 1, 1), date(2025, 1, 3), date(2025, 1, 8)])
+        self.assertIn("events", CsvImport.objects.get(pk=imp.pk).telemetry["phases_s"])
+
+    def test_api_update_appends_transition_and_history(self):
+        self.shipment("S1", "received", "2025-01-01")
+        events.record(Shipment.objects.all())
+        self.client.patch(reverse("shipments-detail", args=["S1"]),
+                          {"status": "in-transit", "departure_date": "2025-01-04"}, format="json")
+        self.client.patch(reverse("shipments-detail", args=["S1"]), {"weight": 12}, format="json")
+
+        resp = self.client.get(reverse("shipments-history", args=["S1"]))
+        self.assertEqual([(e["status"], str(e["occurred_on"])) for e in resp.data["events"]],
+                         [("received", "2025-01-01"), ("in-transit", "2025-01-04")])
+        self.assertEqual(self.client.get(reverse("shipments-history", args=["NOPE"])).status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+    def test_dwell_percentiles_per_lane_and_carrier(self):
+        self.shipment("S0", "delivered", "2025-01-01", "2025-01-04", "2025-01-10", carrier="X")
+        self.shipment("S1", "delivered", "2025-01-01", "2025-01-02", "2025-01-12", carrier="X")
+        self.shipment("S2", "in-transit", "2025-01-01", "2025-01-06", carrier="Y")
+        self.shipment("S3", "received", "2025-01-03", "2025-01-09", carrier="Y")
+        events.record(Shipment.objects.all())
+
+        lane = self.client.get(reverse("metrics-dwell")).data["results"]
+        self.assertEqual([(r["status"], r["count"], r["p50_days"], r["p99_days"]) for r in lane],
+                         [("received", 3, 3, 5), ("in-transit", 2, 6, 10)])
+
+        by_carrier = self.client.get(reverse("metrics-dwell"),
+                                     {"group_by": "carrier", "since": "2025-01-02"}).data["results"]
+        self.assertEqual([(r["carrier"], r["status"], r["mean_days"]) for r in by_carrier],
+                         [("X", "in-transit", 8.0)])
+        for params in ({"group_by": "mode"}, {"since": "last week"}):
+            self.assertEqual(self.client.get(reverse("metrics-dwell"), params).status_code,
+                             status.HTTP_400_BAD_REQUEST)
+
+    def test_history_survives_archiving(self):
+        self.shipment("S1", "delivered", "2025-01-01", "2025-01-02", "2025-01-05")
+        events.record(Shipment.objects.all())
+        archive.archive_delivered(older_than_days=30, today=date(2025, 6, 1))
+        resp = self.client.get(reverse("shipments-history", args=["S1"]))
+        self.assertEqual(len(resp.data["events"]), 3)
+
+
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.t0     = timezone.now() - timedelta(days=1)
+        for i in range(5):
+            Shipment.objects.create(
+                shipment_id=f"S{i}", origin="FL", destination="JAM", weight=10, volume=100,
+                mode="sea", carrier="Crowley", status="delivered",
+                arrival_date="2025-01-02", departure_date="2025-01-05", delivered_date="2025-01-12",
+            )
+        # S0/S1 share a timestamp so the shipment_id tie-break is exercised
+        for i, minutes in enumerate([0, 0, 1, 2, 3]):
+            Shipment.objects.filter(pk=f"S{i}").update(updated_at=self.t0 + timedelta(minutes=minutes))
+
+    def feed(self, **params):
+        resp = self.client.get(reverse("shipments-changes"), params)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        lines = [json.loads(line) for line in b"".join(resp.streaming_content).splitlines()]
+        return lines[:-1], lines[-1]
+
+    def drain(self, cursor=None, limit=2):
+        seen = []
+        while True:
+            records, trailer = self.feed(limit=limit, **({"cursor": cursor} if cursor else {}))
+            seen += [(r["op"], r["shipment_id"]) for r in records]
+            cursor = trailer["cursor"] or cursor
+            if not trailer["more"]:
+                return seen, cursor
+
+    @override_settings(CHANGE_FEED_SAFETY_LAG_SECONDS=0)
+    def test_pages_in_order_and_resumes_from_cursor(self):
+        seen, cursor = self.drain()
+        self.assertEqual(seen, [("upsert", f"S{i}") for i in range(5)])
+
+        self.client.delete(reverse("shipments-detail", args=["S1"]))
+        Shipment.objects.filter(pk="S2").update(updated_at=timezone.now())
+        seen, _ = self.drain(cursor)
+        self.assertEqual(seen, [("delete", "S1"), ("upsert", "S2")])
+
+    def test_caught_up_cursor_follows_the_horizon(self):
+        _, cursor = self.drain()
+        stamp, _  = changefeed.decode_cursor(cursor)
+        self.assertGreater(stamp, timezone.now() - timedelta(minutes=1))   # not S4's day-old timestamp
+        # polling a quiet table keeps moving the cursor, so it never ages past the tombstone retention
+        seen, polled = self.drain(cursor)
+        self.assertEqual(seen, [])
+        self.assertGreaterEqual(changefeed.decode_cursor(polled)[0], stamp)
+
+    def test_recent_writes_wait_for_the_horizon(self):
+        Shipment.objects.filter(pk="S4").update(updated_at=timezone.now())
+        imp = CsvImport.objects.create(file_name="x.csv", status="PROCESSING",
+                                       uploaded_at=timezone.now() - timedelta(minutes=10))
+        Shipment.objects.filter(pk="S3").update(updated_at=imp.uploaded_at + timedelta(minutes=1))
+        self.assertEqual(self.drain()[0], [("upsert", f"S{i}") for i in range(3)])
+
+    def test_archiving_is_reported(self):
+        _, cursor = self.drain()
+        archive.archive_delivered(older_than_days=30, today=date(2025, 6, 1))
+        with override_settings(CHANGE_FEED_SAFETY_LAG_SECONDS=0):
+            records, _ = self.feed(cursor=cursor)
+        self.assertEqual({(r["op"], r["reason"]) for r in records}, {("delete", "archived")})
+        self.assertEqual(len(records), 5)
+
+    @override_settings(DATABASE_REPLICAS=["replica"], CHANGE_FEED_SAFETY_LAG_SECONDS=0)
+    def test_horizon_and_page_come_from_the_primary(self):
+        # "replica" has no connection: any feed read routed there would raise
+        with mock.patch.object(db_routers, "pick_replica", return_value="replica"):
+            self.assertEqual(self.drain()[0], [("upsert", f"S{i}") for i in range(5)])
+
+    def test_bad_and_expired_cursors(self):
+        self.assertEqual(self.client.get(reverse("shipments-changes"), {"cursor": "nope"}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        stale = changefeed.encode_cursor((timezone.now() - timedelta(days=365), "S0"))
+        self.assertEqual(self.client.get(reverse("shipments-changes"), {"cursor": stale}).status_code,
+                         status.HTTP_410_GONE)
+
+
+class CustomerCacheTests(TestCase):
+    def setUp(self):
+        self.customers = CustomerCache(max_entries=100, ttl=300)
+        Customer.objects.bulk_create([Customer(customer_id=f"C{i}", name=f"N{i}") for i in range(3)])
+
+    def test_batches_resolve_with_one_query_then_none(self):
+        with self.assertNumQueries(1):
+            found = self.customers.get_many(["C0", "C1", "C2", "NOPE", None])
+        self.assertEqual(sorted(found), ["C0", "C1", "C2"])
+        self.assertEqual(found["C1"].name, "N1")
+        with self.assertNumQueries(1):   # only the unknown id goes back to the database
+            self.customers.get_many(["C0", "C1", "NOPE"])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.customers.get("C2").pk, "C2")
+        self.assertEqual(self.customers.stats()["db_loads"], 2)
+
+    def test_lru_bound_and_ttl(self):
+        small = CustomerCache(max_entries=2, ttl=300)
+        small.warm()
+        self.assertEqual(small.stats()["entries"], 2)
+        expired = CustomerCache(ttl=0)
+        expired.warm(["C0"])
+        with self.assertNumQueries(1):
+            expired.get("C0")
+
+    def test_saves_and_deletes_invalidate(self):
+        with mock.patch("shipments.signals.customer_cache", self.customers):
+            self.customers.warm(["C0", "C1"])
+            Customer.objects.filter(pk="C0").update(name="stale")   # no signal: served from cache
+            self.assertEqual(self.customers.get("C0").name, "N0")
+            Customer.objects.get(pk="C0").save()
+            self.assertEqual(self.customers.get("C0").name, "stale")
+            Customer.objects.get(pk="C1").delete()
+            self.assertIsNone(self.customers.get("C1"))
+
+    @override_settings(CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "shared":  {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "customers"},
+    })
+    def test_shared_level_between_processes(self):
+        CustomerCache(alias="shared").warm(["C0"])
+        other = CustomerCache(alias="shared")
+        with self.assertNumQueries(0):
+            self.assertEqual(other.get("C0").name, "N0")
+        self.assertEqual(other.stats()["shared_hits"], 1)
+
+    def test_import_creates_missing_customers_per_batch(self):
+        customer_cache.clear()
+        path = os.path.join(tempfile.mkdtemp(), "c.csv")
+        with open(path, "w", newline="") as f:
+            f.write(",".join(HEADER) + "\n")
+            for i in range(6):
+                f.write(f"S{i},{i % 2 + 7},FL,JAM,10,100,sea,Crowley,received,2025-01-01,,\n")
+        imp = CsvImport.objects.create(file_name="c.csv", total_rows=6)
+        with mock.patch.object(Customer.objects, "get_or_create") as per_row:
+            process_csv.run(imp.id, path)
+        per_row.assert_not_called()
+        self.assertEqual(set(Customer.objects.filter(pk__in=["7", "8"]).values_list("pk", flat=True)), {"7", "8"})
+        self.assertEqual(Shipment.objects.filter(customer_id="8").count(), 3)
+
+    def test_serializer_validates_through_the_cache(self):
+        customer_cache.clear()
+        data = {"shipment_id": "S9", "customer_id": "C0", "origin": "FL", "destination": "JAM",
+                "weight": 1, "volume": 1, "mode": "sea", "status": "received"}
+        self.assertTrue(ShipmentSerializer(data=data).is_valid())
+        with self.assertNumQueries(1):   # the shipment_id uniqueness check only
+            serializer = ShipmentSerializer(data=data)
+            self.assertTrue(serializer.is_valid())
+        self.assertEqual(serializer.validated_data["customer"].pk, "C0")
+        bad = ShipmentSerializer(data={**data, "customer_id": "NOPE"})
+        self.assertFalse(bad.is_valid())
+        self.assertIn("customer_id", bad.errors)
+
+
+class SchedulingTests(TestCase):
+    def manifest(self, rows=2):
+        path = os.path.join(tempfile.mkdtemp(), "s.csv")
+        with open(path, "w", newline="") as f:
+            f.write(",".join(HEADER) + "\n")
+            for i in range(rows):
+                f.write(f"Q{i},,FL,JAM,10,100,sea,Crowley,received,2025-01-01,,\n")
+        return path
+
+    def test_routing_by_file_size(self):
+        from backend.celery import app
+        path  = self.manifest()
+        queue = lambda name, args=(): app.amqp.router.route({}, name, args, {})["queue"].name
+        self.assertEqual(queue("shipments.tasks.process_csv", (1, path)), scheduling.SMALL_QUEUE)
+        with override_settings(IMPORT_BULK_THRESHOLD_BYTES=10):
+            self.assertEqual(queue("shipments.tasks.process_csv", (1, path)), scheduling.BULK_QUEUE)
+        self.assertEqual(queue("shipments.tasks.generate_consolidations"), scheduling.CONSOLIDATION_QUEUE)
+        self.assertEqual(queue("shipments.tasks.prune_shipment_tombstones"), "celery")
+
+    @override_settings(IMPORT_TENANT_CONCURRENCY=1)
+    def test_tenant_concurrency_limit(self):
+        CsvImport.objects.create(file_name="a.csv", tenant="acme", status="PROCESSING",
+                                 started_at=timezone.now())
+        queued = CsvImport.objects.create(file_name="b.csv", tenant="acme")
+        other  = CsvImport.objects.create(file_name="c.csv", tenant="globex")
+        self.assertIsNone(scheduling.claim_import(queued.pk))
+        self.assertEqual(scheduling.claim_import(other.pk).status, "PROCESSING")
+
+        with mock.patch.object(process_csv, "retry", return_value=RuntimeError("retry")) as retry:
+            with self.assertRaises(RuntimeError):
+                process_csv.run(queued.pk, self.manifest())
+        retry.assert_called_once_with(countdown=30, max_retries=None)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, "PENDING")
+
+        CsvImport.objects.filter(tenant="acme", status="PROCESSING").update(
+            started_at=timezone.now() - timedelta(days=1))   # a dead worker's import
+        self.assertEqual(scheduling.claim_import(queued.pk).status, "PROCESSING")
+
+    def test_consolidation_is_debounced(self):
+        Shipment.objects.bulk_create([
+            Shipment(shipment_id=f"D{i}", origin="FL", destination="JAM", weight=1, volume=1,
+                     mode="sea", departure_date="2025-01-05") for i in range(2)
+        ])
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            runs = [scheduling.request_consolidation() for _ in range(3)]
+        self.assertEqual(len(callbacks), 1)
+        self.assertIsNotNone(runs[0])
+        self.assertEqual(runs[1:], [None, None])
+        run = ConsolidationRun.objects.get()
+        self.assertEqual((run.pk, run.status, run.groups), (runs[0].pk, "COMPLETED", 1))
+        self.assertIsNotNone(scheduling.request_consolidation())   # the next burst gets a run
+        self.assertEqual(generate_consolidations.run(run_id=run.pk), f"Run {run.pk} is no longer pending")
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_uploads_run_eagerly_in_tests(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user("acme"))
+        with open(self.manifest(3), "rb") as f:
+            resp = client.post(reverse("imports-list"), {"file": f, "tenant": "globex"}, format="multipart")
+        imp = CsvImport.objects.get(pk=resp.data["id"])
+        self.assertEqual((imp.status, imp.tenant, imp.processed_rows), ("COMPLETED", "acme", 3))
+        self.assertIsNotNone(imp.started_at)
+
+        with open(self.manifest(1), "rb") as f:   # the client can't pick its tenant
+            resp = APIClient().post(reverse("imports-list"), {"file": f, "tenant": "acme"}, format="multipart")
+        self.assertEqual(CsvImport.objects.get(pk=resp.data["id"]).tenant, "")
+
+
+class SchemaCacheTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        override = override_settings(SCHEMA_CACHE_DIR=self.dir, ALLOWED_HOSTS=["localhost"])
+        override.enable()
+        self.addCleanup(override.disable)
+        schemas.clear()
+        self.client  = APIClient(SERVER_NAME="localhost")
+        patcher      = mock.patch.object(CachedSpectacularAPIView, "render_schema",
+                                         autospec=True, side_effect=CachedSpectacularAPIView.render_schema)
+        self.renders = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, **headers):
+        return self.client.get(reverse("schema"), HTTP_ACCEPT="application/vnd.oai.openapi+json", **headers)
+
+    def test_generated_once_then_served_with_etag_and_gzip(self):
+        first = self.get()
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("/api/shipments/", json.loads(first.content)["paths"])
+
+        zipped = self.get(HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(zipped["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(zipped.content), first.content)
+        self.assertIn("Accept-Encoding", zipped["Vary"])
+        self.assertEqual(zipped["ETag"], first["ETag"][:-1] + '-gzip"')
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+        for etag in (first["ETag"], zipped["ETag"]):   # a client may have cached either
+            not_modified = self.get(HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT_ENCODING="gzip")
+            self.assertEqual(not_modified.status_code, 304)
+            self.assertEqual(not_modified["ETag"], zipped["ETag"])
+            self.assertIn("Accept-Encoding", not_modified["Vary"])
+        self.assertEqual(self.renders.call_count, 1)
+
+    def test_disk_copy_survives_restarts_until_the_code_changes(self):
+        etag = self.get()["ETag"]
+        schemas.clear()   # a fresh process
+        self.assertEqual(self.get()["ETag"], etag)
+        self.assertEqual(self.renders.call_count, 1)
+
+        with mock.patch("backend.schema.code_version", return_value="next"):
+            self.get()
+            self.assertEqual(self.renders.call_count, 2)
+            self.assertEqual(schemas.prune(), 1)
+        self.assertEqual(os.listdir(self.dir), ["next"])
+
+    def test_unwritable_cache_dir_serves_from_memory(self):
+        blocker = os.path.join(self.dir, "file")
+        open(blocker, "w").close()
+        with override_settings(SCHEMA_CACHE_DIR=os.path.join(blocker, "cache")), \
+             self.assertLogs("backend.schema", "WARNING"):
+            self.assertEqual(self.get().status_code, 200)
+        self.assertEqual(self.get().status_code, 200)
+        self.assertEqual(self.renders.call_count, 1)
+
+    def test_build_schema_command_precomputes(self):
+        call_command("build_schema", stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(self.renders.call_count, 2)   # YAML and JSON
+        schemas.clear()
+        self.assertEqual(self.get().status_code, 200)
+        self.assertEqual(self.client.get(reverse("schema")).status_code, 200)   # YAML
+        self.assertEqual(self.renders.call_count, 2)
+
+
+class LaneCubeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        Customer.objects.create(customer_id="C1", name="Acme")
+        rows = [("S0", "FL", "JAM", "sea", "2025-01-06"), ("S1", "FL", "JAM", "sea", "2025-01-08"),
+                ("S2", "FL", "JAM", "air", "2025-01-14"), ("S3", "NY", "KIN", "sea", "2025-01-07")]
+        for sid, origin, dest, mode, departed in rows:
+            self.client.post(reverse("shipments-list"), {
+                "shipment_id": sid, "customer_id": "C1", "origin": origin, "destination": dest,
+                "weight": 10, "volume": 100,
+                "mode": mode, "status": "in-transit", "departure_date": departed,
+            }, format="json")
+
+    def cells(self):
+        return {(c.origin, c.destination, c.mode, str(c.week)): c.shipments for c in LaneRollup.objects.all()}
+
+    def test_writes_keep_the_cube_in_step(self):
+        self.assertEqual(self.cells(), {
+            ("FL", "JAM", "sea", "2025-01-06"): 2, ("FL", "JAM", "air", "2025-01-13"): 1,
+            ("NY", "KIN", "sea", "2025-01-06"): 1,
+        })
+        self.client.patch(reverse("shipments-detail", args=["S1"]), {"destination": "KIN"}, format="json")
+        self.client.delete(reverse("shipments-detail", args=["S2"]))
+        expected = {("FL", "JAM", "sea", "2025-01-06"): 1, ("FL", "KIN", "sea", "2025-01-06"): 1,
+                    ("NY", "KIN", "sea", "2025-01-06"): 1}
+        self.assertEqual(self.cells(), expected)
+
+        lanes.rebuild()
+        self.assertEqual(self.cells(), expected)
+
+    def test_admin_edits_refresh_only_what_they_touch(self):
+        shipment_admin = admin.site._registry[Shipment]
+        with mock.patch("shipments.lanes.rebuild") as rebuild, mock.patch("shipments.occupancy.rebuild") as occ:
+            shipment = Shipment.objects.get(pk="S1")
+            shipment.destination = "KIN"
+            shipment_admin.save_model(None, shipment, None, change=True)
+            shipment_admin.delete_model(None, Shipment.objects.get(pk="S2"))
+        rebuild.assert_not_called()
+        occ.assert_not_called()
+        self.assertEqual(self.cells(), {("FL", "JAM", "sea", "2025-01-06"): 1, ("FL", "KIN", "sea", "2025-01-06"): 1,
+                                        ("NY", "KIN", "sea", "2025-01-06"): 1})
+        self.assertTrue(ShipmentTombstone.objects.filter(shipment_id="S2").exists())
+
+    def test_version_moves_after_the_cube(self):
+        seen = []
+        def refresh(changes):
+            seen.append(versioning.versions(RequestFactory().get("/"), [versioning.SHIPMENTS])[versioning.SHIPMENTS][0])
+        before = versioning.versions(RequestFactory().get("/"), [versioning.SHIPMENTS])[versioning.SHIPMENTS][0]
+        with mock.patch("shipments.lanes.refresh", side_effect=refresh):
+            self.client.patch(reverse("shipments-detail", args=["S1"]), {"destination": "KIN"}, format="json")
+        after = versioning.versions(RequestFactory().get("/"), [versioning.SHIPMENTS])[versioning.SHIPMENTS][0]
+        self.assertEqual(seen, [before])
+        self.assertGreater(after, before)
+
+    def test_failing_refresh_keeps_the_write_and_the_version_bump(self):
+        versions = lambda: versioning.versions(RequestFactory().get("/"), [versioning.SHIPMENTS])[versioning.SHIPMENTS][0]
+        before   = versions()
+        with mock.patch("shipments.occupancy.refresh", side_effect=IntegrityError("day taken")), \
+             self.assertLogs("shipments.signals", "ERROR"):
+            resp = self.client.post(reverse("shipments-list"), {
+                "shipment_id": "S9", "customer_id": "C1", "origin": "FL", "destination": "JAM",
+                "weight": 10, "volume": 100, "mode": "sea", "status": "in-transit", "departure_date": "2025-01-06",
+            }, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertGreater(versions(), before)
+
+    def test_archived_shipments_stay_counted(self):
+        Shipment.objects.filter(pk="S0").update(status="delivered", delivered_date="2025-01-10")
+        archive.archive_delivered(older_than_days=30, today=date(2025, 6, 1))
+        self.assertTrue(ArchivedShipment.objects.filter(pk="S0").exists())
+        self.assertEqual(self.cells()[("FL", "JAM", "sea", "2025-01-06")], 2)
+
+    def test_top_lanes_and_slices(self):
+        resp = self.client.get(reverse("lanes-list"))
+        self.assertEqual([(r["origin"], r["destination"], r["shipments"]) for r in resp.data["results"]],
+                         [("FL", "JAM", 3), ("NY", "KIN", 1)])
+        resp = self.client.get(reverse("lanes-list"), {"group_by": "mode,week", "destination": "JAM",
+                                                       "since": "2025-01-13"})
+        self.assertEqual(resp.data["results"], [
+            {"mode": "air", "week": date(2025, 1, 13), "shipments": 1, "weight": 10.0, "volume": 100.0},
+        ])
+        resp = self.client.get(reverse("lanes-list"), {"group_by": "origin", "order_by": "weight", "top": 1})
+        self.assertEqual(resp.data["results"], [{"origin": "FL", "shipments": 3, "weight": 30.0, "volume": 300.0}])
+        for params in ({"group_by": "carrier"}, {"until": "Jan 2025"}):
+            self.assertEqual(self.client.get(reverse("lanes-list"), params).status_code,
+                             status.HTTP_400_BAD_REQUEST)
+
+    def test_window_holds_the_weeks_starting_in_it(self):
+        weeks = lambda **window: [r["week"] for r in lanes.query(group_by=["week"], order_by="shipments", **window)]
+        self.assertEqual(sorted(weeks()), [date(2025, 1, 6), date(2025, 1, 13)])
+        # the week of 2025-01-06 began before a Wednesday `since` and ends after a Wednesday `until`
+        self.assertEqual(weeks(since=date(2025, 1, 8)), [date(2025, 1, 13)])
+        self.assertEqual(weeks(until=date(2025, 1, 8)), [date(2025, 1, 6)])
+        self.assertEqual(weeks(since=date(2025, 1, 6), until=date(2025, 1, 13)), [date(2025, 1, 6)])
+
+class BinaryFormatTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        shipment_lists.clear()
+        self.client = APIClient()
+        Customer.objects.create(customer_id="C1", name="Acme")
+        for i in range(3):
+            self.client.post(reverse("shipments-list"), {
+                "shipment_id": f"S{i}", "customer_id": "C1", "origin": "FL", "destination": "JAM",
+                "weight": 10.5 + i, "volume": 100, "mode": "sea", "status": "in-transit",
+                "arrival_date": "2025-01-06", "departure_date": None if i else "2025-01-08",
+            }, format="json")
+        consolidation = Consolidation.objects.create(destination="JAM", departure_date=date(2025, 1, 8),
+                                                     total_weight=10.5, total_volume=100)
+        ConsolidationShipment.objects.create(consolidation=consolidation, shipment_id="S0")
+
+    @skipUnless(renderers.msgpack, "msgpack not installed")
+    def test_msgpack_list_matches_json(self):
+        import msgpack
+        expected = self.client.get(reverse("shipments-list")).json()
+        resp     = self.client.get(reverse("shipments-list"), HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(resp["Content-Type"], "application/msgpack")
+        self.assertIn("Accept", resp["Vary"])
+        body    = msgpack.unpackb(resp.content, timestamp=3)
+        results = body.pop("results")
+        self.assertEqual(body, {k: v for k, v in expected.items() if k != "results"})
+        rows = [dict(zip(results, values)) for values in zip(*results.values())]
+        for row, want in zip(rows, expected["results"]):
+            row["created_at"] = row["created_at"].isoformat().replace("+00:00", "Z")
+            row["updated_at"] = row["updated_at"].isoformat().replace("+00:00", "Z")
+            self.assertEqual(row, want)
+
+        # each format is cached under its own key
+        self.assertEqual(self.client.get(reverse("shipments-list")).json(), expected)
+
+    @skipUnless(renderers.HAS_ARROW, "pyarrow not installed")
+    def test_arrow_stream_of_typed_columns(self):
+        pa   = renderers.arrow()
+        resp = self.client.get(reverse("shipments-list"), {"format": "arrow", "page_size": 2})
+        self.assertEqual(resp["Content-Type"], "application/vnd.apache.arrow.stream")
+        table = pa.ipc.open_stream(resp.content).read_all()
+        self.assertEqual(table.num_rows, 2)
+        self.assertEqual(table.schema.metadata[b"count"], b"3")
+        self.assertTrue(table.schema.metadata[b"next"].endswith(b"page=2&page_size=2"))
+        self.assertEqual(table.schema.field("weight").type, pa.float64())
+        self.assertEqual(table.schema.field("departure_date").type, pa.date32())
+        self.assertEqual(table.column("departure_date").to_pylist(), [date(2025, 1, 8), None])
+
+        resp  = self.client.get(reverse("consolidations-list"), {"format": "arrow"})
+        table = pa.ipc.open_stream(resp.content).read_all()
+        self.assertEqual(table.column("shipments").to_pylist(), [["S0"]])
+
+        # non-list responses are one-row tables
+        resp  = self.client.get(reverse("shipments-detail", args=["S1"]), {"format": "arrow"})
+        table = pa.ipc.open_stream(resp.content).read_all()
+        self.assertEqual(table.column("shipment_id").to_pylist(), ["S1"])
+
+class OccupancyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        Customer.objects.create(customer_id="C1", name="Acme")
+        rows = [("S0", 100, "in-transit", "2025-01-06", "2025-01-08"), ("S1", 50, "received", "2025-01-07", None),
+                ("S2", 999, "in-transit", "2025-01-07", "2025-01-05")]   # departed before it arrived: left out
+        for sid, volume, state, arrived, departed in rows:
+            self.client.post(reverse("shipments-list"), {
+                "shipment_id": sid, "customer_id": "C1", "origin": "FL", "destination": "JAM",
+                "weight": 10, "volume": volume, "mode": "sea", "status": state,
+                "arrival_date": arrived, "departure_date": departed,
+            }, format="json")
+
+    def levels(self):
+        return [p["on_hand"] for p in occupancy.series(date(2025, 1, 5), date(2025, 1, 9))]
+
+    def stored(self):
+        return list(OccupancyDay.objects.order_by("day").values("day", "arrived", "departed", "on_hand"))
+
+    def test_writes_keep_the_running_total_in_step(self):
+        self.assertEqual(self.levels(), [0, 100, 150, 50, 50])
+        self.client.patch(reverse("shipments-detail", args=["S1"]), {"departure_date": "2025-01-09"}, format="json")
+        self.assertEqual(self.levels(), [0, 100, 150, 50, 0])
+        self.client.delete(reverse("shipments-detail", args=["S0"]))
+        self.assertEqual(self.levels(), [0, 0, 50, 50, 0])
+
+        expected = self.stored()
+        occupancy.rebuild()
+        self.assertEqual(self.stored(), expected)
+
+    def test_delivered_and_archived_shipments(self):
+        # delivered without a departure date: no longer on hand
+        self.client.patch(reverse("shipments-detail", args=["S1"]), {"status": "delivered"}, format="json")
+        self.assertEqual(self.levels(), [0, 100, 100, 0, 0])
+        Shipment.objects.filter(pk="S0").update(status="delivered", delivered_date="2025-01-10")
+        archive.archive_delivered(older_than_days=30, today=date(2025, 6, 1))
+        self.assertTrue(ArchivedShipment.objects.filter(pk="S0").exists())
+        self.assertEqual(self.levels(), [0, 100, 100, 0, 0])
+
+    @override_settings(WAREHOUSE_CAPACITY_CM3=1000, OCCUPANCY_TREND_DAYS=5)
+    def test_forecast_and_endpoints(self):
+        points = occupancy.forecast(3, today=date(2025, 1, 7))
+        self.assertEqual([p["on_hand"] for p in points], [50, 50, 50])   # S0 leaves on the 8th
+        self.assertEqual([p["projected"] for p in points], [80, 110, 140])   # 150 cm³ in over 5 days
+        self.assertEqual(points[0]["utilisation_pct"], 5.0)
+
+        self.assertEqual(self.client.get(reverse("metrics-list")).data["utilisation_pct"], 5.0)
+        resp = self.client.get(reverse("metrics-occupancy"), {"since": "2025-01-05", "until": "2025-01-09",
+                                                              "horizon": 2})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["on_hand"], 50)
+        self.assertEqual([p["on_hand"] for p in resp.data["history"]], [0, 100, 150, 50, 50])
+        self.assertEqual(len(resp.data["forecast"]), 2)
+        # utilisation is today's: the validators and the cached body turn over at midnight
+        etag = self.client.get(reverse("metrics-list"))["ETag"]
+        self.assertEqual(self.client.get(reverse("metrics-list"), HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        with mock.patch("django.utils.timezone.localdate", return_value=tomorrow):
+            resp = self.client.get(reverse("metrics-list"), HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(resp["ETag"], etag)
+
+        for params in ({"horizon": 1000}, {"since": "2025-02-01", "until": "2025-01-01"}, {"until": "2025-02-30"}, {"since": "x"}):
+            self.assertEqual(self.client.get(reverse("metrics-occupancy"), params).status_code,
+                             status.HTTP_400_BAD_REQUEST)
@@ -1,15 +1,28 @@
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from shipments.views import ShipmentViewSet, CsvImportViewSet, MetricsViewSet, ConsolidationViewSet
+from shipments.views import (
+    ShipmentViewSet, CsvImportViewSet, MetricsViewSet, ConsolidationViewSet, LaneViewSet,
+)
+from shipments import async_views
 
 router = DefaultRouter()
 router.register("shipments",      ShipmentViewSet, basename="shipments")
 router.register("imports",        CsvImportViewSet, basename="imports")
 router.register("metrics",        MetricsViewSet,  basename="metrics")
 router.register("consolidations", ConsolidationViewSet, basename="consolidations")
+router.register("lanes",          LaneViewSet,     basename="lanes")
 
 api_router = router
 urlpatterns = [
     path("", include(api_router.urls)),
 ]
+
+# ASGI-native read endpoints, mounted under /api/async/
+async_urlpatterns = [
+    path("shipments/",                   async_views.shipment_list,      name="async-shipments-list"),
+    path("shipments/<str:pk>/",          async_views.shipment_detail,    name="async-shipments-detail"),
+    path("metrics/",                     async_views.metrics,            name="async-metrics"),
+    path("consolidations/",              async_views.consolidation_list, name="async-consolidations-list"),
+    path("imports/<int:pk>/progress/",   async_views.import_progress,    name="async-imports-progress"),
+]
@@ -0,0 +1,77 @@
+"""
+Monotonic data-version counters behind the API's ETag / Last-Modified headers.
+
+Each scope ("shipments", "consolidations") is one ``DataVersion`` row bumped
+by every write path, so a conditional GET costs a primary-key lookup instead
+of the query and serializer it guards. Finer ``tag`` scopes (per destination
+/ status) let ``listcache`` keep entries a write could not have affected.
+"""
+import hashlib
+from datetime import datetime, time
+
+from django.db.models import F
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .models import DataVersion
+
+SHIPMENTS      = "shipments"
+CONSOLIDATIONS = "consolidations"
+BULK           = "shipments:bulk"   # shipment writes of unknown extent
+
+
+def tag(field, value):
+    """Scope of the shipments with ``field == value`` (destination / status)."""
+    return f"{SHIPMENTS}:{field}:{value}"
+
+
+def bump(*scopes):
+    now     = timezone.now()
+    scopes  = set(scopes)
+    current = DataVersion.objects.filter(scope__in=scopes)
+    missing = scopes - set(current.values_list("scope", flat=True))
+    current.update(version=F("version") + 1, updated_at=now)
+    for scope in missing:
+        _, created = DataVersion.objects.get_or_create(scope=scope, defaults={"version": 1, "updated_at": now})
+        if not created:   # lost a race with another first writer
+            DataVersion.objects.filter(scope=scope).update(version=F("version") + 1, updated_at=now)
+
+
+def versions(request, scopes):
+    """{scope: (version, updated_at)} – each scope read at most once per request."""
+    cached  = request.__dict__.setdefault("_data_versions", {})
+    missing = [scope for scope in scopes if scope not in cached]
+    if missing:
+        found = {v.scope: (v.version, v.updated_at) for v in DataVersion.objects.filter(scope__in=missing)}
+        cached.update({scope: found.get(scope, (0, None)) for scope in missing})
+    return {scope: cached[scope] for scope in scopes}
+
+
+def etag(request, scopes, daily=False):
+    """
+    Strong validator over the data versions, the full path and the negotiated
+    format – and today's date for ``daily`` responses, which change at midnight
+    without a write.
+    """
+    current  = versions(request, scopes)
+    renderer = getattr(request, "accepted_media_type", "") or ""
+    parts    = [*(f"{s}:{current[s][0]}" for s in sorted(scopes)), request.get_full_path(), renderer]
+    if daily:
+        parts.append(timezone.localdate().isoformat())
+    key = "|".join(parts)
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def last_modified(request, scopes, daily=False):
+    stamps = [updated for _, updated in versions(request, scopes).values() if updated]
+    if daily:
+        stamps.append(timezone.make_aware(datetime.combine(timezone.localdate(), time.min)))
+    return max(stamps) if stamps else None
+
+
+def conditional(scopes, daily=False):
+    """``condition`` decorator validating against the data versions of ``scopes`` (and the date, if ``daily``)."""
+    return condition(
+        etag_func=lambda request, *args, **kwargs: etag(request, scopes, daily),
+        last_modified_func=lambda request, *args, **kwargs: last_modified(request, scopes, daily),
+    )
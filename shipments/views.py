@@ -1,23 +1,176 @@
+from datetime import timedelta
+from django.conf import settings
 from django.core.cache import cache
-from django.db.models import Count, Sum, F
+from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import method_decorator
 from rest_framework import viewsets, mixins, status
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.parsers import MultiPartParser, FormParser
-from .models import Shipment, CsvImport, Consolidation
+from .models import Shipment, CsvImport, Consolidation, ConsolidationRun, ConsolidationShipment, ArchivedShipment
 from .serializers import (
-    ShipmentSerializer, CsvImportSerializer, ConsolidationModelSerializer
+    ShipmentSerializer, CsvImportSerializer, ConsolidationModelSerializer,
+    ConsolidationRunSerializer, ArchivedShipmentSerializer,
 )
+from .metrics import cache_key as metrics_cache_key, compute_metrics, parse_window, query_date
+from backend.db_routers import allow_replica_reads
 from .tasks import process_csv
-import csv, os
+import csv, json, os
 from .filters import ShipmentFilter
+from .signals import ShipmentChanges
+from .listcache import current_versions, shipment_lists, signature
+from .customers import customer_cache
+from .renderers import BINARY_RENDERERS, Columns
+from . import changefeed, events, lanes, occupancy, scheduling, versioning
 
  
-class ShipmentViewSet(viewsets.ModelViewSet):
-    queryset         = Shipment.objects.all().select_related("customer")
+class ReplicaReadsMixin:
+    """Serve safe-method requests from a read replica when one is configured."""
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            allow_replica_reads()
+
+class BulkPagination(PageNumberPagination):
+    """PAGE_SIZE by default; bulk clients may ask for up to ``max_page_size`` rows per page."""
+    page_size_query_param = "page_size"
+    max_page_size         = 5000
+
+class ColumnarListMixin:
+    """
+    Offers the binary formats of ``shipments.renderers``; for those, list pages
+    are read with ``values_list(*list_columns)`` and rendered column-wise
+    without going through the serializer.
+    """
+    list_columns     = ()
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, *BINARY_RENDERERS]
+    pagination_class = BulkPagination
+
+    def list(self, request, *args, **kwargs):
+        if not getattr(request.accepted_renderer, "columnar", False):
+            return super().list(request, *args, **kwargs)
+        rows = self.filter_queryset(self.get_queryset()).prefetch_related(None).values_list(*self.list_columns)
+        page = self.paginate_queryset(rows)
+        data = self.columns(rows if page is None else page)
+        return Response(data) if page is None else self.get_paginated_response(data)
+
+    def columns(self, rows):
+        return Columns.from_rows(self.queryset.model, self.list_columns, rows)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        patch_vary_headers(response, ["Accept"])
+        return response
+
+def conditional(*scopes, daily=False):
+    """
+    ETag / Last-Modified from the data versions of ``scopes``; a matching
+    If-None-Match is answered 304 before the query or serializer runs.
+    ``daily``: the response also depends on today's date.
+    """
+    return method_decorator(versioning.conditional(scopes, daily))
+
+class ShipmentViewSet(ReplicaReadsMixin, ColumnarListMixin, viewsets.ModelViewSet):
+    queryset         = Shipment.objects.all()   # only customer_id is rendered; no join
     serializer_class = ShipmentSerializer
+    list_columns     = changefeed.FIELDS
     filterset_fields = ["status", "destination", "origin", "mode", "carrier"]
     filterset_class = ShipmentFilter
+    FEED_LIMIT       = 10_000
+    FEED_MAX_LIMIT   = 100_000
+
+    @conditional(versioning.SHIPMENTS)
+    def list(self, request, *args, **kwargs):
+        # Popular filter pages are shared across users until a write touches
+        # their destination / status (shipments.listcache).
+        key, scopes = signature(request)
+        current     = current_versions(request, scopes)
+        data        = shipment_lists.get(key, current)
+        if data is not None:
+            return Response(data, headers={"X-Cache": "HIT"})
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            shipment_lists.set(key, current, response.data)
+        response["X-Cache"] = "MISS"
+        return response
+
+    @conditional(versioning.SHIPMENTS)
+    def retrieve(self, request, *args, **kwargs):
+        # Delivered shipments may have moved to cold storage (shipments.archive)
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            archived = get_object_or_404(ArchivedShipment, pk=kwargs[self.lookup_field])
+            return Response(ArchivedShipmentSerializer(archived).data)
+
+    @action(detail=False, methods=["get"])
+    def changes(self, request):
+        """
+        Incremental feed as NDJSON: shipments changed or removed after
+        ?cursor=, oldest first, up to ?limit= records, then a final
+        {"cursor": ..., "more": ...} line to resume from.
+        """
+        try:
+            limit = min(int(request.query_params.get("limit") or self.FEED_LIMIT), self.FEED_MAX_LIMIT)
+        except ValueError:
+            raise ValidationError({"limit": "must be an integer"})
+        try:
+            position, until = changefeed.start(request.query_params.get("cursor"))
+        except changefeed.CursorExpired as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_410_GONE)
+        except changefeed.CursorError as exc:
+            raise ValidationError({"cursor": str(exc)})
+
+        lines = (json.dumps(record, cls=JSONEncoder) + "\n"
+                 for record in changefeed.stream(position, until, max(limit, 1)))
+        return StreamingHttpResponse(lines, content_type="application/x-ndjson")
+
+    @action(detail=True, methods=["get"])
+    def history(self, request, pk=None):
+        """Status transitions, oldest first (kept for archived shipments too)."""
+        transitions = events.history(pk)
+        if not transitions and not Shipment.objects.filter(pk=pk).exists():
+            get_object_or_404(ArchivedShipment, pk=pk)
+        return Response({"shipment_id": pk, "events": transitions})
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        events.record([serializer.instance])
+        changes = ShipmentChanges()
+        changes.add_shipment(serializer.instance)
+        changes.send_robust(sender=type(self))
+
+    def perform_update(self, serializer):
+        changes = ShipmentChanges()
+        changes.add_shipment(serializer.instance)   # state before the write
+        before = events.snapshot(serializer.instance)
+        super().perform_update(serializer)
+        changes.add_shipment(serializer.instance)
+        if events.snapshot(serializer.instance) != before:
+            events.record([serializer.instance])
+        changes.send_robust(sender=type(self))
+
+    def perform_destroy(self, instance):
+        changes = ShipmentChanges()
+        changes.add_shipment(instance)
+        shipment_id = instance.pk   # cleared by delete()
+        with transaction.atomic():
+            linked = ConsolidationShipment.objects.filter(shipment_id=shipment_id).exists()
+            super().perform_destroy(instance)   # cascades to its consolidation link
+            changefeed.tombstone([shipment_id])
+        if linked:
+            versioning.bump(versioning.CONSOLIDATIONS)
+        changes.send_robust(sender=type(self))
 
 class CsvImportViewSet(mixins.RetrieveModelMixin,
                         mixins.CreateModelMixin,
@@ -30,7 +183,7 @@ class CsvImportViewSet(mixins.RetrieveModelMixin,
         # 1️⃣ Save the uploaded file record
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        csv_import = serializer.save(status="PROCESSING")
+        csv_import = serializer.save(tenant=scheduling.tenant_of(request))   # PENDING until a worker claims it
 
         # 2️⃣ Count rows (cheap head count) and update total_rows
         #    We could stream or read in chunks to avoid memory blowup
@@ -41,7 +194,7 @@ class CsvImportViewSet(mixins.RetrieveModelMixin,
         csv_import.total_rows = total
         csv_import.save(update_fields=["total_rows"])
 
-        # 3️⃣ Enqueue the background job
+        # 3️⃣ Enqueue the background job (routed by file size, see shipments.scheduling)
         process_csv.delay(csv_import.id, csv_import.file.path)
 
         # 4️⃣ Return the import object
@@ -57,61 +210,146 @@ class CsvImportViewSet(mixins.RetrieveModelMixin,
         obj = self.get_object()
         return Response({"processed": obj.processed_rows, "total": obj.total_rows})
 
-class MetricsViewSet(viewsets.ViewSet):
+class MetricsViewSet(ReplicaReadsMixin, viewsets.ViewSet):
     """
     GET /api/metrics → overall KPIs, carrier breakdown,
     volume by mode, shipments per day. Cached 30s.
+    ?since=YYYY-MM-DD&until=YYYY-MM-DD restricts it to a window of the
+    partition key (departure_date unless SHIPMENT_PARTITION_KEY says otherwise).
+    GET /api/metrics/tasks → telemetry of the latest imports & consolidation runs.
+    GET /api/metrics/cache → hit ratio & size of the shipment list cache.
+    GET /api/metrics/dwell → days-in-status percentiles per lane and/or carrier
+    (?group_by=lane|carrier|lane,carrier&since=&until=&origin=&destination=&carrier=).
+    GET /api/metrics/occupancy → warehouse volume on hand per day and a forecast
+    (?since=&until=&horizon=days; default the last OCCUPANCY_HISTORY_DAYS and
+    OCCUPANCY_FORECAST_DAYS ahead).
     """
-    CACHE_KEY     = "metrics_cache"
     CACHE_TIMEOUT = 30  # seconds
+    TASKS_LIMIT   = 20
+    HISTORY_MAX   = 731   # days
+    HORIZON_MAX   = 90
 
+    @conditional(versioning.SHIPMENTS, daily=True)   # utilisation is today's occupancy
     def list(self, request):
-        data = cache.get(self.CACHE_KEY)
+        try:
+            window = parse_window(request.query_params)
+        except ValueError as exc:
+            raise ValidationError({"detail": str(exc)})
+        # keyed on the data version (and the date), so a write is never masked by the cache
+        version, _ = versioning.versions(request, [versioning.SHIPMENTS])[versioning.SHIPMENTS]
+        key        = metrics_cache_key(version, window)
+
+        data = cache.get(key)
         if data is None:
-            qs = Shipment.objects
+            data = compute_metrics(window)
+            cache.set(key, data, self.CACHE_TIMEOUT)
 
-            # 1️⃣ Counts by status
-            counts = list(qs.values("status").annotate(total=Count("shipment_id")))
+        return Response(data)
 
-            # 2️⃣ Warehouse utilisation %
-            total_vol = qs.aggregate(vol=Sum("volume"))["vol"] or 0
-            utilisation = round(total_vol / 60_000_000_000 * 100, 2)
+    @action(detail=False, methods=["get"])
+    def tasks(self, request):
+        imports = CsvImport.objects.order_by("-uploaded_at")[:self.TASKS_LIMIT]
+        runs    = ConsolidationRun.objects.all()[:self.TASKS_LIMIT]
+        return Response({
+            "imports":        CsvImportSerializer(imports, many=True).data,
+            "consolidations": ConsolidationRunSerializer(runs, many=True).data,
+        })
 
-            # 3️⃣ Shipments by carrier
-            by_carrier = list(
-                qs.values("carrier")
-                  .annotate(total=Count("shipment_id"))
-                  .order_by("-total")
-            )
+    @action(detail=False, methods=["get"])
+    @conditional(versioning.SHIPMENTS)
+    def dwell(self, request):
+        params   = request.query_params
+        group_by = params.get("group_by") or "lane"
+        if group_by not in events.GROUPINGS:
+            raise ValidationError({"group_by": f"must be one of {', '.join(events.GROUPINGS)}"})
+        try:
+            since = query_date(params, "since")
+            until = query_date(params, "until")
+        except ValueError as exc:
+            raise ValidationError({"detail": str(exc)})
+        results = events.dwell(
+            group_by, since, until,
+            origin=params.get("origin"), destination=params.get("destination"), carrier=params.get("carrier"),
+        )
+        return Response({"group_by": group_by, "results": results})
 
-            # 4️⃣ Volume by mode (air vs sea)
-            volume_by_mode = list(
-                qs.values("mode")
-                  .annotate(total_volume=Sum("volume"))
-                  .order_by("mode")
-            )
+    @action(detail=False, methods=["get"])
+    def occupancy(self, request):
+        # not conditional: the forecast moves with the date, not only with writes
+        params = request.query_params
+        today  = timezone.localdate()
+        try:
+            until   = query_date(params, "until") or today
+            since   = query_date(params, "since") \
+                      or until - timedelta(days=settings.OCCUPANCY_HISTORY_DAYS - 1)
+            horizon = int(params.get("horizon") or settings.OCCUPANCY_FORECAST_DAYS)
+        except ValueError as exc:
+            raise ValidationError({"detail": str(exc)})
+        if not 0 <= (until - since).days < self.HISTORY_MAX:
+            raise ValidationError({"detail": f"since must be on or before until, at most {self.HISTORY_MAX} days apart"})
+        if not 0 <= horizon <= self.HORIZON_MAX:
+            raise ValidationError({"horizon": f"must be between 0 and {self.HORIZON_MAX}"})
+        on_hand = occupancy.on_hand(today)
+        return Response({
+            "capacity_cm3":    settings.WAREHOUSE_CAPACITY_CM3,
+            "on_hand":         round(on_hand, 2),
+            "utilisation_pct": occupancy.utilisation_pct(on_hand),
+            "history":         occupancy.series(since, until),
+            "forecast":        occupancy.forecast(horizon, today),
+        })
 
-            # 5️⃣ Shipments per day (by arrival_date)
-            shipments_per_day = list(
-                qs.values(date=F("arrival_date"))
-                  .annotate(count=Count("shipment_id"))
-                  .order_by("date")
-            )
+    @action(detail=False, methods=["get"])
+    def cache(self, request):
+        return Response({"shipment_lists": shipment_lists.stats(), "customers": customer_cache.stats()})
+    
+class LaneViewSet(ReplicaReadsMixin, viewsets.ViewSet):
+    """
+    GET /api/lanes → top lanes off the lane cube (shipments.lanes).
+    ?group_by=origin,destination (any of origin, destination, mode, week)
+    &order_by=shipments|weight|volume&top=20&origin=&destination=&mode=
+    (comma-separated values)&since=&until= (dates; weeks starting in the window).
+    """
+    TOP = 20
 
-            data = {
-                "counts":              counts,
-                "utilisation_pct":     utilisation,
-                "by_carrier":          by_carrier,
-                "volume_by_mode":      volume_by_mode,
-                "shipments_per_day":   shipments_per_day,
-            }
-            cache.set(self.CACHE_KEY, data, self.CACHE_TIMEOUT)
+    @conditional(versioning.SHIPMENTS)
+    def list(self, request):
+        params   = request.query_params
+        values   = lambda name: [v for v in (params.get(name) or "").split(",") if v]
+        group_by = values("group_by") or ["origin", "destination"]
+        try:
+            top     = int(params.get("top") or self.TOP)
+            since   = query_date(params, "since")
+            until   = query_date(params, "until")
+            results = lanes.query(
+                group_by, params.get("order_by") or "shipments", max(top, 1), since, until,
+                origin=values("origin"), destination=values("destination"), mode=values("mode"),
+            )
+        except ValueError as exc:
+            raise ValidationError({"detail": str(exc)})
+        return Response({"group_by": group_by, "results": results})
 
-        return Response(data)
-    
-class ConsolidationViewSet(viewsets.ReadOnlyModelViewSet):
+class ConsolidationViewSet(ReplicaReadsMixin, ColumnarListMixin, viewsets.ReadOnlyModelViewSet):
     """
     Lists the saved consolidations and their linked shipments.
     """
     queryset         = Consolidation.objects.prefetch_related("consolidationshipment_set")
     serializer_class = ConsolidationModelSerializer
+    list_columns     = ["id", "destination", "departure_date", "total_weight", "total_volume", "created_at"]
+
+    def columns(self, rows):
+        columns   = super().columns(rows)
+        ids       = columns.data[0]
+        shipments = {pk: [] for pk in ids}
+        links     = ConsolidationShipment.objects.filter(consolidation_id__in=ids).order_by("pk")
+        for consolidation_id, shipment_id in links.values_list("consolidation_id", "shipment_id"):
+            shipments[consolidation_id].append(shipment_id)
+        columns.add("shipments", "strings", [shipments[pk] for pk in ids])
+        return columns
+
+    @conditional(versioning.CONSOLIDATIONS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional(versioning.CONSOLIDATIONS)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)